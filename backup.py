@@ -0,0 +1,291 @@
+# backup.py
+# Pre-flash backup of the partitions a restore is about to overwrite (kept
+# for RMA disputes).
+#
+#   backups/<device>/<YYYYmmdd-HHMMSS>/boot.img.zst    one file per partition
+#   backups/<device>/<YYYYmmdd-HHMMSS>/manifest.json   sizes, SHA-256s, timings
+#
+# Partitions are read back through mtk_wrapper.readback_stream and written
+# as Android sparse images with one chunk per REGION: RAW if the region
+# holds data, FILL 0 if it is all zeros. Zero runs never reach the
+# compressor, and the chunk count is known before the first byte arrives,
+# so the whole file is written as a single stream. The stream is
+# compressed on the fly, on several cores with zstd. `zstd -d boot.img.zst`
+# gives back an image that this tool (see sparse.py) or fastboot flashes.
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import sparse
+import utils
+import verify
+
+try:
+    import zstandard  # optional, multi-threaded zstd in-process
+except ImportError:
+    zstandard = None
+
+REGION = 1024 * 1024
+MANIFEST_NAME = "manifest.json"
+FORMAT = "android-sparse"
+COMPRESS = ("zstd", "gzip", "none")
+SUFFIXES = {"zstd": ".img.zst", "gzip": ".img.gz", "none": ".img"}
+
+_ZEROS = bytes(REGION)
+
+
+class BackupError(Exception):
+    pass
+
+
+# --------------------
+# Compressed output
+# --------------------
+class _ToolWriter:
+    """write() into an external compressor (zstd -T0 / pigz) that writes the file."""
+
+    def __init__(self, cmd, path):
+        kw = {"creationflags": subprocess.CREATE_NO_WINDOW} if sys.platform == "win32" else {}
+        self._out = open(path, "wb")
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self._out,
+                                      stderr=subprocess.DEVNULL, **kw)
+
+    def write(self, data):
+        self._proc.stdin.write(data)
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        finally:
+            rc = self._proc.wait()
+            self._out.close()
+        if rc:
+            raise BackupError(f"compressor exited with {rc}")
+
+
+@contextlib.contextmanager
+def _compressed(path, method, level):
+    """Binary writer compressing into path: zstandard (threads) / zstd tool, pigz / gzip, or plain."""
+    if method == "zstd" and zstandard is not None:
+        with open(path, "wb") as f:
+            w = zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(f, closefd=False)
+            yield w
+            w.close()
+        return
+    tool = {"zstd": ["zstd", "-T0", f"-{level}", "-q", "-c"],
+            "gzip": ["pigz", f"-{min(level, 9)}", "-c"]}.get(method)
+    if tool and shutil.which(tool[0]):
+        w = _ToolWriter([shutil.which(tool[0]), *tool[1:]], path)
+        try:
+            yield w
+        finally:
+            w.close()
+        return
+    if method == "gzip":
+        with gzip.open(path, "wb", compresslevel=min(level, 9)) as w:
+            yield w
+        return
+    if method == "zstd":
+        raise BackupError("zstd compression needs the zstd tool or the zstandard package")
+    with open(path, "wb") as w:
+        yield w
+
+
+def resolve_method(method) -> str:
+    """method, or gzip if zstd was asked for and neither zstandard nor the zstd tool is available."""
+    if method == "zstd" and zstandard is None and not shutil.which("zstd"):
+        return "gzip"
+    return method if method in COMPRESS else "zstd"
+
+
+# --------------------
+# One partition
+# --------------------
+class PartitionSink:
+    """
+    consume(f) for mtk_wrapper.readback_stream: turns the raw read-back of
+    one partition into the sparse, compressed backup file while hashing it.
+    """
+
+    def __init__(self, path, length, method="zstd", level=3):
+        if length <= 0 or length % 512:
+            raise BackupError(f"partition length {length} is not a multiple of 512")
+        self.path = Path(path)
+        self.length = length
+        self.method = method
+        self.level = level
+        self.block = 4096 if length % 4096 == 0 else 512
+        self.sha256 = None
+        self.bytes = 0          # raw bytes read back
+        self.zero_bytes = 0     # of which all-zero regions (not compressed)
+        self.error = None
+
+    def consume(self, f) -> int:
+        tmp = self.path.with_name(self.path.name + ".part")
+        try:
+            self._write(f, tmp)
+        except Exception as e:   # reader thread: report it, the pipe still has to be drained
+            self.error = str(e) or type(e).__name__
+        # keep draining so the writer never blocks on a full pipe
+        while f.read(REGION):
+            pass
+        if self.sha256 is None:
+            tmp.unlink(missing_ok=True)
+        return self.bytes
+
+    def _write(self, f, tmp):
+        h = hashlib.sha256()
+        n = zero = 0
+        chunks = -(-self.length // REGION)
+        with _compressed(tmp, self.method, self.level) as out:
+            out.write(sparse.FILE_HDR.pack(sparse.SPARSE_MAGIC, 1, 0, sparse.FILE_HDR.size,
+                                           sparse.CHUNK_HDR.size, self.block, self.length // self.block,
+                                           chunks, 0))
+            while n < self.length:
+                want = min(REGION, self.length - n)
+                piece = f.read(want)
+                if len(piece) < want:
+                    n += len(piece)
+                    break
+                h.update(piece)
+                blocks = want // self.block
+                if piece == (_ZEROS if want == REGION else bytes(want)):
+                    out.write(sparse.CHUNK_HDR.pack(sparse.CHUNK_FILL, 0, blocks, sparse.CHUNK_HDR.size + 4))
+                    out.write(b"\0\0\0\0")
+                    zero += want
+                else:
+                    out.write(sparse.CHUNK_HDR.pack(sparse.CHUNK_RAW, 0, blocks, sparse.CHUNK_HDR.size + want))
+                    out.write(piece)
+                n += want
+        self.bytes, self.zero_bytes = n, zero
+        if n == self.length:
+            os.replace(tmp, self.path)
+            self.sha256 = h.hexdigest()
+
+
+# --------------------
+# Backup sets
+# --------------------
+def _safe(name) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+def device_dir(device_id) -> Path:
+    return utils.backups_dir() / _safe(device_id or "unknown")
+
+
+def previous(device_id) -> dict | None:
+    """Manifest of the newest complete backup of device_id, or None."""
+    try:
+        runs = sorted((d for d in device_dir(device_id).iterdir() if d.is_dir()), reverse=True)
+    except OSError:
+        return None
+    for d in runs:
+        try:
+            data = json.loads((d / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if data.get("ok"):
+            return data
+    return None
+
+
+def estimate(partitions, table: dict, device_id=None) -> dict:
+    """
+    Up-front size / time estimate from the partition table: read speed and
+    compression ratio of the device's last backup, else backup_read_mbps.
+    {"bytes", "stored_bytes" (None if unknown), "seconds", "missing"}.
+    """
+    s = utils.get_backup_settings()
+    last = previous(device_id)
+    rate = s["read_mbps"] * 2**20
+    ratios = {}
+    if last:
+        read = sum(p["bytes"] for p in last["files"].values())
+        secs = sum(p["seconds"] for p in last["files"].values())
+        if read and secs:
+            rate = read / secs
+        ratios = {p["partition"]: p["stored_bytes"] / p["bytes"] for p in last["files"].values() if p["bytes"]}
+    sizes = {p: table[p][1] for p in partitions if p in table}
+    stored = None
+    if sizes and all(p in ratios for p in sizes):
+        stored = int(sum(n * ratios[p] for p, n in sizes.items()))
+    total = sum(sizes.values())
+    return {"bytes": total, "stored_bytes": stored, "seconds": total / rate if rate else None,
+            "missing": [p for p in partitions if p not in table]}
+
+
+def describe_estimate(partitions, est: dict) -> str:
+    parts = ", ".join(p for p in partitions if p not in est["missing"])
+    s = f"Backup of {parts}: {est['bytes'] / 2**30:.2f} GiB to read"
+    if est["stored_bytes"] is not None:
+        s += f", ~{est['stored_bytes'] / 2**20:.0f} MiB on disk"
+    if est["seconds"] is not None:
+        secs = est["seconds"]
+        s += f", ~{secs:.0f} s" if secs < 90 else f", ~{secs / 60:.1f} min"
+    return s
+
+
+def preview(partitions, device_id=None) -> str:
+    """Estimate line before anything runs, from the sizes in the device's last backup."""
+    last = previous(device_id)
+    table = {f["partition"]: (0, f["bytes"]) for f in last["files"].values()} if last else {}
+    if partitions and all(p in table for p in partitions):
+        return describe_estimate(partitions, estimate(partitions, table, device_id))
+    return f"Backup of {', '.join(partitions)} first (size and time follow once the partition table is read)"
+
+
+class BackupSet:
+    """One backup run: a timestamped folder, one PartitionSink per partition, then the manifest."""
+
+    def __init__(self, device_id=None, settings: dict | None = None):
+        s = settings or utils.get_backup_settings()
+        self.device_id = device_id
+        self.method = resolve_method(s["compress"])
+        self.level = s["level"]
+        self.dir = device_dir(device_id) / time.strftime("%Y%m%d-%H%M%S")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.files = {}
+        self.failed = []
+
+    def sink(self, partition, length) -> PartitionSink:
+        return PartitionSink(self.dir / (_safe(partition) + SUFFIXES[self.method]), length, self.method, self.level)
+
+    def add(self, partition, sink: PartitionSink, seconds: float) -> str:
+        """Record a finished partition; returns its log line."""
+        if sink.sha256 is None:
+            self.failed.append(partition)
+            return f"[{partition}] backup FAILED: {sink.error or f'read {sink.bytes} of {sink.length} bytes'}"
+        stored = sink.path.stat().st_size
+        self.files[sink.path.name] = {
+            "partition": partition, "bytes": sink.length, "raw_sha256": sink.sha256,
+            "sha256": verify.sha256_file(sink.path), "stored_bytes": stored,
+            "zero_bytes": sink.zero_bytes, "seconds": round(seconds, 3)}
+        return (f"[{partition}] backed up {sink.length / 2**20:.1f} MiB -> {stored / 2**20:.1f} MiB "
+                f"({sink.zero_bytes / sink.length:.0%} zero) in {seconds:.1f} s")
+
+    def finish(self) -> dict:
+        """Write manifest.json (its "files" map is also what verify.py checks); returns it."""
+        manifest = {"device": self.device_id, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "format": FORMAT, "compress": self.method, "region": REGION,
+                    "ok": not self.failed, "failed": self.failed, "files": self.files}
+        tmp = self.dir / (MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp, self.dir / MANIFEST_NAME)
+        manifest["dir"] = str(self.dir)
+        return manifest
+
+
+def default_partitions(plan, include_super=None) -> list:
+    """Partitions of a restore plan to back up: all but super/system unless include_super (default config backup_super)."""
+    if include_super is None:
+        include_super = utils.get_backup_settings()["super"]
+    return [p for p, _ in plan if include_super or p not in ("super", "system")]
@@ -0,0 +1,70 @@
+# bench/bench_cli_startup.py
+# Startup cost of the headless CLI (phoenixr1.py).
+#
+#   python bench/bench_cli_startup.py --runs 10
+#
+# For each command: median wall time of a full process run, and the
+# modules it pulled in that matter (Qt, asyncio, mtk_wrapper), from
+# `python -X importtime`. Prints JSON.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "phoenixr1.py")
+COMMANDS = [["--help"], ["scan", "--json"], ["status", "--json"], ["verify", "--json"]]
+WATCH = ("PySide6", "asyncio", "mtk_wrapper", "mtk_async", "jobs")
+
+
+def wall(cmd, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, CLI] + cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def imports(cmd):
+    """(total import µs, watched modules that were imported)."""
+    p = subprocess.run([sys.executable, "-X", "importtime", CLI] + cmd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total, seen = 0, set()
+    for line in p.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # header / unrelated stderr
+        field = parts[2]
+        if field[1:2] != " ":
+            total += int(parts[1])  # top-level imports only (nested ones are indented)
+        top = field.strip().split(".")[0]
+        if top in WATCH:
+            seen.add(top)
+    return total, sorted(seen)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="phoenixr1 CLI startup benchmark")
+    ap.add_argument("--runs", type=int, default=5)
+    a = ap.parse_args(argv)
+    times = []
+    for _ in range(a.runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        times.append(time.perf_counter() - t0)
+    res = {"python": sys.version.split()[0], "interpreter_s": round(statistics.median(times), 3), "commands": []}
+    for cmd in COMMANDS:
+        total_us, seen = imports(cmd)
+        res["commands"].append({"command": " ".join(cmd), "median_s": round(wall(cmd, a.runs), 3),
+                                "imports_ms": round(total_us / 1000, 1), "heavy_imports": seen})
+    print(json.dumps(res, indent=2))
+    return 1 if any("PySide6" in c["heavy_imports"] for c in res["commands"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# bench/bench_log_transport.py
+# Sustained lines/sec through LogTransport with a UI-like consumer.
+#
+#   python bench/bench_log_transport.py --producers 2 --seconds 5 --target-ms 50
+#
+# Producers push as fast as they can (like mtkclient in debug mode). The
+# consumer drains on a fixed FRAME_MS cadence and spends render_us per line
+# to stand in for LogView. Reported latency is push -> drain per line; the
+# run passes if p99 stays under --target-ms.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_transport import LogTransport  # noqa: E402
+
+FRAME_MS = 33
+MAX_BATCH = 2000
+
+
+def run(producers=2, seconds=5.0, capacity=20000, policy="drop_oldest",
+        render_us=2.0, target_ms=50.0, rate=0):
+    tr = LogTransport(capacity=capacity, policy=policy)
+    stop = threading.Event()
+    latencies = []
+    frame_times = []
+
+    def produce():
+        clock = time.perf_counter
+        gap = 1.0 / rate if rate else 0.0
+        nxt = clock()
+        while not stop.is_set():
+            tr.push(clock(), "info")  # payload is the push timestamp
+            if gap:
+                nxt += gap
+                delay = nxt - clock()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def consume():
+        clock = time.perf_counter
+        while not stop.is_set():
+            t0 = clock()
+            batch = tr.drain(MAX_BATCH)
+            now = clock()
+            for ts, _ in batch:
+                latencies.append(now - ts)
+            # simulated render cost
+            spin_until = now + len(batch) * render_us / 1e6
+            while clock() < spin_until:
+                pass
+            frame_times.append(clock() - t0)
+            left = FRAME_MS / 1000 - (clock() - t0)
+            if left > 0:
+                time.sleep(left)
+
+    threads = [threading.Thread(target=produce, daemon=True) for _ in range(producers)]
+    ui = threading.Thread(target=consume, daemon=True)
+    start = time.perf_counter()
+    ui.start()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads + [ui]:
+        t.join(2)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    frame_times.sort()
+
+    def pct(vals, p):
+        return vals[min(len(vals) - 1, int(len(vals) * p))] * 1000 if vals else 0.0
+
+    res = {
+        "producers": producers,
+        "policy": policy,
+        "capacity": capacity,
+        "seconds": round(elapsed, 3),
+        "lines_per_sec": round(tr.drained / elapsed),
+        "p50_latency_ms": round(pct(latencies, 0.50), 2),
+        "p99_latency_ms": round(pct(latencies, 0.99), 2),
+        "p99_frame_ms": round(pct(frame_times, 0.99), 2),
+        "target_ms": target_ms,
+        **tr.stats(),
+    }
+    res["pass"] = res["p99_latency_ms"] <= target_ms and res["p99_frame_ms"] <= target_ms
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LogTransport throughput / UI latency benchmark")
+    ap.add_argument("--producers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--capacity", type=int, default=20000)
+    ap.add_argument("--policy", choices=["drop_oldest", "block"], default="drop_oldest")
+    ap.add_argument("--render-us", type=float, default=2.0, help="simulated render cost per line")
+    ap.add_argument("--rate", type=int, default=0, help="lines/sec per producer (0 = unthrottled)")
+    ap.add_argument("--target-ms", type=float, default=50.0)
+    a = ap.parse_args(argv)
+    res = run(a.producers, a.seconds, a.capacity, a.policy, a.render_us, a.target_ms, a.rate)
+    print(json.dumps(res, indent=2))
+    return 0 if res["pass"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# bench/bench_pipeline.py
+# Lines/sec through the output pipeline, stage by stage:
+#
+#   classify   events.classify() on a corpus of real-looking mtkclient lines
+#   stream     fake mtk `flood` -> mtk_async -> mtk_wrapper._run (splitting, progress parsing)
+#   engine     the same through jobs.JobEngine into a LogTransport (the GUI path)
+#   logged     engine + per-run log file + structured event log (what the app does)
+#   render     LogTransport -> LogStore -> LogView (only if PySide6 is installed; offscreen)
+#
+#   python bench/bench_pipeline.py --lines 200000
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_mtk  # noqa: E402  (bench/, the script's own directory)
+
+CORPUS = [
+    "Preloader - Status: Handshake ok",
+    "Port - Device detected :)",
+    "DAXFlash - Successfully uploaded stage 2",
+    "DAXFlash - [LIB]: usb write 0x1A000 len 0x200 ok",
+    "Progress: |██████████----------| 50.0% Write (Sector 0x1A00 of 0x3400, ) 40.00 MB/s",
+    "Wrote boot.img to sector 0 with sector count 0x16E3.",
+    "Error: Failed to write super.img to super.",
+    "USBError(5, 'Input/Output Error')",
+    "[super] verify PASS (12.3 s)",
+    "Rebooting to bootloader",
+]
+
+
+def bench_classify(lines):
+    import events
+    t0 = time.perf_counter()
+    for text in itertools.islice(itertools.cycle(CORPUS), lines):
+        events.classify(text)
+    return {"lines_per_sec": round(lines / (time.perf_counter() - t0))}
+
+
+def bench_stream(lines):
+    import mtk_wrapper as mtk
+    got = {"lines": 0, "progress": 0}
+
+    def on_progress(ev):
+        got["progress"] += 1
+
+    t0 = time.perf_counter()
+    for _ in mtk.run_mtk_command(["flood", str(lines)], on_progress=on_progress):
+        got["lines"] += 1
+    secs = time.perf_counter() - t0
+    return {"lines_per_sec": round((got["lines"] + got["progress"]) / secs), "progress_events": got["progress"],
+            "seconds": round(secs, 3)}
+
+
+def bench_engine(lines, logged=False, tmp=None):
+    import events
+    import jobs
+    import mtk_wrapper as mtk
+    from log_transport import LogTransport
+    tr = LogTransport()
+    stop = threading.Event()
+
+    def ui():
+        while not stop.is_set():
+            tr.drain(2000)
+            time.sleep(0.033)
+
+    kw = {}
+    if logged:
+        kw["log_path"] = lambda job: os.path.join(tmp, f"run_{job.id}.txt")
+        kw["event_log"] = events.EventLog(os.path.join(tmp, "events"), index=False)
+    engine = jobs.JobEngine(on_line=lambda job, text, level: tr.push(text, level), **kw)
+    t = threading.Thread(target=ui, daemon=True)
+    t.start()
+    t0 = time.perf_counter()
+    job = engine.submit("bench", "flood", lambda job: mtk.run_mtk_command(["flood", str(lines)]))
+    engine.wait()
+    secs = time.perf_counter() - t0
+    if logged:
+        import disk_log
+        disk_log.get_writer().flush(30)
+    total = time.perf_counter() - t0
+    stop.set()
+    t.join(1)
+    return {"lines_per_sec": round(job.line_count / secs), "state": job.state,
+            "seconds": round(secs, 3), "flushed_s": round(total, 3), "dropped": tr.dropped}
+
+
+def bench_render(lines):
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        return {"skipped": "PySide6 not installed"}
+    from log_transport import LogTransport
+    from log_view import LogStore, LogView
+    app = QApplication.instance() or QApplication([])
+    tr = LogTransport(capacity=lines + 1)
+    view = LogView(LogStore(5000), tr)
+    view._timer.stop()
+    for text in itertools.islice(itertools.cycle(CORPUS), lines):
+        tr.push(text, "info")
+    app.processEvents()  # settle the setup events so they don't land in the first frame
+    t0 = time.perf_counter()
+    frames = 0
+    while len(tr):  # each _drain() is one frame: up to MAX_BATCH lines rendered
+        view._drain()
+        frames += 1
+    secs = time.perf_counter() - t0
+    return {"lines_per_sec": round(lines / secs), "frames": frames, "ms_per_frame": round(secs / frames * 1000, 2)}
+
+
+def run(lines=200000):
+    res = {"lines": lines}
+    res["classify"] = bench_classify(lines)
+    with tempfile.TemporaryDirectory(prefix="phoenix_pipe_") as td:
+        fake_mtk.install(td)
+        res["stream"] = bench_stream(lines)
+        res["engine"] = bench_engine(lines)
+        res["logged"] = bench_engine(lines, logged=True, tmp=td)
+    res["render"] = bench_render(min(lines, 50000))
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Output pipeline throughput benchmark")
+    ap.add_argument("--lines", type=int, default=200000)
+    a = ap.parse_args(argv)
+    print(json.dumps(run(a.lines), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# bench/bench_scan.py
+# utils.list_firmware_images() time vs firmware tree size.
+#
+#   python bench/bench_scan.py --sizes 1,2,3,4 --breadth 4 --files 20
+#
+# For each depth in --sizes a tree is generated (bench/make_fw_tree.py,
+# images in the deepest folder) and scanned three ways:
+#   cold     no index (first launch)
+#   warm     index fresh (every later launch / Refresh)
+#   touched  one folder changed since the index was saved
+# The app's own folder and index file are redirected to a temp dir, so the
+# numbers only cover the generated tree. Prints JSON.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import make_fw_tree  # noqa: E402  (bench/, the script's own directory)
+import utils  # noqa: E402
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return round(statistics.median(times) * 1000, 2)
+
+
+def run(sizes=(1, 2, 3), breadth=4, files=20, repeat=5):
+    out = []
+    with tempfile.TemporaryDirectory(prefix="phoenix_scan_") as td:
+        app = Path(td) / "app"
+        app.mkdir()
+        utils._app_dir = lambda: app          # keep the repo folder and its index out of it
+        for depth in sizes:
+            root = os.path.join(td, f"fw_d{depth}")
+            tree = make_fw_tree.generate(root, depth=depth, breadth=breadth, files=files, image_mb=0.25)
+
+            def cold():
+                utils._fw_index = None
+                utils._fw_index_path().unlink(missing_ok=True)
+                return utils.list_firmware_images(root)
+
+            found = cold()
+            cold_ms = _timed(cold, repeat)
+            warm_ms = _timed(lambda: utils.list_firmware_images(root), repeat)
+
+            leaf = Path(tree["images"]["boot.img"]).parent
+            n = [0]
+
+            def touched():
+                n[0] += 1
+                (leaf / f"touch_{n[0]}.txt").write_bytes(b"")
+                return utils.list_firmware_images(root)
+
+            touched_ms = _timed(touched, repeat)
+            out.append({"depth": depth, "dirs": tree["dirs"], "files": tree["files"],
+                        "found": sum(1 for v in found.values() if v),
+                        "cold_ms": cold_ms, "warm_ms": warm_ms, "touched_ms": touched_ms,
+                        "cold_us_per_dir": round(cold_ms * 1000 / tree["dirs"], 1)})
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Firmware folder scan benchmark")
+    ap.add_argument("--sizes", default="1,2,3", help="tree depths to generate")
+    ap.add_argument("--breadth", type=int, default=4)
+    ap.add_argument("--files", type=int, default=20, help="decoy files per folder")
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args(argv)
+    res = run([int(s) for s in a.sizes.split(",")], a.breadth, a.files, a.repeat)
+    print(json.dumps(res, indent=2))
+    return 0 if all(r["found"] == 4 for r in res) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
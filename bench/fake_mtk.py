@@ -0,0 +1,262 @@
+# bench/fake_mtk.py
+# Stand-in for the mtkclient CLI, for station / pipeline testing without hardware.
+#
+# Behaviour is read from the JSON file named by $FAKE_MTK_CONFIG:
+#   {
+#     "default": {"handshake_s": 0.5, "mbps": 40},
+#     "1-2":     {"mbps": 10, "fail": ["super"]}      # per device port
+#   }
+# Profile keys (defaults in DEFAULTS):
+#   detect_s       wait for the device ("Waiting for PreLoader VCOM") before it is found
+#   handshake_s    preloader handshake + DA upload, after the device is found
+#   mbps, jitter   write/read speed in MB/s, +- jitter as a fraction (per command)
+#   progress_hz    "\r" progress-bar redraws per second while writing / reading
+#   chatter        extra debug lines per redraw (mtkclient with --debugmode)
+#   fail           partitions whose write fails ("Error: Failed to write ...", exit 1)
+#   fail_rate      chance per command of a transient USB error mid-transfer (exit 1)
+#   hang           partitions whose write stalls at 50% with no more output
+#   exit_code      forced exit code for every command
+# The device is taken from $PHOENIX_DEVICE_PORT (set by mtk_wrapper.target_device).
+# If $FAKE_MTK_STATE names a directory, written images are remembered per
+# device and partition so that `ro` reads them back (read-back verify passes).
+#
+# Supported commands: w, wo, ro, e, reset, printgpt, plus `flood <lines>`
+# (as much output as possible, for pipeline benchmarks); anything else
+# just handshakes.
+
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+import time
+
+DEFAULTS = {"detect_s": 0.0, "handshake_s": 0.5, "mbps": 40.0, "jitter": 0.0, "progress_hz": 10.0,
+            "chatter": 0, "fail": [], "fail_rate": 0.0, "hang": [], "exit_code": None}
+
+GPT = [("vbmeta", 0x100000), ("boot", 0x4000000), ("super", 0x100000000),
+       ("vendor", 0x40000000), ("userdata", 0x200000000)]
+
+
+def _profile():
+    cfg = {}
+    path = os.environ.get("FAKE_MTK_CONFIG")
+    if path and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            cfg = json.load(f)
+    prof = dict(DEFAULTS)
+    prof.update(cfg.get("default", {}))
+    prof.update(cfg.get(os.environ.get("PHOENIX_DEVICE_PORT", ""), {}))
+    return prof
+
+
+def install(bindir):
+    """Put an `mtk` launcher for this script first on PATH (for the current process and its children)."""
+    me = os.path.abspath(__file__)
+    if os.name == "nt":
+        with open(os.path.join(bindir, "mtk.bat"), "w") as f:
+            f.write(f'@"{sys.executable}" "{me}" %*\n')
+    else:
+        p = os.path.join(bindir, "mtk")
+        with open(p, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{me}" "$@"\n')
+        os.chmod(p, os.stat(p).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bindir + os.pathsep + os.environ.get("PATH", "")
+
+
+def _out(text):
+    sys.stdout.write(text + "\n")
+    sys.stdout.flush()
+
+
+def _bar(pct, done, total, rate, op="Write"):
+    filled = int(pct / 2)
+    return (f"\rProgress: |{'█' * filled}{'-' * (50 - filled)}| {pct:.1f}% {op} "
+            f"(Sector 0x{done // 512:X} of 0x{total // 512:X}, ) {rate:.2f} MB/s")
+
+
+def _rate(prof):
+    rate = float(prof["mbps"])
+    if prof["jitter"]:
+        rate *= max(0.05, 1 + random.uniform(-1, 1) * float(prof["jitter"]))
+    return rate
+
+
+def _transfer(name, size, prof, op="Write"):
+    """Progress bars for moving `size` bytes. Returns False if the transfer broke off."""
+    rate = _rate(prof)
+    secs = size / (rate * 1024 * 1024) if rate else 0
+    steps = max(1, int(secs * float(prof["progress_hz"])))
+    # a transient fault, if any, hits somewhere in the middle
+    fault = random.randint(1, steps) if random.random() < float(prof["fail_rate"]) else None
+    sys.stdout.write(_bar(0.0, 0, size, 0.0, op))
+    sys.stdout.flush()
+    t0 = time.monotonic()
+    for i in range(1, steps + 1):
+        left = t0 + secs * i / steps - time.monotonic()
+        if left > 0:
+            time.sleep(left)
+        if i == fault:
+            sys.stdout.write("\n")
+            _out("USBError(5, 'Input/Output Error')")
+            _out(f"Error: {op} of {name} failed.")
+            return False
+        if name in prof["hang"] and i * 2 >= steps:
+            sys.stdout.flush()
+            time.sleep(10 ** 6)  # stalled: no more output, never exits on its own
+        done = size * i // steps
+        sys.stdout.write(_bar(100.0 * i / steps, done, size, rate, op))
+        for n in range(int(prof["chatter"])):
+            sys.stdout.write(f"\nDAXFlash - [LIB]: usb write 0x{done:X} chunk {n}")
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+    return True
+
+
+# ---- remembered writes (for `ro`) ----
+def _state_path(part):
+    d = os.environ.get("FAKE_MTK_STATE")
+    if not d:
+        return None
+    dev = "".join(c if c.isalnum() or c in "-_." else "_" for c in os.environ.get("PHOENIX_DEVICE_PORT", "-"))
+    os.makedirs(os.path.join(d, dev), exist_ok=True)
+    return os.path.join(d, dev, f"{part}.json")
+
+
+def _remember(part, path, size):
+    p = _state_path(part)
+    if p and not stat.S_ISFIFO(os.stat(path).st_mode):
+        # keep the data like a device would: the written file may be a temp file that goes away
+        data = p[:-len(".json")] + ".img"
+        try:
+            os.unlink(data)
+        except OSError:
+            pass
+        try:
+            os.link(path, data)
+        except OSError:
+            shutil.copyfile(path, data)
+        with open(p, "w") as f:
+            json.dump({"path": data, "size": size}, f)
+
+
+def _recall(part):
+    p = _state_path(part)
+    if p and os.path.isfile(p):
+        with open(p) as f:
+            return json.load(f)
+    return None
+
+
+def _size(path):
+    st = os.stat(path)
+    if stat.S_ISFIFO(st.st_mode):
+        return None  # streamed (unsparsed through a pipe): size known only after reading
+    return st.st_size
+
+
+def _write(part, path, prof):
+    if part in prof["fail"]:
+        _out(f"Error: Failed to write {os.path.basename(path)} to {part}.")
+        return False
+    size = _size(path) if os.path.exists(path) else 0
+    if size is None:
+        with open(path, "rb") as f:
+            size = sum(len(b) for b in iter(lambda: f.read(1 << 20), b""))
+    if not _transfer(part, size, prof):
+        return False
+    _remember(part, path, size)
+    _out(f"Wrote {os.path.basename(path)} to sector 0 with sector count 0x{size // 512:X}.")
+    return True
+
+
+def _read(part, offset, length, target, prof):
+    if not _transfer(part, length, prof, op="Read"):
+        return False
+    src = _recall(part)
+    with open(target, "wb") as out:
+        left = length
+        if src and os.path.isfile(src["path"]):
+            with open(src["path"], "rb") as f:
+                f.seek(offset)
+                while left > 0:
+                    buf = f.read(min(left, 1 << 20))
+                    if not buf:
+                        break
+                    out.write(buf)
+                    left -= len(buf)
+        zeros = bytes(1 << 20)
+        while left > 0:
+            out.write(zeros[:min(left, len(zeros))])
+            left -= min(left, len(zeros))
+    _out(f"Dumped sector {offset // 512} with sector count {length // 512} as {os.path.basename(target)}.")
+    return True
+
+
+def _flood(lines):
+    """Output as fast as possible: mostly log lines, every 10th a progress redraw."""
+    total = max(lines, 1) * 512
+    w = sys.stdout.write
+    for i in range(lines):
+        if i % 10 == 9:
+            w(_bar(100.0 * i / lines, i * 512, total, 40.0))
+        else:
+            w(f"\nDAXFlash - [LIB]: usb write 0x{i * 512:X} len 0x200 ok")
+    w("\nDone.\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    prof = _profile()
+    dev = os.environ.get("PHOENIX_DEVICE_PORT", "-")
+    _out(f"MTK Flash/Exploit Client (fake) on {dev}")
+    if argv[:1] == ["flood"]:
+        _flood(int(argv[1]) if len(argv) > 1 else 100000)
+        return 0
+    if float(prof["detect_s"]):
+        _out("Preloader - Status: Waiting for PreLoader VCOM, please connect mobile")
+        time.sleep(float(prof["detect_s"]))
+    _out("Port - Device detected :)")
+    time.sleep(float(prof["handshake_s"]))
+    _out("Preloader - Status: Handshake ok")
+    _out("DAXFlash - Successfully uploaded stage 2")
+    rc = _command(argv, prof)
+    return prof["exit_code"] if prof["exit_code"] is not None else rc
+
+
+def _command(argv, prof):
+    if not argv:
+        return 0
+    cmd = argv[0]
+    if cmd == "w":
+        parts, files = argv[1].split(","), argv[2].split(",")
+        for part, path in zip(parts, files):
+            if not _write(part, path, prof):
+                return 1
+        return 0
+    if cmd == "wo":
+        # wo <offset> <length> <file>: partial write at an absolute offset
+        return 0 if _write("wo", argv[3], prof) else 1
+    if cmd == "ro":
+        # ro <partition> <offset> <length> <file>
+        return 0 if _read(argv[1], int(argv[2], 0), int(argv[3], 0), argv[4], prof) else 1
+    if cmd == "e":
+        time.sleep(0.2)
+        _out(f"Formatted {argv[1]}.")
+        return 0
+    if cmd == "printgpt":
+        off = 0x100000
+        for name, size in GPT:
+            _out(f"{name}:{' ' * (20 - len(name))}Offset 0x{off:016x}, Length 0x{size:016x}, "
+                 f"Flags 0x00000000, UUID 00000000-0000-0000-0000-000000000000, Type EFI_BASIC_DATA")
+            off += size
+        return 0
+    if cmd == "reset":
+        _out("Reset done.")
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+# bench/make_fw_tree.py
+# Synthetic firmware folders for benchmarks: a directory tree of
+# configurable depth / fan-out full of decoy files, with the R1 images
+# somewhere in it.
+#
+#   python bench/make_fw_tree.py /tmp/fw --depth 3 --breadth 4 --files 20 --image-mb 64
+#
+# fill: "hole" (sparse files via truncate; instant, reads as zeros),
+# "zero", "random" (real data, for hashing / verify runs) or "simg"
+# (super as an Android sparse image, for the unsparse path).
+# layout: where the images go — "root", "deep" (the last leaf),
+# "scattered" (one per branch) or "none" (worst case for scans).
+
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sparse  # noqa: E402
+
+IMAGES = ["vbmeta.img", "boot.img", "super.img", "vendor.img"]
+DECOY_EXT = [".txt", ".bin", ".img", ".xml", ".cfg", ".log", ".zip"]
+DECOY_NAMES = ["recovery", "lk", "preloader", "md1img", "scp", "tee", "logo", "dtbo", "spmfw", "sspm"]
+BLOCK = 4096
+
+
+def _write_data(path, size, fill, rnd):
+    with open(path, "wb") as f:
+        if fill == "hole":
+            f.truncate(size)
+            return
+        left = size
+        piece = bytes(1 << 20) if fill == "zero" else None
+        while left > 0:
+            n = min(left, 1 << 20)
+            f.write(piece[:n] if piece else rnd.randbytes(n))
+            left -= n
+
+
+def write_simg(path, size, rnd, data_ratio=0.3, run_blocks=256):
+    """Android sparse image of `size` bytes: runs of RAW (random) data between DONT_CARE gaps."""
+    total = -(-size // BLOCK)
+    chunks = []
+    blk = 0
+    while blk < total:
+        n = min(run_blocks, total - blk)
+        chunks.append((sparse.CHUNK_RAW if rnd.random() < data_ratio else sparse.CHUNK_DONT_CARE, n))
+        blk += n
+    with open(path, "wb") as f:
+        f.write(sparse.FILE_HDR.pack(sparse.SPARSE_MAGIC, 1, 0, sparse.FILE_HDR.size, sparse.CHUNK_HDR.size,
+                                     BLOCK, total, len(chunks), 0))
+        for ctype, n in chunks:
+            payload = n * BLOCK if ctype == sparse.CHUNK_RAW else 0
+            f.write(sparse.CHUNK_HDR.pack(ctype, 0, n, sparse.CHUNK_HDR.size + payload))
+            if payload:
+                f.write(rnd.randbytes(payload))
+
+
+def _dirs(root, depth, breadth):
+    """All directories of the tree, pre-order (root first)."""
+    out = [root]
+    level = [root]
+    for d in range(depth):
+        nxt = []
+        for parent in level:
+            for b in range(breadth):
+                nxt.append(os.path.join(parent, f"d{d}_{b}"))
+        out.extend(nxt)
+        level = nxt
+    return out
+
+
+def generate(root, depth=2, breadth=3, files=10, image_mb=8.0, fill="hole", layout="deep", seed=1) -> dict:
+    """Create the tree under root; returns counts and where the images ended up."""
+    rnd = random.Random(seed)
+    dirs = _dirs(root, depth, breadth)
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+        for i in range(files):
+            name = f"{rnd.choice(DECOY_NAMES)}_{i}{rnd.choice(DECOY_EXT)}"
+            with open(os.path.join(d, name), "wb") as f:
+                f.write(rnd.randbytes(rnd.randint(0, 256)))
+
+    if layout == "root":
+        homes = [root] * len(IMAGES)
+    elif layout == "deep":
+        homes = [dirs[-1]] * len(IMAGES)
+    elif layout == "scattered":
+        homes = [dirs[min(len(dirs) - 1, (i + 1) * len(dirs) // (len(IMAGES) + 1))] for i in range(len(IMAGES))]
+    else:
+        homes = []
+    sizes = {"vbmeta.img": 64 * 1024, "boot.img": int(image_mb * 2**20) // 4,
+             "super.img": int(image_mb * 2**20), "vendor.img": int(image_mb * 2**20) // 4}
+    images = {}
+    for name, home in zip(IMAGES, homes):
+        p = os.path.join(home, name)
+        if fill == "simg" and name == "super.img":
+            write_simg(p, sizes[name], rnd)
+        else:
+            _write_data(p, sizes[name], "random" if fill == "simg" else fill, rnd)
+        images[name] = p
+    return {"root": root, "dirs": len(dirs), "files": len(dirs) * files + len(images), "images": images}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic firmware tree")
+    ap.add_argument("root")
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--breadth", type=int, default=3)
+    ap.add_argument("--files", type=int, default=10, help="decoy files per directory")
+    ap.add_argument("--image-mb", type=float, default=8.0, help="size of super.img (boot/vendor are 1/4)")
+    ap.add_argument("--fill", choices=["hole", "zero", "random", "simg"], default="hole")
+    ap.add_argument("--layout", choices=["root", "deep", "scattered", "none"], default="deep")
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args(argv)
+    res = generate(a.root, a.depth, a.breadth, a.files, a.image_mb, a.fill, a.layout, a.seed)
+    print(json.dumps(res, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
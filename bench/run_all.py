@@ -0,0 +1,165 @@
+# bench/run_all.py
+# The benchmark suite in one go, with saved results for regression checks.
+#
+#   python bench/run_all.py                 # run, save to bench/results/, compare with the last run
+#   python bench/run_all.py --quick         # smaller sizes (a minute or less)
+#   python bench/run_all.py --baseline bench/results/<file>.json --threshold 30
+#
+# Every run is saved as bench/results/<YYYYmmdd-HHMMSS>_<git rev>.json.
+# Numbers are flattened to dotted keys ("pipeline.engine.lines_per_sec");
+# keys ending in _per_sec / mbps are better when higher, _s / _ms when
+# lower. The headline numbers (HEADLINE) are compared, every number with
+# --all; a change worse than --threshold percent is a regression (exit
+# code 1). Only compare runs from the same machine.
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+RESULTS = os.path.join(HERE, "results")
+sys.path.insert(0, ROOT)
+
+import bench_cli_startup  # noqa: E402  (bench/, the script's own directory)
+import bench_log_transport  # noqa: E402
+import bench_pipeline  # noqa: E402
+import bench_restore  # noqa: E402
+import bench_scan  # noqa: E402
+import station_sim  # noqa: E402
+
+HIGHER = ("_per_sec", "mbps")
+LOWER = ("_s", "_ms")
+HEADLINE = ["pipeline.*.lines_per_sec", "scan.*.cold_ms", "scan.*.warm_ms", "restore*.wall_s",
+            "restore*.overhead_s", "restore*.timings.mbps", "station.makespan_s", "transport.lines_per_sec",
+            "transport.p99_latency_ms", "cli.commands.*.median_s"]
+
+
+def _quiet(fn, *args, **kw):
+    """Run a bench main() that prints JSON; return the parsed JSON."""
+    import contextlib
+    import io
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        fn(*args, **kw)
+    return json.loads(buf.getvalue())
+
+
+def suite(quick=False) -> dict:
+    lines = 50000 if quick else 200000
+    mb = 16 if quick else 64
+    res = {}
+    res["pipeline"] = bench_pipeline.run(lines)
+    res["scan"] = {f"depth{r['depth']}": r for r in bench_scan.run((2, 3) if quick else (2, 3, 4))}
+    res["restore"] = bench_restore.run(image_mb=mb, verify=True, wipe=True)
+    res["restore_simg"] = bench_restore.run(image_mb=mb, simg=True)
+    res["station"] = _quiet(station_sim.main, ["--devices", "4", "--concurrency", "2",
+                                               "--super-mb", str(mb // 2)])
+    res["transport"] = bench_log_transport.run(seconds=1.0 if quick else 3.0)
+    res["cli"] = _quiet(bench_cli_startup.main, ["--runs", "3" if quick else "5"])
+    return res
+
+
+def flatten(obj, prefix="") -> dict:
+    out = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            out.update(flatten(v, f"{prefix}{k}."))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = v.get("command") or v.get("port") if isinstance(v, dict) else None
+            out.update(flatten(v, f"{prefix}{key or i}."))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix[:-1]] = obj
+    return out
+
+
+def _direction(key) -> int:
+    """+1 higher is better, -1 lower is better, 0 not compared."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER):
+        return 1
+    if leaf.endswith(LOWER) and not leaf.startswith("target"):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float, everything=False) -> list:
+    """[(key, old, new, change %, regressed)] for comparable keys present in both."""
+    a, b = flatten(old.get("results", old)), flatten(new.get("results", new))
+    rows = []
+    for key in sorted(set(a) & set(b)):
+        d = _direction(key)
+        if not everything and not any(fnmatch.fnmatchcase(key, p) for p in HEADLINE):
+            continue
+        if not d or not a[key]:
+            continue
+        change = (b[key] - a[key]) / abs(a[key]) * 100
+        rows.append((key, a[key], b[key], change, change * d < -threshold))
+    return rows
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or "nogit"
+    except (OSError, subprocess.SubprocessError):
+        return "nogit"
+
+
+def _latest(exclude=None):
+    try:
+        files = sorted(f for f in os.listdir(RESULTS) if f.endswith(".json"))
+    except OSError:
+        return None
+    files = [os.path.join(RESULTS, f) for f in files if os.path.join(RESULTS, f) != exclude]
+    return files[-1] if files else None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PhoenixR1 benchmark suite")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes")
+    ap.add_argument("--baseline", help="results file to compare with (default: the previous run)")
+    ap.add_argument("--threshold", type=float, default=20.0, help="regression threshold, percent (microbenchmarks jitter ~10%%)")
+    ap.add_argument("--all", action="store_true", help="compare every number, not just the headline ones")
+    ap.add_argument("--no-save", action="store_true")
+    a = ap.parse_args(argv)
+
+    t0 = time.time()
+    doc = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "rev": _git_rev(), "quick": a.quick,
+           "python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count()}
+    doc["results"] = suite(a.quick)
+    doc["duration_s_total"] = round(time.time() - t0, 1)
+
+    path = None
+    if not a.no_save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, f"{time.strftime('%Y%m%d-%H%M%S')}_{doc['rev']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(f"saved {os.path.relpath(path, ROOT)}")
+
+    base = a.baseline or _latest(exclude=path)
+    if not base:
+        print("no earlier results to compare with")
+        return 0
+    with open(base, encoding="utf-8") as f:
+        old = json.load(f)
+    if old.get("quick") != a.quick:
+        print(f"note: {os.path.basename(base)} was a {'quick' if old.get('quick') else 'full'} run")
+    rows = compare(old, doc, a.threshold, a.all)
+    print(f"vs {os.path.basename(base)} (rev {old.get('rev')}):")
+    width = max((len(r[0]) for r in rows), default=10)
+    for key, before, after, change, bad in rows:
+        flag = "  REGRESSION" if bad else ""
+        print(f"  {key:<{width}}  {before:>12g} -> {after:<12g} {change:+7.1f}%{flag}")
+    return 1 if any(r[4] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
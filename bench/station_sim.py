@@ -0,0 +1,85 @@
+# bench/station_sim.py
+# Simulated refurb line: N fake devices restored through station.Station.
+#
+#   python bench/station_sim.py --devices 6 --concurrency 3 --per-bus 2
+#
+# Uses bench/fake_mtk.py as "mtk" (put on PATH for the run) with
+# per-device speed/failure profiles, so scheduling can be tuned without
+# hardware. Prints per-device timing and the overall makespan as JSON.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import device_monitor  # noqa: E402
+import fake_mtk  # noqa: E402  (bench/, the script's own directory)
+import station  # noqa: E402
+
+
+def make_firmware(d, sizes_mb):
+    plan = []
+    for part, mb in sizes_mb:
+        p = os.path.join(d, f"{part}.img")
+        with open(p, "wb") as f:
+            f.truncate(int(mb * 1024 * 1024))
+        plan.append((part, p))
+    return plan
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulated multi-device station run")
+    ap.add_argument("--devices", type=int, default=4)
+    ap.add_argument("--buses", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=2)
+    ap.add_argument("--per-bus", type=int, default=2)
+    ap.add_argument("--mbps", type=float, default=40.0, help="mean simulated write speed")
+    ap.add_argument("--handshake", type=float, default=0.3)
+    ap.add_argument("--super-mb", type=float, default=64)
+    ap.add_argument("--fail", default="", help="comma-separated ports whose super write fails")
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args(argv)
+    rnd = random.Random(a.seed)
+
+    with tempfile.TemporaryDirectory(prefix="phoenix_station_") as td:
+        fake_mtk.install(td)
+        devices = [device_monitor.UsbDevice(port=f"{i % a.buses + 1}-{i // a.buses + 1}", mode="Preloader",
+                                            serial=f"SIM{i:03d}") for i in range(a.devices)]
+        profiles = {"default": {"handshake_s": a.handshake, "mbps": a.mbps}}
+        failing = set(filter(None, a.fail.split(",")))
+        for d in devices:
+            profiles[d.port] = {"mbps": max(1.0, rnd.gauss(a.mbps, a.mbps * 0.25)),
+                                "fail": ["super"] if d.port in failing else []}
+        cfg = os.path.join(td, "fake_mtk.json")
+        with open(cfg, "w") as f:
+            json.dump(profiles, f)
+        os.environ["FAKE_MTK_CONFIG"] = cfg
+
+        plan = make_firmware(td, [("vbmeta", 0.1), ("boot", 8), ("super", a.super_mb), ("vendor", 8)])
+        # fake_mtk picks its device from $PHOENIX_DEVICE_PORT, so jobs really are pinned
+        st = station.Station(concurrency=a.concurrency, per_bus=a.per_bus, selects_device=True)
+        t0 = time.monotonic()
+        jobs = [st.submit_restore(d, plan) for d in devices]
+        st.wait()
+        makespan = time.monotonic() - t0
+
+    res = {
+        "devices": a.devices,
+        "concurrency": a.concurrency,
+        "per_bus": a.per_bus,
+        "makespan_s": round(makespan, 2),
+        "jobs": [{"port": j.device_id, "mbps": round(profiles[j.device_id]["mbps"], 1),
+                  "status": j.status, "elapsed_s": round(j.elapsed, 2)} for j in jobs],
+    }
+    print(json.dumps(res, indent=2))
+    return 0 if all(j.status == station.DONE for j in jobs) or failing else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,8 +17,11 @@ pip install -r requirements.txt
 REM Build single-file exe, console hidden
 pyinstaller --onefile --noconsole gui_app.py -n PhoenixR1_Flasher --icon assets\phoenix.ico
 
+REM Headless CLI (console)
+pyinstaller --onefile --console phoenixr1.py -n phoenixr1 --icon assets\phoenix.ico
+
 echo.
-echo Build complete. Find your EXE at .\dist\PhoenixR1_Flasher.exe
+echo Build complete. Find your EXEs at .\dist\PhoenixR1_Flasher.exe and .\dist\phoenixr1.exe
 echo.
 
 endlocal
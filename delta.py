@@ -0,0 +1,329 @@
+# delta.py
+# Differential flashing: only rewrite the blocks of a partition that changed.
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import fw_archive
+import metrics
+import mtk_wrapper as mtk
+import sparse
+import utils
+
+BLOCK_SIZE = 1024 * 1024
+# every delta extent is its own mtk process (handshake + DA upload), so
+# past this many extents, or this share of the image, a full write is cheaper
+MAX_EXTENTS = 8
+MAX_CHANGED_RATIO = 0.5
+# extents closer than this (in blocks) are merged into one write
+MERGE_GAP = 4
+# extents are copied to their chunk files this many bytes at a time
+EXTENT_PIECE = 16 * BLOCK_SIZE
+
+
+@dataclass(frozen=True)
+class DeltaPlan:
+    partition: str
+    image_size: int
+    block_size: int
+    extents: tuple          # ((offset, length), ...) partition-relative, in bytes
+    reason: str = ""        # why a full write is needed (empty -> delta is usable)
+
+    @property
+    def changed_bytes(self) -> int:
+        return sum(n for _, n in self.extents)
+
+    @property
+    def full_write(self) -> bool:
+        return bool(self.reason)
+
+
+# --------------------
+# Block hash maps
+# --------------------
+def _block_digest(buf) -> str:
+    return hashlib.blake2b(buf, digest_size=16).hexdigest()
+
+
+def hash_blocks(stream, length: int, block_size: int = BLOCK_SIZE) -> list:
+    """Block digests of the first `length` bytes of a binary stream (drains the rest)."""
+    out = []
+    left = length
+    pending = bytearray()
+    while True:
+        buf = stream.read(block_size)
+        if not buf:
+            break
+        if left <= 0:
+            continue
+        buf = buf[:left]
+        left -= len(buf)
+        pending += buf
+        while len(pending) >= block_size:
+            out.append(_block_digest(pending[:block_size]))
+            del pending[:block_size]
+    if pending:
+        out.append(_block_digest(pending))
+    return out
+
+
+class _IterReader:
+    """Minimal read() over a bytes iterator (for sparse.iter_raw)."""
+
+    def __init__(self, it):
+        self._it = iter(it)
+        self._buf = bytearray()   # consumed from the front: del is amortized O(1) there
+
+    def read(self, n):
+        while len(self._buf) < n:
+            piece = next(self._it, None)
+            if piece is None:
+                break
+            self._buf += piece
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+
+def image_block_map(path, block_size: int = BLOCK_SIZE) -> list:
+    size = sparse.raw_size(path)
+    if sparse.is_sparse(path):
+        return hash_blocks(_IterReader(sparse.iter_raw(path, block_size)), size, block_size)
+    with open(path, "rb") as f:
+        return hash_blocks(f, size, block_size)
+
+
+# --------------------
+# Per-device cache of what was last written
+# --------------------
+def _maps_dir() -> Path:
+    d = utils._app_dir() / "delta_maps"
+    d.mkdir(exist_ok=True)
+    return d
+
+
+def _map_path(device_id: str, partition: str) -> Path:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in device_id)
+    return _maps_dir() / f"{safe}__{partition}.json"
+
+
+def load_device_map(device_id: str | None, partition: str, block_size: int = BLOCK_SIZE) -> list | None:
+    if not device_id:
+        return None
+    try:
+        data = json.loads(_map_path(device_id, partition).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if data.get("block_size") != block_size:
+        return None
+    return data.get("blocks")
+
+
+def save_device_map(device_id: str | None, partition: str, blocks: list, block_size: int = BLOCK_SIZE) -> None:
+    if not device_id:
+        return
+    try:
+        p = _map_path(device_id, partition)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"block_size": block_size, "blocks": blocks}), encoding="utf-8")
+        os.replace(tmp, p)
+    except Exception:
+        pass
+
+
+def forget_device_map(device_id: str | None, partition: str) -> None:
+    if device_id:
+        try:
+            _map_path(device_id, partition).unlink()
+        except OSError:
+            pass
+
+
+# --------------------
+# Planning
+# --------------------
+def diff_extents(image_blocks: list, device_blocks: list, image_size: int,
+                 block_size: int = BLOCK_SIZE, merge_gap: int = MERGE_GAP) -> list:
+    """Changed block runs as (offset, length) byte extents, clipped to image_size."""
+    changed = [i for i, h in enumerate(image_blocks)
+               if i >= len(device_blocks) or device_blocks[i] != h]
+    extents = []
+    for i in changed:
+        if extents and i - extents[-1][1] <= merge_gap:
+            extents[-1][1] = i + 1
+        else:
+            extents.append([i, i + 1])
+    return [(a * block_size, min(b * block_size, image_size) - a * block_size) for a, b in extents]
+
+
+def plan(partition, image_path, device_blocks: list | None, image_blocks: list | None = None,
+         block_size: int = BLOCK_SIZE) -> DeltaPlan:
+    size = sparse.raw_size(image_path)
+    if device_blocks is None:
+        return DeltaPlan(partition, size, block_size, ((0, size),), "device state unknown")
+    if image_blocks is None:
+        image_blocks = image_block_map(image_path, block_size)
+    extents = tuple(diff_extents(image_blocks, device_blocks, size, block_size))
+    changed = sum(n for _, n in extents)
+    if len(extents) > MAX_EXTENTS:
+        return DeltaPlan(partition, size, block_size, extents, f"{len(extents)} extents (> {MAX_EXTENTS})")
+    if size and changed / size > MAX_CHANGED_RATIO:
+        return DeltaPlan(partition, size, block_size, extents, f"{changed / size:.0%} of image changed")
+    return DeltaPlan(partition, size, block_size, extents)
+
+
+def _extract_extents(image_path, extents, paths, piece: int = EXTENT_PIECE):
+    """
+    Copy each (offset, length) extent of the raw image into the file of the
+    same index in paths, at most `piece` bytes at a time, yielding the index
+    once its file is complete. extents are ascending (see diff_extents), so
+    a sparse image is expanded once, front to back, however many there are.
+    """
+    with contextlib.ExitStack() as stack:
+        if sparse.is_sparse(image_path):
+            it = sparse.iter_raw(image_path, piece)
+            stack.callback(it.close)
+            src, seekable = _IterReader(it), False
+        else:
+            src, seekable = stack.enter_context(open(image_path, "rb")), True
+        pos = 0
+        for i, ((off, n), path) in enumerate(zip(extents, paths)):
+            if seekable:
+                src.seek(off)
+                pos = off
+            while pos < off:
+                got = len(src.read(min(off - pos, piece)))
+                if not got:
+                    break
+                pos += got
+            with open(path, "wb") as out:
+                left = n
+                while left:
+                    buf = src.read(min(left, piece))
+                    if not buf:
+                        break
+                    out.write(buf)
+                    left -= len(buf)
+                    pos += len(buf)
+            yield i
+
+
+def delta_flash(partition, image_path, device_id=None, readback=True, dry_run=False,
+                result=None, on_progress=None):
+    """
+    Flash only the blocks of `image_path` that differ from the device.
+
+    The device's block map comes from the cache of the last successful
+    delta flash of this device (keyed by device_id, default its USB serial;
+    a device known only by its port gets no cache), or, if readback is
+    set, is read back through mtkclient. Every other write of the
+    partition drops its cached map (see mtk_wrapper.flash_partition). If neither is available, or the change is
+    too scattered (see MAX_EXTENTS / MAX_CHANGED_RATIO), the whole
+    partition is written. dry_run only reports what would be written.
+    result gets "plan" (DeltaPlan), "written" (bytes) and "ok".
+    Yields log lines. Archive members are extracted to the local image
+    cache first (extents are read at random offsets).
+    """
+    if fw_archive.is_member(image_path):
+        yield f"[{partition}] extracting {fw_archive.describe(image_path)} …"
+    with fw_archive.local_path(image_path, seekable=True) as local:
+        yield from _delta_flash(partition, local, device_id, readback, dry_run, result, on_progress)
+
+
+def _delta_flash(partition, image_path, device_id, readback, dry_run, result, on_progress):
+    if device_id is None:
+        # a port path (or the Windows PnP heuristic) can't tell one R1 from the next in the same port
+        device_id = mtk.job_device_serial()
+    tag = f"[{partition}]"
+
+    yield f"{tag} hashing image blocks …"
+    size = sparse.raw_size(image_path)
+    with metrics.stage("hash", partition):
+        image_blocks = image_block_map(image_path)
+
+    device_blocks = load_device_map(device_id, partition)
+    if device_blocks is not None:
+        yield f"{tag} using cached block map from last flash of {device_id}"
+    elif readback:
+        why = "" if device_id else " (the device has no USB serial, so no cached map)"
+        yield f"{tag} reading back {size / 2**20:.0f} MiB to build the device block map{why} …"
+        rb = {}
+        got = {}
+
+        def consume(f):
+            got["blocks"] = hash_blocks(f, size)
+            return size
+
+        with metrics.stage("readback", partition):
+            yield from (f"{tag} {line}" for line in mtk.readback_stream(partition, size, consume, result=rb))
+        if rb.get("returncode") == 0 and got.get("blocks"):
+            device_blocks = got["blocks"]
+        else:
+            yield f"{tag} read-back failed (exit {rb.get('returncode')})"
+
+    p = plan(partition, image_path, device_blocks, image_blocks)
+    if result is not None:
+        result["plan"] = p
+        result["written"] = 0
+
+    if p.full_write:
+        yield f"{tag} delta not usable ({p.reason}); full write of {p.image_size / 2**20:.1f} MiB"
+    else:
+        yield (f"{tag} delta: {p.changed_bytes / 2**20:.1f} MiB in {len(p.extents)} extent(s) "
+               f"of {p.image_size / 2**20:.1f} MiB")
+    if dry_run:
+        yield f"{tag} dry run — nothing written"
+        return
+
+    if p.full_write:
+        rc = {}
+        yield from mtk.flash_partition(partition, image_path, result=rc, on_progress=on_progress)
+        ok = rc.get("returncode") == 0
+        written = p.image_size if ok else 0
+    elif not p.extents:
+        ok, written = True, 0
+        yield f"{tag} partition already matches the image"
+    else:
+        lay = {}
+        yield from mtk.partition_layout(result=lay)
+        base = lay["table"].get(partition)
+        if not base:
+            yield f"{tag} partition not found in GPT; falling back to full write"
+            forget_device_map(device_id, partition)
+            rc = {}
+            yield from mtk.flash_partition(partition, image_path, result=rc, on_progress=on_progress)
+            ok = rc.get("returncode") == 0
+            written = p.image_size if ok else 0
+        else:
+            ok, written = True, 0
+            with tempfile.TemporaryDirectory(prefix="phoenix_delta_") as td:
+                chunks = [os.path.join(td, f"{partition}_{i}.bin") for i in range(len(p.extents))]
+                for i in _extract_extents(image_path, p.extents, chunks):
+                    off, n = p.extents[i]
+                    chunk = chunks[i]
+                    yield f"{tag} writing extent {i + 1}/{len(p.extents)}: +0x{off:X} ({n / 2**20:.1f} MiB)"
+                    rc = {}
+                    yield from (f"{tag} {line}" for line in
+                                mtk.write_at_offset(partition, base[0] + off, chunk, result=rc,
+                                                    on_progress=on_progress))
+                    os.remove(chunk)   # only one extent on disk at a time
+                    if rc.get("returncode") != 0:
+                        ok = False
+                        break
+                    written += n
+
+    if result is not None:
+        result["written"] = written
+        result["ok"] = ok
+    if ok:
+        save_device_map(device_id, partition, image_blocks)
+        yield f"{tag} done ({written / 2**20:.1f} MiB written)"
+    else:
+        # the device is now in an unknown state: never trust the old map again
+        forget_device_map(device_id, partition)
+        yield f"{tag} write FAILED"
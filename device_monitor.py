@@ -0,0 +1,203 @@
+# device_monitor.py
+# Background USB watcher so the UI never blocks on device detection.
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+MTK_VID = "0e8d"
+# MediaTek download-mode PIDs (lowercase hex, as sysfs reports them)
+MTK_PIDS = {
+    "0003": "BROM",
+    "2000": "Preloader",
+    "2001": "DA",
+}
+
+SYSFS_USB = "/sys/bus/usb/devices"
+
+
+@dataclass(frozen=True)
+class UsbDevice:
+    port: str                 # USB port path (e.g. "1-2.3") or a backend-specific id
+    mode: str                 # BROM / Preloader / DA / PnP
+    vid: str = MTK_VID
+    pid: str = ""
+    serial: str = ""
+
+
+@dataclass(frozen=True)
+class DeviceState:
+    devices: tuple = ()
+    detail: str = "Not scanned yet"
+    timestamp: float = 0.0    # time.time() of the scan that produced this state
+    scanned: bool = False
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.devices)
+
+
+# --------------------
+# Backends
+# --------------------
+class SysfsBackend:
+    """Scan /sys/bus/usb/devices (or a fake tree) for MediaTek download-mode PIDs."""
+    name = "sysfs"
+    interval = 1.0
+
+    def __init__(self, root: str = SYSFS_USB):
+        self.root = Path(root)
+
+    @staticmethod
+    def _read(d: Path, attr: str) -> str:
+        try:
+            return (d / attr).read_text(encoding="ascii", errors="ignore").strip()
+        except OSError:
+            return ""
+
+    def scan(self) -> list:
+        found = []
+        try:
+            entries = sorted(os.listdir(self.root))
+        except OSError:
+            return found
+        for name in entries:
+            # interfaces ("1-2:1.0") carry no idVendor; skip them cheaply
+            if ":" in name:
+                continue
+            d = self.root / name
+            if self._read(d, "idVendor").lower() != MTK_VID:
+                continue
+            pid = self._read(d, "idProduct").lower()
+            if pid not in MTK_PIDS:
+                continue
+            found.append(UsbDevice(port=name, mode=MTK_PIDS[pid], pid=pid, serial=self._read(d, "serial")))
+        return found
+
+
+class PnpBackend:
+    """Windows PnP scan via wmic (the original heuristic)."""
+    name = "pnp"
+    interval = 3.0
+    HINTS = ["mediatek", "mtk", "android", "preloader", "bootrom", "fastboot"]
+
+    def scan(self) -> list:
+        try:
+            out = subprocess.check_output(
+                ["wmic", "path", "Win32_PnPEntity", "get", "Name"],
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=5
+            )
+        except Exception:
+            return []
+        name = out.lower()
+        if any(h in name for h in self.HINTS):
+            return [UsbDevice(port="pnp", mode="PnP")]
+        return []
+
+
+def default_backend():
+    if sys.platform.startswith("linux") and os.path.isdir(SYSFS_USB):
+        return SysfsBackend()
+    return PnpBackend()
+
+
+def describe(devices) -> str:
+    if not devices:
+        return "No MTK device found"
+    if len(devices) == 1 and devices[0].mode == "PnP":
+        return "Possible device detected via PnP scan"
+    return ", ".join(f"{d.mode} @ {d.port}" for d in devices)
+
+
+# --------------------
+# Monitor
+# --------------------
+class DeviceMonitor:
+    """
+    Polls a backend on a daemon thread and keeps the latest DeviceState.
+    Listeners are called as listener(old, new) from the monitor thread
+    whenever the set of connected devices changes.
+    """
+
+    def __init__(self, backend=None, interval: float | None = None):
+        self.backend = backend or default_backend()
+        self.interval = interval if interval is not None else self.backend.interval
+        self._state = DeviceState()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def state(self) -> DeviceState:
+        return self._state
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def add_listener(self, cb) -> None:
+        with self._lock:
+            self._listeners.append(cb)
+
+    def remove_listener(self, cb) -> None:
+        with self._lock:
+            if cb in self._listeners:
+                self._listeners.remove(cb)
+
+    def poll_once(self) -> DeviceState:
+        devices = tuple(self.backend.scan())
+        new = DeviceState(devices=devices, detail=describe(devices), timestamp=time.time(), scanned=True)
+        old, self._state = self._state, new
+        if old.devices != new.devices or not old.scanned:
+            with self._lock:
+                listeners = list(self._listeners)
+            for cb in listeners:
+                try:
+                    cb(old, new)
+                except Exception:
+                    pass
+        return new
+
+    def rescan(self) -> None:
+        """Ask the monitor thread to poll now instead of waiting for the interval."""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="device-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+_monitor: DeviceMonitor | None = None
+
+def get_monitor() -> DeviceMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = DeviceMonitor()
+    return _monitor
@@ -0,0 +1,326 @@
+# disk_log.py
+# Background log writer: producers only enqueue, one thread appends in
+# batches, rotates by size/age, compresses rotated segments and prunes.
+#
+#   logs/phoenixr1.log                      current segment (all console output)
+#   logs/phoenixr1-YYYYmmdd-HHMMSS.log.gz   rotated segments (.zst with zstandard)
+#   logs/runs/PhoenixR1_Log_*.txt           one file per action, for support
+#   logs/events/events-*.jsonl              structured events (see events.py)
+
+import atexit
+import gzip
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+try:
+    import zstandard  # optional, for log_compress = "zstd"
+except ImportError:
+    zstandard = None
+
+import utils
+
+MAIN_NAME = "phoenixr1.log"
+FLUSH_INTERVAL = 0.2       # s between batched writes
+URGENT_LINES = 5000        # wake the writer early once this many lines wait
+MAX_PENDING = 200_000      # lines; beyond that the oldest lines are dropped (never block producers)
+
+
+class RunLog:
+    """One per-run log file, written by the LogWriter thread. write()/close() never block."""
+
+    def __init__(self, writer, path: str):
+        self.writer = writer
+        self.path = path
+
+    def write(self, text: str) -> None:
+        self.writer._put(self, text)
+
+    def close(self) -> None:
+        self.writer._put(self, None, close=True)
+
+
+class LogWriter:
+    """
+    Thread-safe, non-blocking log sink. write() goes to the rotating main
+    log (timestamped), open_run(path) returns a RunLog for a plain
+    per-action file. Lines are written in batches every FLUSH_INTERVAL.
+
+    Rotation happens when the main log reaches rotate_bytes or is older
+    than rotate_seconds; rotated segments are compressed (compress =
+    "gzip", "zstd" or "none") and segments and run logs beyond keep_days
+    / keep_bytes are deleted, oldest first.
+    """
+
+    def __init__(self, directory, rotate_bytes=10 * 2**20, rotate_seconds=86400.0, compress="gzip",
+                 keep_days=30.0, keep_bytes=500 * 2**20, runs_dir=None, retain=(),
+                 flush_interval=FLUSH_INTERVAL):
+        self.dir = Path(directory)
+        self.runs_dir = Path(runs_dir) if runs_dir else self.dir / "runs"
+        # (directory, glob) of other files that share the retention budget
+        self.retain = [(self.runs_dir, "*.txt")] + [(Path(d), g) for d, g in retain]
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = "zstd" if compress == "zstd" and zstandard else ("none" if compress == "none" else "gzip")
+        self.keep_days = keep_days
+        self.keep_bytes = keep_bytes
+        self.flush_interval = flush_interval
+        self.stats = {"lines": 0, "batches": 0, "dropped": 0, "rotations": 0}
+
+        self._items = deque()
+        self._seq = 0          # items enqueued so far
+        self._done = 0         # items written so far
+        self._cond = threading.Condition()
+        self._closing = False
+        self._urgent = False
+        self._main = None
+        self._size = 0
+        self._seg_start = time.time()
+        self._runs = {}        # RunLog -> open file
+        self._active = set()   # paths of RunLogs opened and not closed yet: never pruned
+        self._thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # ---- producer side ----
+    def write(self, text: str) -> None:
+        self._put(None, text)
+
+    def write_many(self, texts) -> None:
+        now = time.time()
+        with self._cond:
+            for t in texts:
+                self._push((None, t, now))
+
+    def open_run(self, path: str) -> RunLog:
+        with self._cond:
+            self._active.add(os.path.abspath(path))
+        return RunLog(self, path)
+
+    def _put(self, target, text, close=False):
+        with self._cond:
+            if close:
+                self._active.discard(os.path.abspath(target.path))
+            self._push((target, text, time.time()))
+
+    def _push(self, item):
+        # caller holds self._cond
+        if len(self._items) >= MAX_PENDING and item[1] is not None:
+            # drop the oldest line; close markers (text None) must reach the writer or a file stays open
+            for i, old in enumerate(self._items):
+                if old[1] is not None:
+                    del self._items[i]
+                    self.stats["dropped"] += 1
+                    break
+        self._items.append(item)
+        self._seq += 1
+        if len(self._items) >= URGENT_LINES:
+            self._urgent = True
+            self._cond.notify_all()
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Wait until everything enqueued so far is on disk."""
+        with self._cond:
+            target = self._seq
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= target or not self._thread.is_alive(), timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    # ---- writer thread ----
+    def _loop(self):
+        try:
+            self._open_main()
+            self._maintenance()
+        except OSError:
+            pass
+        while True:
+            with self._cond:
+                if not self._closing:
+                    # batch up: wait for the interval unless lots of lines (or a flush) are waiting
+                    self._cond.wait_for(lambda: self._urgent or self._closing, self.flush_interval)
+                items, self._items = self._items, deque()
+                self._urgent = False
+                closing = self._closing
+                seq = self._seq
+            if items:
+                try:
+                    self._write_batch(items)
+                except OSError:
+                    pass
+            try:
+                self._maybe_rotate()
+            except OSError:
+                pass
+            with self._cond:
+                self._done = max(self._done, seq)
+                self._cond.notify_all()
+                if closing and not self._items:
+                    break
+        for f in self._runs.values():
+            f.close()
+        self._runs.clear()
+        if self._main:
+            self._main.close()
+
+    def _write_batch(self, items):
+        main, pending = [], 0
+        runs = {}
+        for target, text, ts in items:
+            if target is None:
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+                line = f"{stamp}.{int(ts * 1000) % 1000:03d} {text}\n"
+                main.append(line)
+                pending += len(line)
+                if self._size + pending >= self.rotate_bytes:
+                    # a big batch must not overshoot the segment size
+                    self._write_main(main)
+                    main, pending = [], 0
+                    self._maybe_rotate()
+            else:
+                runs.setdefault(target, []).append(text)
+        self._write_main(main)
+        for run, texts in runs.items():
+            try:
+                f = self._runs.get(run)
+                if f is None:
+                    Path(run.path).parent.mkdir(parents=True, exist_ok=True)
+                    f = self._runs[run] = open(run.path, "a", encoding="utf-8")
+                lines = [t for t in texts if t is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                if texts[-1] is None:
+                    f.close()
+                    del self._runs[run]
+                else:
+                    f.flush()
+            except OSError:
+                self._runs.pop(run, None)
+        self.stats["lines"] += len(items)
+        self.stats["batches"] += 1
+
+    def _write_main(self, lines):
+        if lines and self._main:
+            data = "".join(lines)
+            self._main.write(data)
+            self._main.flush()
+            self._size += len(data)
+
+    def _main_path(self) -> Path:
+        return self.dir / MAIN_NAME
+
+    def _open_main(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        p = self._main_path()
+        # an existing segment counts as started at its last write
+        st = p.stat() if p.exists() else None
+        self._seg_start = st.st_mtime if st and st.st_size else time.time()
+        self._size = st.st_size if st else 0
+        self._main = open(p, "a", encoding="utf-8")
+
+    def _maybe_rotate(self):
+        if self._main is None:
+            return
+        if self._size == 0:
+            self._seg_start = time.time()
+            return
+        if self._size < self.rotate_bytes and time.time() - self._seg_start < self.rotate_seconds:
+            return
+        self._main.close()
+        self._main = None
+        stem = Path(MAIN_NAME).stem
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._seg_start))
+        dst = self.dir / f"{stem}-{stamp}.log"
+        n = 1
+        while dst.exists() or Path(str(dst) + ".gz").exists() or Path(str(dst) + ".zst").exists():
+            dst = self.dir / f"{stem}-{stamp}-{n}.log"
+            n += 1
+        os.replace(self._main_path(), dst)
+        self._open_main()
+        self.stats["rotations"] += 1
+        self._compress_segment(dst)
+        self._prune()
+
+    def _compress_segment(self, path: Path):
+        if self.compress == "none":
+            return
+        if self.compress == "zstd":
+            out = Path(str(path) + ".zst")
+            with open(path, "rb") as src, open(out, "wb") as f:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, f)
+        else:
+            out = Path(str(path) + ".gz")
+            with open(path, "rb") as src, gzip.open(out, "wb", compresslevel=6) as f:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        os.remove(path)
+
+    def _maintenance(self):
+        """On start: compress segments left uncompressed (e.g. by a crash), then prune."""
+        stem = Path(MAIN_NAME).stem
+        for p in self.dir.glob(f"{stem}-*.log"):
+            try:
+                self._compress_segment(p)
+            except OSError:
+                pass
+        self._prune()
+
+    def _prune(self):
+        stem = Path(MAIN_NAME).stem
+        with self._cond:
+            open_runs = {os.path.abspath(r.path) for r in self._runs} | self._active
+        files = []
+        paths = list(self.dir.glob(f"{stem}-*.log*"))
+        for d, pattern in self.retain:
+            paths.extend(d.glob(pattern))
+        for p in paths:
+            if os.path.abspath(p) in open_runs:
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+        cutoff = time.time() - self.keep_days * 86400
+        total = sum(size for _, size, _ in files)
+        for mtime, size, p in files:
+            if mtime >= cutoff and total <= self.keep_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> LogWriter:
+    """Process-wide writer under utils.logs_dir(), configured from phoenix_config.json."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            cfg = utils.get_log_settings()
+            _writer = LogWriter(
+                utils.logs_dir(),
+                rotate_bytes=int(cfg["log_rotate_mb"] * 2**20),
+                rotate_seconds=cfg["log_rotate_hours"] * 3600,
+                compress=cfg["log_compress"],
+                keep_days=cfg["log_keep_days"],
+                keep_bytes=int(cfg["log_keep_mb"] * 2**20),
+                runs_dir=utils.runs_dir(),
+                retain=[(utils.events_dir(), "events-*.jsonl")],
+            )
+            atexit.register(_writer.close)
+        return _writer
@@ -0,0 +1,282 @@
+# events.py
+# Structured event stream for jobs: every output line and state change as
+# one JSON object, one JSONL file per day, plus a SQLite index for queries.
+#
+#   logs/events/events-YYYY-mm-dd.jsonl   written through disk_log (non-blocking)
+#   logs/events/index.sqlite              built incrementally from the JSONL files
+#
+# The JSONL files are the source of truth: the index can be deleted at any
+# time and is rebuilt by EventIndex.update().
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import disk_log
+import utils
+
+INDEX_NAME = "index.sqlite"
+INDEX_INTERVAL = 2.0  # s between background index updates while events arrive
+
+# --------------------------
+# Classifier
+# --------------------------
+# Checked in order; the first level whose rule matches wins. Whole words
+# only, so "boot" is not "ok" and "Wrote" is not an error.
+LEVEL_RULES = [
+    ("err", re.compile(r"\b(?:errors?|fail(?:s|ed|ure)?|denied|exception|traceback|mismatch|"
+                       r"timed out|can(?:not|'t)|could(?: not|n't)|abort(?:ed)?)\b", re.I)),
+    ("warn", re.compile(r"\b(?:warn(?:ing)?|retry(?:ing)?|cancel(?:l?ed)?|skip(?:ped|ping)?|"
+                        r"falling back|unconfirmed)\b", re.I)),
+    ("ok", re.compile(r"\b(?:ok(?:ay)?|success(?:ful(?:ly)?)?|done|completed?|verified|pass(?:ed)?|"
+                      r"wrote|formatted)\b", re.I)),
+]
+
+# name -> (regex with a group of that name, converter)
+FIELD_RULES = {
+    "partition": (re.compile(r"^\[(?P<partition>[A-Za-z0-9_.-]+)\]"), str),
+    "exit": (re.compile(r"\bexit (?P<exit>-?\d+)\b"), int),
+    "rate_mbps": (re.compile(r"(?P<rate_mbps>\d+(?:\.\d+)?)\s*MB/s"), float),
+    "sectors": (re.compile(r"sector count (?P<sectors>0x[0-9a-fA-F]+)"), lambda v: int(v, 16)),
+    "seconds": (re.compile(r"\((?P<seconds>\d+(?:\.\d+)?) s\)"), float),
+}
+
+
+def classify(text: str) -> str:
+    for level, rx in LEVEL_RULES:
+        if rx.search(text):
+            return level
+    return "info"
+
+
+def parse_fields(text: str) -> dict:
+    out = {}
+    for name, (rx, conv) in FIELD_RULES.items():
+        m = rx.search(text)
+        if m:
+            try:
+                out[name] = conv(m.group(name))
+            except ValueError:
+                pass
+    return out
+
+
+# --------------------------
+# Event log (writer side)
+# --------------------------
+class EventLog:
+    """
+    Thread-safe, non-blocking event sink for jobs.JobEngine. Events are
+    dicts with ts, kind ("line" / "job" / "partition"), device, job,
+    job_name and kind-specific fields; see line(), job() and emit().
+    """
+
+    def __init__(self, directory, writer=None, index=True):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.writer = writer or disk_log.get_writer()
+        # job ids restart per process; prefix them so they are unique across runs
+        self.session = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._day = None
+        self._file = None
+        self._dirty = threading.Event()
+        self.index = EventIndex(self.dir) if index else None
+        if self.index is not None:
+            threading.Thread(target=self._index_loop, name="event-index", daemon=True).start()
+
+    def _job_fields(self, job) -> dict:
+        return {"device": job.device_id, "job": f"{self.session}.{job.id}", "job_name": job.name}
+
+    def emit(self, event: dict) -> None:
+        event.setdefault("ts", round(time.time(), 3))
+        day = time.strftime("%Y-%m-%d", time.localtime(event["ts"]))
+        line = json.dumps(event, separators=(",", ":"), default=str)
+        with self._lock:
+            if day != self._day:
+                if self._file is not None:
+                    self._file.close()
+                self._day = day
+                self._file = self.writer.open_run(str(self.dir / f"events-{day}.jsonl"))
+            self._file.write(line)
+        self._dirty.set()
+
+    def line(self, job, text: str, level: str | None = None) -> dict:
+        """One output line of a job; returns the event (level filled in by classify())."""
+        fields = parse_fields(text)
+        if "partition" not in fields and job.progress is not None and job.progress.partition:
+            fields["partition"] = job.progress.partition
+        event = {"kind": "line", **self._job_fields(job), "level": level or classify(text), "text": text, **fields}
+        self.emit(event)
+        return event
+
+    def job(self, job) -> None:
+        """A job state change; a finished job also gets one "partition" event per partition it touched."""
+        event = {"kind": "job", **self._job_fields(job), "state": job.state,
+                 "level": {"failed": "err", "cancelled": "warn", "done": "ok"}.get(job.state, "info"),
+                 "attempts": job.attempts, "elapsed_s": round(job.elapsed, 2)}
+        if job.error:
+            event["error"] = str(job.error)
+        if job.log_path:
+            event["log"] = job.log_path
+        self.emit(event)
+        if job.state not in ("done", "failed", "cancelled"):
+            return
+        verify_res = job.result.get("verify", {})
+        for state, parts in (("written", job.result.get("written", [])), ("failed", job.result.get("failed", []))):
+            for part in parts:
+                ev = {"kind": "partition", **self._job_fields(job), "partition": part, "state": state,
+                      "level": "ok" if state == "written" else "err"}
+                if part in verify_res:
+                    ok, secs = verify_res[part]
+                    ev["verify"] = "pass" if ok else "fail"
+                    ev["verify_s"] = round(secs, 2)
+                    if not ok:
+                        ev["level"] = "err"
+                self.emit(ev)
+
+    def _index_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(INDEX_INTERVAL)
+            self._dirty.clear()
+            self.writer.flush()
+            try:
+                self.index.update()
+            except Exception:
+                pass
+
+
+# --------------------------
+# Index (query side)
+# --------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, offset INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL, kind TEXT, level TEXT, state TEXT, device TEXT, job TEXT,
+    job_name TEXT, partition TEXT, text TEXT, file TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ev_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS ev_kind ON events(kind, state, ts);
+CREATE INDEX IF NOT EXISTS ev_part ON events(partition, ts);
+CREATE INDEX IF NOT EXISTS ev_level ON events(level, ts);
+CREATE INDEX IF NOT EXISTS ev_device ON events(device, ts);
+CREATE INDEX IF NOT EXISTS ev_job ON events(job);
+"""
+
+_COLUMNS = ("kind", "level", "state", "device", "job", "job_name", "partition")
+
+
+class EventIndex:
+    """SQLite index over events-*.jsonl in one directory; update() ingests whatever is new."""
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.path = self.dir / INDEX_NAME
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import sqlite3  # only the query / index side needs it
+        con = sqlite3.connect(str(self.path), timeout=10)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_SCHEMA)
+        return con
+
+    def update(self) -> int:
+        """Index new lines of every events-*.jsonl; forget files that were pruned. Returns rows added."""
+        added = 0
+        with self._lock:
+            con = self._connect()
+            try:
+                known = dict(con.execute("SELECT name, offset FROM files"))
+                present = {p.name: p for p in self.dir.glob("events-*.jsonl")}
+                with con:
+                    for name in set(known) - set(present):
+                        con.execute("DELETE FROM events WHERE file = ?", (name,))
+                        con.execute("DELETE FROM files WHERE name = ?", (name,))
+                for name, p in sorted(present.items()):
+                    offset = known.get(name, 0)
+                    if p.stat().st_size < offset:
+                        # file was replaced: start over
+                        with con:
+                            con.execute("DELETE FROM events WHERE file = ?", (name,))
+                        offset = 0
+                    rows, offset = self._read_new(p, offset)
+                    with con:
+                        con.executemany(
+                            "INSERT INTO events (ts, kind, level, state, device, job, job_name, partition, "
+                            "text, file, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                        con.execute("INSERT OR REPLACE INTO files (name, offset) VALUES (?, ?)", (name, offset))
+                    added += len(rows)
+            finally:
+                con.close()
+        return added
+
+    @staticmethod
+    def _read_new(path: Path, offset: int):
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a partly written last line waits for the next update
+        for raw in data[:end].splitlines():
+            try:
+                ev = json.loads(raw)
+            except ValueError:
+                continue
+            rows.append((ev.get("ts", 0.0), *(ev.get(c) for c in _COLUMNS), ev.get("text"), path.name,
+                         raw.decode("utf-8", "replace")))
+        return rows, offset + end
+
+    def query(self, since=None, until=None, text=None, limit=1000, update=True, **eq) -> list:
+        """
+        Events matching all given filters, newest first. since/until are
+        epoch seconds; text is a substring; eq are exact matches on kind,
+        level, state, device, job, job_name or partition.
+        """
+        if update:
+            self.update()
+        where, args = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        for col, val in eq.items():
+            if col not in _COLUMNS:
+                raise ValueError(f"unknown filter: {col}")
+            if val is not None:
+                where.append(f"{col} = ?")
+                args.append(val)
+        if text:
+            where.append("text LIKE ?")
+            args.append(f"%{text}%")
+        sql = "SELECT data FROM events" + (" WHERE " + " AND ".join(where) if where else "")
+        sql += " ORDER BY ts DESC, rowid DESC LIMIT ?"
+        args.append(int(limit))
+        con = self._connect()
+        try:
+            return [json.loads(d) for (d,) in con.execute(sql, args)]
+        finally:
+            con.close()
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_log() -> EventLog:
+    """Process-wide EventLog under utils.events_dir()."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = EventLog(utils.events_dir())
+        return _log
+
+
+def get_index() -> EventIndex:
+    return EventIndex(utils.events_dir())
@@ -0,0 +1,353 @@
+# fw_archive.py
+# Firmware images inside zip / tar(.gz/.xz/.zst) bundles: list the wanted
+# members without extracting anything, and stream a member to the flash
+# path.
+#
+# A member is addressed as "<archive path>::<member name>" wherever an image
+# path is expected (utils.list_firmware_images, restore plans, verify, ...).
+# zip listings come from the central directory alone. Compressed tars have
+# no index, so listing one is a single decompression pass over the headers
+# (member data is skipped, nothing is written); utils keeps the listing in
+# the firmware index, keyed by the archive's size and mtime.
+
+import contextlib
+import gzip
+import hashlib
+import lzma
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import zipfile
+import zlib
+
+try:
+    import zstandard  # optional, for .tar.zst without the zstd tool
+except ImportError:
+    zstandard = None
+
+SEP = "::"
+CHUNK = 8 * 1024 * 1024
+HEAD = 28                  # enough for the Android sparse file header (sparse.FILE_HDR)
+
+TAR_SUFFIXES = {".tar": "", ".tar.gz": "gz", ".tgz": "gz", ".tar.xz": "xz", ".txz": "xz",
+                ".tar.zst": "zst", ".tar.zstd": "zst", ".tzst": "zst"}
+# external decompressors run in their own process, so decompression overlaps
+# our reads; xz >= 5.4 also decompresses multi-block files on all cores
+_TOOLS = {"gz": [["pigz", "-dc"]], "xz": [["xz", "-T0", "-dc"]], "zst": [["zstd", "-dc"]]}
+
+_listings = {}   # archive -> (stamp, {member name: info})
+_hashes = {}     # (archive, stamp, member) -> sha256
+_lock = threading.Lock()
+
+
+class ArchiveError(OSError):
+    pass
+
+
+# what a truncated or corrupt archive raises while being read (besides OSError)
+_CORRUPT = (zipfile.BadZipFile, tarfile.TarError, lzma.LZMAError, EOFError, zlib.error)
+if zstandard is not None:
+    _CORRUPT += (zstandard.ZstdError,)
+
+
+# --------------------
+# Member paths
+# --------------------
+def archive_kind(name) -> str | None:
+    """"zip", "tar", "tar.gz", "tar.xz", "tar.zst" or None for anything else."""
+    low = str(name).lower()
+    if low.endswith(".zip"):
+        return "zip"
+    for suffix, comp in TAR_SUFFIXES.items():
+        if low.endswith(suffix):
+            return "tar." + comp if comp else "tar"
+    return None
+
+
+def is_member(path) -> bool:
+    return path is not None and SEP in str(path)
+
+
+def member_path(archive, name) -> str:
+    return f"{archive}{SEP}{name}"
+
+
+def split(path) -> tuple:
+    """(archive path, member name)"""
+    archive, _, name = str(path).partition(SEP)
+    return archive, name
+
+
+def basename(path) -> str:
+    """File name of an image, for members the last part of the member name."""
+    if is_member(path):
+        return split(path)[1].rstrip("/").rsplit("/", 1)[-1]
+    return os.path.basename(path)
+
+
+def describe(path) -> str:
+    """Short name for logs and labels: "boot.img", or "boot.img in fw.zip" for a member."""
+    if is_member(path):
+        return f"{basename(path)} in {os.path.basename(split(path)[0])}"
+    return os.path.basename(path)
+
+
+def dirname(path) -> str:
+    """Folder of an image; for members the folder holding the archive."""
+    return os.path.dirname(split(path)[0] if is_member(path) else path)
+
+
+def stamp(archive) -> list:
+    st = os.stat(archive)
+    return [st.st_size, st.st_mtime_ns]
+
+
+# --------------------
+# Listing
+# --------------------
+def _info(head: bytes, size: int) -> dict:
+    import sparse
+    info = {"size": size, "raw_size": size, "sparse": False}
+    if len(head) >= sparse.FILE_HDR.size:
+        fields = sparse.FILE_HDR.unpack_from(head, 0)
+        if fields[0] == sparse.SPARSE_MAGIC:
+            info["sparse"] = True
+            info["raw_size"] = fields[5] * fields[6]   # block size * total blocks
+    return info
+
+
+@contextlib.contextmanager
+def _decompressed(archive, comp):
+    """Binary stream of the decompressed archive: an external tool if there is one, else Python."""
+    for cmd in _TOOLS.get(comp, []):
+        exe = shutil.which(cmd[0])
+        if not exe:
+            continue
+        kw = {"creationflags": subprocess.CREATE_NO_WINDOW} if sys.platform == "win32" else {}
+        proc = subprocess.Popen([exe, *cmd[1:], archive], stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=CHUNK, **kw)
+        try:
+            yield proc.stdout
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+        return
+    if comp == "gz":
+        f = gzip.open(archive, "rb")
+    elif comp == "xz":
+        f = lzma.open(archive, "rb")
+    elif zstandard is not None:
+        f = zstandard.ZstdDecompressor().stream_reader(open(archive, "rb"), read_across_frames=True, closefd=True)
+    else:
+        raise ArchiveError(f"{os.path.basename(archive)}: .zst needs the zstd tool or the zstandard package")
+    with f:
+        yield f
+
+
+@contextlib.contextmanager
+def _open_tar(archive):
+    comp = archive_kind(archive).partition(".")[2]
+    if not comp:
+        # uncompressed: tarfile seeks over member data, only headers are read
+        with tarfile.open(archive, "r:") as tf:
+            yield tf
+        return
+    with _decompressed(archive, comp) as stream, tarfile.open(fileobj=stream, mode="r|") as tf:
+        yield tf
+
+
+def _list(archive, wanted) -> dict:
+    def keep(name):
+        return wanted is None or name.rstrip("/").rsplit("/", 1)[-1].lower() in wanted
+
+    out = {}
+    try:
+        if archive_kind(archive) == "zip":
+            with zipfile.ZipFile(archive) as zf:
+                for zi in zf.infolist():
+                    if zi.is_dir() or not keep(zi.filename):
+                        continue
+                    with zf.open(zi) as f:
+                        out[zi.filename] = _info(f.read(HEAD), zi.file_size)
+        else:
+            with _open_tar(archive) as tf:
+                for ti in tf:
+                    if ti.isfile() and keep(ti.name):
+                        out[ti.name] = _info(tf.extractfile(ti).read(HEAD), ti.size)
+    except _CORRUPT as e:
+        raise ArchiveError(f"{os.path.basename(archive)}: {e}") from e
+    return out
+
+
+def list_members(archive, wanted=None) -> dict:
+    """
+    {member name: {"size", "raw_size", "sparse"}} for the files in archive
+    whose file name (lowercased) is in wanted (every file if None).
+    """
+    archive = str(archive)
+    st = stamp(archive)
+    members = _list(archive, wanted)
+    remember(archive, st, members)
+    return members
+
+
+def remember(archive, st, members: dict) -> None:
+    """Add a listing (e.g. from the firmware index) to the in-memory one."""
+    with _lock:
+        old = _listings.get(archive)
+        merged = dict(old[1]) if old and old[0] == list(st) else {}
+        merged.update(members)
+        _listings[archive] = (list(st), merged)
+
+
+def member_info(path) -> dict:
+    archive, name = split(path)
+    st = stamp(archive)
+    with _lock:
+        memo = _listings.get(archive)
+    if memo and memo[0] == st and name in memo[1]:
+        return memo[1][name]
+    members = list_members(archive, {basename(path).lower()})
+    if name not in members:
+        raise ArchiveError(f"{name} not found in {os.path.basename(archive)}")
+    return members[name]
+
+
+def exists(path) -> bool:
+    if not path:
+        return False
+    if not is_member(path):
+        return os.path.isfile(path)
+    try:
+        member_info(path)
+    except OSError:
+        return False
+    return True
+
+
+def size(path) -> int:
+    """Stored size of an image (for sparse images the sparse file, not the expanded one)."""
+    return member_info(path)["size"] if is_member(path) else os.path.getsize(path)
+
+
+# --------------------
+# Reading
+# --------------------
+class _Checked:
+    """Read-only wrapper that fails instead of ending early if a member's data is cut short."""
+
+    def __init__(self, f, size, name):
+        self._f, self._left, self._name = f, size, name
+
+    def read(self, n=-1):
+        data = self._f.read(n)
+        self._left -= len(data)
+        if not data and self._left > 0 and n != 0:
+            raise ArchiveError(f"{self._name}: archive ended {self._left} bytes early")
+        return data
+
+
+@contextlib.contextmanager
+def open_member(path):
+    """Context manager yielding a binary stream of one archive member (decompressed on the fly)."""
+    archive, name = split(path)
+    try:
+        if archive_kind(archive) == "zip":
+            with zipfile.ZipFile(archive) as zf:
+                try:
+                    zi = zf.getinfo(name)
+                except KeyError:
+                    raise ArchiveError(f"{name} not found in {os.path.basename(archive)}") from None
+                with zf.open(zi) as f:
+                    yield _Checked(f, zi.file_size, name)
+            return
+        with _open_tar(archive) as tf:
+            for ti in tf:
+                if ti.name == name and ti.isfile():
+                    yield _Checked(tf.extractfile(ti), ti.size, name)
+                    return
+    except _CORRUPT as e:
+        raise ArchiveError(f"{os.path.basename(archive)}: {e}") from e
+    raise ArchiveError(f"{name} not found in {os.path.basename(archive)}")
+
+
+@contextlib.contextmanager
+def open_image(path):
+    """Binary stream of an image, loose file or archive member."""
+    if is_member(path):
+        with open_member(path) as f:
+            yield f
+    else:
+        with open(path, "rb") as f:
+            yield f
+
+
+def copy_member(path, out) -> int:
+    n = 0
+    with open_member(path) as f:
+        while True:
+            piece = f.read(CHUNK)
+            if not piece:
+                return n
+            out.write(piece)
+            n += len(piece)
+
+
+def sha256(path) -> str:
+    """SHA-256 of a member's data, remembered for as long as the archive is unchanged."""
+    archive, name = split(path)
+    key = (archive, tuple(stamp(archive)), name)
+    with _lock:
+        hit = _hashes.get(key)
+    if hit:
+        return hit
+    h = hashlib.sha256()
+    with open_member(path) as f:
+        while True:
+            piece = f.read(CHUNK)
+            if not piece:
+                break
+            h.update(piece)
+    digest = h.hexdigest()
+    with _lock:
+        _hashes[key] = digest
+    return digest
+
+
+def extract_mode() -> str:
+    """
+    How an archive member reaches the flashing tool (config key "archive_mode"):
+      "cache"   extract into the local image cache first (see prefetch.cached; default)
+      "stream"  decompress straight into a named pipe (opt-in, POSIX; see
+                sparse.flash_mode: mtkclient must read the pipe to EOF)
+    """
+    import utils
+    mode = utils.load_config().get("archive_mode")
+    if mode == "stream" and hasattr(os, "mkfifo"):
+        return "stream"
+    return "cache"
+
+
+@contextlib.contextmanager
+def local_path(path, seekable=False):
+    """
+    Context manager yielding a real file path for path. Loose files are
+    yielded unchanged; members come from the local image cache, or are
+    streamed through a named pipe if archive_mode is "stream" (and not seekable).
+    """
+    if not is_member(path):
+        yield path
+        return
+    if seekable or extract_mode() == "cache":
+        import prefetch
+        with prefetch.cached(path) as local:
+            yield local
+        return
+    import sparse
+    with sparse.piped(basename(path), lambda out: copy_member(path, out)) as target:
+        yield target
@@ -0,0 +1,332 @@
+# fw_store.py
+# Local firmware catalog: every image stored once by SHA-256, plus named
+# firmware sets (version, which image is boot / vbmeta / ...) in SQLite.
+#
+#   <store>/objects/ab/<sha256>/<file name>   one directory per content hash
+#   <store>/objects/ab/<sha256>/SHA256SUMS    so verify.py checks objects like any folder
+#   <store>/catalog.sqlite                    objects, sets, set files
+#
+# Objects keep the file name they were imported under: mtk's "Wrote
+# boot.img" output and the super-vs-system decision go by name. The same
+# content under another name is a second hardlink in the same directory.
+# Sources are reflinked or copied, never hardlinked unless asked to: a
+# hardlinked source edited in place would change the stored object too.
+# Switching sets is a catalog lookup; nothing is rescanned.
+
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fw_archive
+import utils
+import verify
+
+CATALOG_NAME = "catalog.sqlite"
+LINK_MODES = ("auto", "hardlink", "copy")
+FICLONE = 0x40049409   # Linux ioctl: share extents (btrfs, XFS, bcachefs, ...)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, added REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS sets (
+    name TEXT PRIMARY KEY, version TEXT, source TEXT, created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS set_files (
+    set_name TEXT NOT NULL, key TEXT NOT NULL, filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL, size INTEGER NOT NULL,
+    PRIMARY KEY (set_name, key)
+);
+CREATE INDEX IF NOT EXISTS sf_sha ON set_files(sha256);
+"""
+
+
+class StoreError(Exception):
+    pass
+
+
+# --------------------
+# Placing objects
+# --------------------
+def _reflink(src, dst) -> bool:
+    """Copy-on-write clone of src to dst where the filesystem supports it."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _copy_checked(src, dst, sha256) -> None:
+    """Stream src (file or archive member) into dst, failing if the data doesn't hash to sha256."""
+    import hashlib
+    h = hashlib.sha256()
+    with fw_archive.open_image(src) as f, open(dst, "wb") as out:
+        while True:
+            piece = f.read(verify.CHUNK)
+            if not piece:
+                break
+            h.update(piece)
+            out.write(piece)
+    if h.hexdigest() != sha256:
+        os.unlink(dst)
+        raise StoreError(f"{fw_archive.describe(src)} changed while it was imported")
+
+
+def _checked_link(src, tmp, dst, sha256, method) -> str:
+    """Move a reflink / hardlink tmp of src into place if it still hashes to sha256."""
+    if verify.sha256_file(tmp) != sha256:
+        os.unlink(tmp)
+        raise StoreError(f"{fw_archive.describe(src)} changed while it was imported")
+    os.replace(tmp, dst)
+    return method
+
+
+def place(src, dst: Path, sha256, mode="auto") -> str:
+    """
+    Put src at dst (atomically): reflink (mode "auto"), else a verified
+    copy. Mode "hardlink" also tries a hardlink before copying (same
+    filesystem only); "copy" always copies. Links are hashed too before
+    they are moved into place, so every method stores exactly sha256.
+    Returns the method used.
+    """
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    if not fw_archive.is_member(src):
+        if mode in ("auto", "hardlink") and _reflink(src, tmp):
+            return _checked_link(src, tmp, dst, sha256, "reflink")
+        if mode == "hardlink":
+            try:
+                os.link(src, tmp)
+            except OSError:
+                pass
+            else:
+                return _checked_link(src, tmp, dst, sha256, "hardlink")
+    _copy_checked(src, tmp, sha256)
+    os.replace(tmp, dst)
+    return "copy"
+
+
+# --------------------
+# Store
+# --------------------
+class FirmwareStore:
+    """Content-addressed image store with a SQLite catalog of firmware sets."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.path = self.root / CATALOG_NAME
+        self._lock = threading.Lock()
+        self._objects_lock = threading.Lock()   # object files: imports placing vs gc() deleting
+
+    def _connect(self):
+        import sqlite3
+        self.root.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=10)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_SCHEMA)
+        return con
+
+    def object_dir(self, sha256) -> Path:
+        return self.objects / sha256[:2] / sha256
+
+    def _add_object(self, src, sha256, filename, mode) -> tuple:
+        """(method, bytes added). method is "dedup" if the content was already stored under filename."""
+        d = self.object_dir(sha256)
+        dst = d / filename
+        if dst.is_file():
+            return "dedup", 0
+        d.mkdir(parents=True, exist_ok=True)
+        same = next((p for p in d.iterdir() if p.is_file() and p.name != "SHA256SUMS"
+                     and not p.name.startswith(".")), None)
+        if same is not None:
+            # known content under another name: link the stored copy, not the source
+            place(str(same), dst, sha256, "hardlink")
+            method, added = "dedup", 0
+        else:
+            method, added = place(src, dst, sha256, mode), fw_archive.size(src)
+        names = sorted(p.name for p in d.iterdir() if p.is_file() and p.name != "SHA256SUMS"
+                       and not p.name.startswith("."))
+        (d / "SHA256SUMS").write_text("".join(f"{sha256}  {n}\n" for n in names), encoding="utf-8")
+        return method, added
+
+    def import_set(self, name, source, version=None, replace=False, link=None, result=None):
+        """
+        Import the images found in folder source (see utils.list_firmware_images;
+        archives included) as firmware set name. Hashes in parallel, then
+        stores each image once. link: "auto" (reflink, else copy),
+        "hardlink" (reflink, else hardlink, else copy) or "copy"; default
+        config fw_store_link. Yields log lines; result gets "ok", "files",
+        "added", "deduped", "bytes_added", "bytes_saved" and "methods".
+        """
+        res = {"ok": False, "set": name}
+        if result is not None:
+            result.update(res)
+        link = link or utils.get_store_settings()["link"]
+        with self._lock:
+            con = self._connect()
+            try:
+                exists = con.execute("SELECT 1 FROM sets WHERE name = ?", (name,)).fetchone()
+            finally:
+                con.close()
+        if exists and not replace:
+            yield f"Firmware set {name!r} already exists (use replace to overwrite it)."
+            return
+        paths = {k: p for k, p in utils.list_firmware_images(source, app_dirs=False).items() if p}
+        if not paths:
+            yield f"No firmware images found in {source}."
+            return
+
+        yield f"Hashing {len(paths)} image(s) …"
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+            hashes = dict(zip(paths, pool.map(verify.cached_sha256, paths.values())))
+        yield f"Hashed in {time.monotonic() - t0:.1f} s"
+
+        # placed objects are unreferenced until set_files has them: keep gc() out until then
+        with self._objects_lock:
+            methods = Counter()
+            files = {}
+            added = saved = 0
+            for key, src in paths.items():
+                sha = hashes[key]
+                filename = fw_archive.basename(src)
+                size = fw_archive.size(src)
+                method, n = self._add_object(src, sha, filename, link)
+                methods[method] += 1
+                added += n
+                if method == "dedup":
+                    saved += size
+                files[key] = {"filename": filename, "sha256": sha, "size": size}
+                yield f"{key}: {filename} {sha[:12]} ({size / 2**20:.1f} MiB, {method})"
+
+            with self._lock:
+                con = self._connect()
+                try:
+                    with con:
+                        now = time.time()
+                        con.executemany("INSERT OR IGNORE INTO objects (sha256, size, added) VALUES (?, ?, ?)",
+                                        [(f["sha256"], f["size"], now) for f in files.values()])
+                        con.execute("DELETE FROM set_files WHERE set_name = ?", (name,))
+                        con.execute("INSERT OR REPLACE INTO sets (name, version, source, created) VALUES (?, ?, ?, ?)",
+                                    (name, version, str(source), now))
+                        con.executemany("INSERT INTO set_files (set_name, key, filename, sha256, size) "
+                                        "VALUES (?, ?, ?, ?, ?)",
+                                        [(name, k, f["filename"], f["sha256"], f["size"]) for k, f in files.items()])
+                finally:
+                    con.close()
+        res.update(ok=True, files=files, added=len(files) - methods["dedup"], deduped=methods["dedup"],
+                   bytes_added=added, bytes_saved=saved, methods=dict(methods))
+        if result is not None:
+            result.update(res)
+        yield (f"Imported {name!r}: {res['added']} new, {res['deduped']} already stored "
+               f"({added / 2**20:.1f} MiB added, {saved / 2**20:.1f} MiB saved)")
+
+    def sets(self) -> list:
+        """Every set, newest first: name, version, source, created, files, size."""
+        with self._lock:
+            con = self._connect()
+            try:
+                rows = con.execute(
+                    "SELECT s.name, s.version, s.source, s.created, COUNT(f.key) AS files, "
+                    "COALESCE(SUM(f.size), 0) AS size FROM sets s LEFT JOIN set_files f ON f.set_name = s.name "
+                    "GROUP BY s.name ORDER BY s.created DESC").fetchall()
+            finally:
+                con.close()
+        return [dict(r) for r in rows]
+
+    def get_set(self, name) -> dict | None:
+        with self._lock:
+            con = self._connect()
+            try:
+                row = con.execute("SELECT * FROM sets WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    return None
+                files = con.execute("SELECT key, filename, sha256, size FROM set_files WHERE set_name = ?",
+                                    (name,)).fetchall()
+            finally:
+                con.close()
+        out = dict(row)
+        out["files"] = {f["key"]: dict(f) for f in files}
+        return out
+
+    def paths(self, name) -> dict | None:
+        """list_firmware_images()-style {key: path} for a set (None for a missing object), or None if no such set."""
+        info = self.get_set(name)
+        if info is None:
+            return None
+        paths = {"boot": None, "vbmeta": None, "super_or_system": None, "vendor": None}
+        for key, f in info["files"].items():
+            p = self.object_dir(f["sha256"]) / f["filename"]
+            paths[key] = str(p) if p.is_file() else None
+        return paths
+
+    def remove_set(self, name) -> bool:
+        """Forget a set; its objects stay until gc()."""
+        with self._lock:
+            con = self._connect()
+            try:
+                with con:
+                    con.execute("DELETE FROM set_files WHERE set_name = ?", (name,))
+                    return con.execute("DELETE FROM sets WHERE name = ?", (name,)).rowcount > 0
+            finally:
+                con.close()
+
+    def gc(self) -> tuple:
+        """Delete objects no set refers to. Returns (objects removed, bytes freed)."""
+        with self._objects_lock:
+            with self._lock:
+                con = self._connect()
+                try:
+                    used = {r[0] for r in con.execute("SELECT DISTINCT sha256 FROM set_files")}
+                    stale = [(r[0], r[1]) for r in con.execute("SELECT sha256, size FROM objects")
+                             if r[0] not in used]
+                    with con:
+                        con.executemany("DELETE FROM objects WHERE sha256 = ?", [(s,) for s, _ in stale])
+                finally:
+                    con.close()
+            freed = 0
+            for sha, size in stale:
+                shutil.rmtree(self.object_dir(sha), ignore_errors=True)
+                freed += size
+        return len(stale), freed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> FirmwareStore:
+    """Process-wide FirmwareStore under utils.store_dir()."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FirmwareStore(utils.store_dir())
+        return _store
+
+
+def active_images(fw_dir=None, fw_set=None) -> dict:
+    """
+    Images to use: the firmware set fw_set (default config fw_set) from
+    the catalog if one is selected, else a scan of fw_dir (see
+    utils.list_firmware_images). Raises StoreError for an unknown set.
+    """
+    name = fw_set if fw_set is not None else utils.get_fw_set()
+    if not name:
+        return utils.list_firmware_images(fw_dir)
+    paths = get_store().paths(name)
+    if paths is None:
+        raise StoreError(f"no firmware set named {name!r}")
+    return paths
@@ -1,22 +1,42 @@
 # gui_app.py
 # PhoenixR1 — Rabbit R1 Resurrection Tool
 
+import time
+
+_T0 = time.perf_counter()  # baseline for the startup trace
+
+import json
 import os
 import sys
 import threading
+from datetime import datetime
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QTextEdit, QFileDialog, QCheckBox, QMessageBox, QStatusBar, QGroupBox
+    QLabel, QFileDialog, QCheckBox, QMessageBox, QStatusBar, QGroupBox,
+    QProgressBar, QComboBox, QInputDialog
 )
-from PySide6.QtGui import QTextCursor, QIcon
+from PySide6.QtGui import QIcon
 from PySide6.QtCore import Qt, Signal, QObject, QPoint, QTimer
 
 import utils
-import mtk_wrapper as mtk
+import device_monitor
+import disk_log
+import fw_archive
+import progress
+import sparse
+import verify
+from log_view import LogStore, LogView
+from log_transport import LogTransport
+
+# mtk_wrapper (asyncio), jobs, delta and the Station tab are imported after
+# the window is up (PhoenixApp._load_modules) and locally where used.
+
+_T_IMPORTS = time.perf_counter()
 
 APP_TITLE = "🔥 PhoenixR1 — Rabbit R1 Resurrection Tool"
 PHOENIX_ORANGE = "#ff7a18"
+PROGRESS_MS = 100   # progress bar refresh (~10 Hz), see progress.LatestProgress
 
 
 # --------------------------
@@ -93,7 +113,61 @@ class RabbitFightOverlay(QLabel):
 # Log signal bus
 # --------------------------
 class LogBus(QObject):
-    line = Signal(str, str)  # (text, level)
+    verified = Signal(object)  # {key: (status, detail)} from verify.verify_images
+    scanned = Signal(object)   # (generation, paths) from utils.list_firmware_images or a firmware set
+    imported = Signal(object)  # result dict of fw_store.FirmwareStore.import_set
+    resume_ask = Signal(object)  # (journal, partitions, trusted, reply) from a restore job, see _on_resume_ask
+
+
+class StartupBus(QObject):
+    modules_loaded = Signal()
+
+
+class JobBus(QObject):
+    state = Signal(object)  # jobs.Job, on every state change
+
+
+class DeviceBus(QObject):
+    """Re-emits DeviceMonitor changes (monitor thread) as queued Qt signals."""
+    connected = Signal(str)     # detail
+    disconnected = Signal(str)  # detail
+    changed = Signal(bool, str)  # (connected, detail)
+
+    def on_change(self, old, new):
+        if new.connected and not old.connected:
+            self.connected.emit(new.detail)
+        elif old.connected and not new.connected:
+            self.disconnected.emit(new.detail)
+        self.changed.emit(new.connected, new.detail)
+
+
+# --------------------------
+# Startup trace
+# --------------------------
+class StartupTrace:
+    """
+    Startup milestones in ms since gui_app was imported. Logged once the
+    app is ready and appended to logs/startup.jsonl, so regressions show.
+    """
+
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.marks = {}
+
+    def mark(self, name: str, at: float | None = None) -> float:
+        if name not in self.marks:
+            self.marks[name] = round(((at or time.perf_counter()) - self.t0) * 1000, 1)
+        return self.marks[name]
+
+    def summary(self) -> str:
+        return "Startup: " + ", ".join(f"{k} {v:.0f} ms" for k, v in self.marks.items())
+
+    def save(self, path) -> None:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"time": datetime.now().isoformat(timespec="seconds"), **self.marks}) + "\n")
+        except OSError:
+            pass
 
 
 # --------------------------
@@ -102,6 +176,8 @@ class LogBus(QObject):
 class PhoenixApp(QWidget):
     def __init__(self):
         super().__init__()
+        self.trace = StartupTrace(_T0)
+        self.trace.mark("imports", _T_IMPORTS)
         self.setWindowTitle(APP_TITLE)
         try:
             self.setWindowIcon(QIcon(os.path.join(os.path.dirname(__file__), "assets", "phoenix.ico")))
@@ -109,11 +185,37 @@ class PhoenixApp(QWidget):
             pass
 
         self.resize(900, 640)
+        self.log_store = LogStore(utils.get_log_max_lines(), disk_log.get_writer())
+        # worker threads push log lines here; LogView drains it once per frame
+        self.log_transport = LogTransport()
         self.logbus = LogBus()
-        self.logbus.line.connect(self._append_line)
+        self.logbus.verified.connect(self._on_verified)
+        self.logbus.scanned.connect(self._on_scanned)
+        self.logbus.imported.connect(self._on_set_imported)
+        self.logbus.resume_ask.connect(self._on_resume_ask)
+        # job threads only record the latest progress; the bar polls it at PROGRESS_MS
+        self.progress_latest = progress.LatestProgress()
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setInterval(PROGRESS_MS)
+        self._progress_timer.timeout.connect(self._poll_progress)
+        self._progress_timer.start()
+        self.verify_state = {}
+        self.paths = {}
+        self._fw_gen = 0
+
+        # every device action goes through one serialized job queue
+        # (self.jobs and the Station tab are created in _on_modules_loaded)
+        self.jobbus = JobBus()
+        self.jobbus.state.connect(self._on_job_state)
+        self.jobs = None
+        self.station_tab = None
+        self.metrics_tab = None
+        self.startbus = StartupBus()
+        self.startbus.modules_loaded.connect(self._on_modules_loaded)
 
         # persisted settings
         self.fw_dir = utils.get_fw_dir()
+        self.fw_set = utils.get_fw_set()
         self.mtk_path = utils.get_mtk_path()
 
         # Easter-eggs
@@ -121,14 +223,86 @@ class PhoenixApp(QWidget):
         self.fight_overlay = None  # created after log widget exists
 
         self._build_ui()
+
+        # device monitor: background polling, UI reacts to signals only
+        self.devbus = DeviceBus()
+        self.devbus.changed.connect(lambda *_: self._refresh_device_state())
+        self.devbus.connected.connect(lambda d: self._append_line(f"Device connected: {d}", "ok"))
+        self.devbus.disconnected.connect(lambda d: self._append_line(f"Device disconnected: {d}", "warn"))
+        self.monitor = device_monitor.get_monitor()
+        self.monitor.add_listener(self.devbus.on_change)
+
+        # scans and heavy imports start once the window has painted
+        # (see paintEvent / _start_background); until then: placeholders
+        self.trace.mark("window")
+
+    # --------------------------
+    # Startup (non-blocking)
+    # --------------------------
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if "first_paint" not in self.trace.marks:
+            self.trace.mark("first_paint")
+            QTimer.singleShot(0, self._start_background)
+
+    def _start_background(self):
+        self.monitor.start()
         self._refresh_firmware_state()
-        self._refresh_device_state()
+        threading.Thread(target=self._load_modules, name="load-modules", daemon=True).start()
+
+    def _load_modules(self):
+        # mtk_wrapper pulls in asyncio & co.; import it off the UI thread
+        try:
+            import delta  # noqa: F401
+            import events  # noqa: F401
+            import fw_store  # noqa: F401
+            import jobs  # noqa: F401
+            import metrics_tab  # noqa: F401
+            import station_tab  # noqa: F401
+        finally:
+            self.startbus.modules_loaded.emit()
+
+    def _on_modules_loaded(self):
+        import events
+        import jobs
+        import metrics
+        from metrics_tab import MetricsTab
+        from station_tab import StationTab
+        self.jobs = jobs.JobEngine(
+            concurrency=1,
+            on_line=self._job_line,
+            on_state=self.jobbus.state.emit,
+            log_path=lambda job: utils.log_filename(),
+            event_log=events.get_log(),
+            metrics=metrics.get_store(),
+        )
+        # Station tab (several devices at once)
+        self.station_tab = StationTab(self)
+        self.tabs.insertTab(2, self.station_tab, "Station")
+        self.devbus.changed.connect(lambda *_: self.station_tab.set_devices(self.monitor.state.devices))
+        if self.monitor.state.scanned:
+            self.station_tab.set_devices(self.monitor.state.devices)
+        # Metrics tab (stage timings of the last runs, both queues)
+        self.metrics_tab = MetricsTab(metrics.get_store())
+        self.tabs.addTab(self.metrics_tab, "Metrics")
+        self._reload_fw_sets()
+        self._startup_step("modules")
+
+    def _startup_step(self, name):
+        """Record a milestone; once firmware, device and modules are in, the app is ready."""
+        self.trace.mark(name)
+        if "ready" in self.trace.marks or not all(k in self.trace.marks for k in ("firmware", "device", "modules")):
+            return
+        self.trace.mark("ready")
+        self._append_line(self.trace.summary(), "info")
+        self.trace.save(utils.logs_dir() / "startup.jsonl")
+        self._update_buttons()
 
     # --------------------------
     # Build UI
     # --------------------------
     def _build_ui(self):
-        tabs = QTabWidget()
+        tabs = self.tabs = QTabWidget()
         tabs.setTabPosition(QTabWidget.North)
 
         # Flash tab
@@ -146,14 +320,27 @@ class PhoenixApp(QWidget):
         self._build_drivers_tab(self.drivers_tab)
         tabs.addTab(self.drivers_tab, "Drivers")
 
-        # Log panel
-        self.log = QTextEdit()
-        self.log.setReadOnly(True)
-        self.log.setStyleSheet("QTextEdit { background: #0f0f10; color: #ddd; font-family: Consolas, Menlo, monospace; }")
+        # Log panel (capped in memory; full history goes to logs/)
+        self.log = LogView(self.log_store, self.log_transport)
+        self.log.setStyleSheet("QPlainTextEdit { background: #0f0f10; color: #ddd; font-family: Consolas, Menlo, monospace; }")
+
+        # Progress (fed by parsed mtkclient progress bars)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setFormat("Idle")
+        self.rate_label = QLabel("")
+        prow = QWidget()
+        pl = QHBoxLayout()
+        pl.setContentsMargins(0, 0, 0, 0)
+        pl.addWidget(self.progress_bar, 1)
+        pl.addWidget(self.rate_label)
+        prow.setLayout(pl)
 
         # Status bar
         self.status = QStatusBar()
-        self.device_label = QLabel("Device: Unknown")
+        self.device_label = QLabel("Device: scanning…")
         self.mode_label = QLabel("")
         pill_css = ("QLabel { background: #1f1f1f; color: #e6e6e6; border: 1px solid #2a2a2a; "
                     "border-radius: 10px; padding: 2px 8px; }")
@@ -164,6 +351,7 @@ class PhoenixApp(QWidget):
         layout = QVBoxLayout()
         layout.addWidget(tabs)
         layout.addWidget(self._toolbar())
+        layout.addWidget(prow)
         layout.addWidget(self.log)
         layout.addWidget(self.status)
         self.setLayout(layout)
@@ -235,21 +423,40 @@ class PhoenixApp(QWidget):
         self.btn_oneclick = OneClickButton("🔥 One-Click Restore")
         self.btn_oneclick.clicked.connect(self._one_click_restore)
 
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setToolTip("Stop the running operation (kills the mtk process) and drop queued ones")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self._cancel_jobs)
+
         self.chk_wipe = QCheckBox("Wipe userdata (optional)")
         self.chk_community = QCheckBox("Community Mode")
         self.chk_community.stateChanged.connect(self._community_toggle)
 
+        self.chk_verify = QCheckBox("Verify after write")
+        self.chk_verify.setToolTip("Read each partition back after flashing and compare its SHA-256 with the image")
+        self.chk_verify.setChecked(bool(utils.load_config().get("verify_after_write", False)))
+        self.chk_verify.stateChanged.connect(self._verify_toggle)
+
         self.chk_threefile = QCheckBox("3-file mode (skip vendor)")
         self.chk_threefile.stateChanged.connect(self._refresh_firmware_state)
 
+        self.chk_backup = QCheckBox("Back up first")
+        self.chk_backup.setToolTip("Read boot/vbmeta/vendor (super too with backup_super) back into "
+                                   "compressed files under backups/ before flashing")
+        self.chk_backup.setChecked(bool(utils.load_config().get("backup_before_restore", False)))
+        self.chk_backup.stateChanged.connect(self._backup_toggle)
+
         roww = QWidget()
         l = QHBoxLayout()
         l.addWidget(self.btn_refresh)
         l.addStretch(1)
         l.addWidget(self.chk_wipe)
         l.addWidget(self.chk_community)
+        l.addWidget(self.chk_verify)
         l.addWidget(self.chk_threefile)
+        l.addWidget(self.chk_backup)
         l.addWidget(self.btn_oneclick)
+        l.addWidget(self.btn_cancel)
         roww.setLayout(l)
 
         # Link Easter-egg to button
@@ -292,6 +499,22 @@ class PhoenixApp(QWidget):
         grp.setLayout(g)
         lay.addWidget(grp)
 
+        # firmware sets from the local store (filled once the store is loaded)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Firmware set:"))
+        self.cmb_fw_set = QComboBox()
+        self.cmb_fw_set.addItem("(firmware folder)", None)
+        if self.fw_set:
+            self.cmb_fw_set.addItem(self.fw_set, self.fw_set)
+            self.cmb_fw_set.setCurrentIndex(1)
+        self.cmb_fw_set.currentIndexChanged.connect(self._on_fw_set_changed)
+        row.addWidget(self.cmb_fw_set, 1)
+        self.btn_import_set = QPushButton("Import folder as set…")
+        self.btn_import_set.setToolTip("Store the folder's images once by SHA-256 and add them as a named set")
+        self.btn_import_set.clicked.connect(self._import_fw_set)
+        row.addWidget(self.btn_import_set)
+        lay.addLayout(row)
+
         pick = QPushButton("Choose firmware folder…")
         pick.clicked.connect(self._pick_firmware_dir)
         lay.addWidget(pick)
@@ -310,11 +533,19 @@ class PhoenixApp(QWidget):
         self.btn_wipe = QPushButton("Wipe userdata (DANGER)")
         self.btn_wipe.clicked.connect(self._run_tool_wipe)
 
+        # Delta flashing (single-partition Flash buttons only)
+        self.chk_delta = QCheckBox("Delta flash: write only changed blocks")
+        self.chk_delta.setToolTip("Compares the image with the device (cached map from the last flash, "
+                                  "or a read-back) and rewrites only the blocks that differ")
+        self.btn_delta_dry = QPushButton("Delta dry-run (super/system)")
+        self.btn_delta_dry.clicked.connect(self._run_delta_dry_run)
+
         # Find mtk.exe…
         self.btn_find_mtk = QPushButton("Find mtk.exe…")
         self.btn_find_mtk.clicked.connect(self._choose_mtk_exe)
 
-        for w in [self.btn_reset, self.btn_reboot_bl, self.btn_wipe, self.btn_find_mtk]:
+        for w in [self.btn_reset, self.btn_reboot_bl, self.btn_wipe,
+                  self.chk_delta, self.btn_delta_dry, self.btn_find_mtk]:
             lay.addWidget(w)
 
         tab.setLayout(lay)
@@ -336,18 +567,24 @@ class PhoenixApp(QWidget):
     # Log appender
     # --------------------------
     def _append_line(self, text, level="info"):
-        if not hasattr(self, "log"):
-            return
-        self.log.moveCursor(QTextCursor.End)
-        color = "#a0a0a0"
-        if level == "ok":
-            color = "#44d07a"
-        elif level == "err":
-            color = "#ff4d4f"
-        elif level == "warn":
-            color = "#f0ad4e"
-        self.log.insertHtml(f'<span style="color:{color}">{text}</span><br/>')
-        self.log.moveCursor(QTextCursor.End)
+        # same queue as worker output, so ordering is preserved; LogView renders per frame
+        self.log_transport.push(text, level)
+
+    def _poll_progress(self):
+        events = self.progress_latest.take()
+        if events:
+            self._on_progress(events[-1])
+
+    def _on_progress(self, ev):
+        self.progress_bar.setValue(int(ev.percent * 10))
+        self.progress_bar.setFormat(f"{ev.partition or 'mtk'}  {ev.percent:.1f}%")
+        parts = []
+        if ev.done is not None and ev.total:
+            parts.append(f"{ev.done / 2**20:.0f}/{ev.total / 2**20:.0f} MB")
+        if ev.rate is not None:
+            parts.append(f"{ev.rate:.1f} MB/s")
+        parts.append(f"ETA {progress.format_eta(ev.eta)}")
+        self.rate_label.setText("  ·  ".join(parts))
 
     # --------------------------
     # Actions
@@ -360,8 +597,76 @@ class PhoenixApp(QWidget):
             self._append_line(f"Using firmware folder: {d}", "ok")
         else:
             self._append_line("No folder selected. Falling back to defaults.", "warn")
+        if self.fw_set:
+            self.cmb_fw_set.setCurrentIndex(0)   # back to the folder; refreshes
+        else:
+            self._refresh_firmware_state()
+
+    def _reload_fw_sets(self, select=None):
+        import sqlite3
+        import fw_store
+        try:
+            sets = fw_store.get_store().sets()
+        except (OSError, sqlite3.Error) as e:
+            self._append_line(f"Firmware store unavailable: {e}", "warn")
+            return
+        select = select or self.fw_set
+        self.cmb_fw_set.blockSignals(True)
+        self.cmb_fw_set.clear()
+        self.cmb_fw_set.addItem("(firmware folder)", None)
+        for s in sets:
+            label = f"{s['name']}  ({s['version']})" if s["version"] else s["name"]
+            self.cmb_fw_set.addItem(label, s["name"])
+        i = self.cmb_fw_set.findData(select) if select else 0
+        self.cmb_fw_set.blockSignals(False)
+        if i < 0:
+            self._append_line(f"Firmware set {select} is no longer in the store; using the folder.", "warn")
+            i = 0
+        if self.cmb_fw_set.currentIndex() == i:
+            self._on_fw_set_changed(i)
+        else:
+            self.cmb_fw_set.setCurrentIndex(i)
+
+    def _on_fw_set_changed(self, index):
+        name = self.cmb_fw_set.itemData(index)
+        if name == self.fw_set:
+            return
+        self.fw_set = name
+        utils.set_fw_set(name)
+        self._append_line(f"Using firmware set: {name}" if name else "Using the firmware folder.", "ok")
         self._refresh_firmware_state()
 
+    def _import_fw_set(self):
+        d = QFileDialog.getExistingDirectory(self, "Select firmware folder to import", self.fw_dir or "")
+        if not d:
+            return
+        name, ok = QInputDialog.getText(self, "Import firmware set", "Set name:", text=os.path.basename(d))
+        if not ok or not name.strip():
+            return
+        version, _ = QInputDialog.getText(self, "Import firmware set", "Version (optional):")
+        self.btn_import_set.setEnabled(False)
+        threading.Thread(target=self._import_worker, args=(name.strip(), d, version.strip() or None),
+                         daemon=True).start()
+
+    def _import_worker(self, name, folder, version):
+        import sqlite3
+        import fw_store
+        res = {"ok": False, "set": name}
+        try:
+            for line in fw_store.get_store().import_set(name, folder, version=version, replace=True, result=res):
+                self._append_line(line, "info")
+        except (OSError, sqlite3.Error, fw_store.StoreError) as e:
+            self._append_line(f"Import failed: {e}", "err")
+        self.logbus.imported.emit(res)
+
+    def _on_set_imported(self, res):
+        self.btn_import_set.setEnabled(True)
+        if res.get("ok"):
+            self._append_line(f"Firmware set {res['set']} imported.", "ok")
+            if res["set"] == self.fw_set:
+                self._refresh_firmware_state()   # re-imported in place
+            self._reload_fw_sets(select=res["set"])
+
     def _choose_mtk_exe(self):
         path, _ = QFileDialog.getOpenFileName(
             self, "Select mtk.exe", os.path.dirname(__file__), "Executable (*.exe);;All files (*.*)"
@@ -375,27 +680,45 @@ class PhoenixApp(QWidget):
 
     def _ensure_mtk_on_path(self):
         """Prepend chosen mtk.exe folder to PATH so mtk_wrapper finds it."""
-        if not self.mtk_path:
-            return
-        folder = os.path.dirname(self.mtk_path)
-        env = os.environ.get("PATH", "")
-        if folder not in env:
-            os.environ["PATH"] = folder + os.pathsep + env
-
-    def _refresh_firmware_state(self):
-        self.paths = utils.list_firmware_images(self.fw_dir)
-
-        def mark(lbl, path):
-            base = lbl.text().split(":")[0]
-            if path and os.path.isfile(path):
-                lbl.setText(f"{os.path.basename(path)}: ready ✅")
-            else:
-                lbl.setText(f"{base}: missing ❌")
+        if self.mtk_path:
+            utils.ensure_mtk_on_path(self.mtk_path)
 
-        mark(self.lbl_boot, self.paths.get("boot"))
-        mark(self.lbl_vbmeta, self.paths.get("vbmeta"))
-        mark(self.lbl_super, self.paths.get("super_or_system"))
-        mark(self.lbl_vendor, self.paths.get("vendor"))
+    def _refresh_firmware_state(self, *_):
+        """Re-scan the firmware folders off the UI thread; _on_scanned applies the result."""
+        self._fw_gen += 1
+        self.paths = {}
+        self.verify_state = {}
+        for key, lbl in self._image_labels().items():
+            lbl.setText(f"{lbl.text().split(':')[0]}: scanning…")
+        self._update_buttons()
+        threading.Thread(target=self._scan_worker, args=(self._fw_gen, self.fw_dir, self.fw_set),
+                         daemon=True).start()
+
+    def _scan_worker(self, gen, fw_dir, fw_set):
+        if not fw_set:
+            self.logbus.scanned.emit((gen, utils.list_firmware_images(fw_dir)))
+            return
+        # a set is a catalog lookup, no folder is scanned
+        import sqlite3
+        import fw_store
+        try:
+            paths = fw_store.get_store().paths(fw_set)
+        except (OSError, sqlite3.Error) as e:
+            paths = None
+            self._append_line(f"Firmware store: {e}", "err")
+        if paths is None:
+            self._append_line(f"Firmware set {fw_set} not found; scanning the firmware folder.", "warn")
+            paths = utils.list_firmware_images(fw_dir)
+        self.logbus.scanned.emit((gen, paths))
+
+    def _on_scanned(self, payload):
+        gen, paths = payload
+        if gen != self._fw_gen:
+            return  # stale: another scan was started meanwhile
+        self.paths = paths
+
+        for key, lbl in self._image_labels().items():
+            self._mark(key, lbl)
 
         # log resolved paths
         self._append_line(f"boot: {self.paths.get('boot')}", "info")
@@ -403,17 +726,100 @@ class PhoenixApp(QWidget):
         self._append_line(f"super/system: {self.paths.get('super_or_system')}", "info")
         self._append_line(f"vendor: {self.paths.get('vendor')}", "info")
 
+        # hash against the manifest off the UI thread; labels update when done
+        threading.Thread(target=self._verify_worker, args=(dict(self.paths),), daemon=True).start()
+
+        self._update_buttons()
+        self._startup_step("firmware")
+
+    def _image_labels(self):
+        return {
+            "boot": self.lbl_boot,
+            "vbmeta": self.lbl_vbmeta,
+            "super_or_system": self.lbl_super,
+            "vendor": self.lbl_vendor,
+        }
+
+    def _mark(self, key, lbl):
+        path = self.paths.get(key)
+        base = lbl.text().split(":")[0]
+        if not fw_archive.exists(path):
+            lbl.setText(f"{base}: missing ❌")
+            return
+        status = self.verify_state.get(key, (None, ""))[0]
+        tag = {
+            verify.VERIFIED: "verified 🔒",
+            verify.UNVERIFIED: "unverified",
+            verify.MISMATCH: "CHECKSUM MISMATCH ❌",
+        }.get(status, "verifying…")
+        lbl.setText(f"{fw_archive.describe(path)}: ready ✅  ·  {tag}")
+
+    def _verify_worker(self, paths):
+        sparse_info = {}
+        for key, path in paths.items():
+            # archive members: only the header is checked until they are extracted for flashing
+            if path and sparse.is_sparse(path) and not fw_archive.is_member(path):
+                try:
+                    sparse_info[key] = sparse.parse(path)
+                except sparse.SparseError as e:
+                    sparse_info[key] = e
+        self.logbus.verified.emit((paths, verify.verify_images(paths), sparse_info))
+
+    def _on_verified(self, payload):
+        paths, results, sparse_info = payload
+        if paths != self.paths:
+            return  # stale: firmware was re-scanned meanwhile
+        self.verify_state = results
+        for key, info in sparse_info.items():
+            if isinstance(info, Exception):
+                self._append_line(f"{key}: corrupt sparse image ({info})", "err")
+                self.verify_state[key] = (verify.MISMATCH, str(info))
+            else:
+                self._append_line(
+                    f"{key}: Android sparse image — expands to {info.expanded_size / 2**30:.2f} GiB, "
+                    f"{info.data_ratio:.0%} data (streamed raw at flash time)", "info")
+        for key, lbl in self._image_labels().items():
+            self._mark(key, lbl)
+            status, detail = results.get(key, (None, ""))
+            if status == verify.MISMATCH:
+                self._append_line(f"{key}: checksum mismatch ({detail})", "err")
+            elif status == verify.VERIFIED:
+                self._append_line(f"{key}: sha256 verified", "ok")
+        self._update_buttons()
+
+    def _refresh_device_state(self):
+        state = self.monitor.state
+        if state.scanned:
+            self.device_label.setText(f"Device: {'Connected' if state.connected else 'Not Detected'}  |  {state.detail}")
+            self._startup_step("device")
+        self._update_buttons()
+
+    def _update_buttons(self):
+        """Enable actions from the cached firmware paths and cached device state (no I/O)."""
+        busy = bool(self.jobs and self.jobs.busy())
+        # one operation at a time per device; the Station tab drives devices on its own
+        station_idle = self.station_tab is None or self.station_tab.station.idle()
+        gate = self.jobs is not None and self._is_device_connected() and not busy and station_idle
+        self.btn_cancel.setEnabled(busy)
+
+        def usable(key):
+            # a known-bad checksum blocks the image; unverified ones are allowed
+            return bool(self.paths.get(key)) and self.verify_state.get(key, ("",))[0] != verify.MISMATCH
+
         # buttons by availability
-        self.btn_flash_boot.setEnabled(bool(self.paths.get("boot")))
-        self.btn_flash_vbmeta.setEnabled(bool(self.paths.get("vbmeta")))
-        self.btn_flash_super.setEnabled(bool(self.paths.get("super_or_system")))
-        self.btn_flash_vendor.setEnabled(bool(self.paths.get("vendor")))
+        self.btn_flash_boot.setEnabled(gate and usable("boot"))
+        self.btn_flash_vbmeta.setEnabled(gate and usable("vbmeta"))
+        self.btn_flash_super.setEnabled(gate and usable("super_or_system"))
+        self.btn_flash_vendor.setEnabled(gate and usable("vendor"))
+        for b in [self.btn_reset, self.btn_reboot_bl, self.btn_wipe]:
+            b.setEnabled(gate)
+        self.btn_delta_dry.setEnabled(gate and usable("super_or_system"))
 
         # 3-file mode readiness
-        have_boot  = bool(self.paths.get("boot"))
-        have_vbm   = bool(self.paths.get("vbmeta"))
-        have_super = bool(self.paths.get("super_or_system"))
-        have_vendor = bool(self.paths.get("vendor"))
+        have_boot  = usable("boot")
+        have_vbm   = usable("vbmeta")
+        have_super = usable("super_or_system")
+        have_vendor = usable("vendor")
         skip_vendor = self.chk_threefile.isChecked()
 
         ready = (have_boot and have_vbm and have_super and (have_vendor or skip_vendor))
@@ -421,24 +827,10 @@ class PhoenixApp(QWidget):
         if skip_vendor:
             self.btn_flash_vendor.setEnabled(False)
 
-        self.btn_oneclick.setEnabled(ready and self._is_device_connected())
-
-    def _refresh_device_state(self):
-        connected, detail = mtk.detect_device()
-        self.device_label.setText(f"Device: {'Connected' if connected else 'Not Detected'}  |  {detail}")
-
-        gate = connected
-        for b in [
-            self.btn_flash_boot, self.btn_flash_vbmeta, self.btn_flash_super, self.btn_flash_vendor,
-            self.btn_reset, self.btn_reboot_bl, self.btn_wipe
-        ]:
-            b.setEnabled(bool(b.isEnabled() and gate))
-
-        self.btn_oneclick.setEnabled(self.btn_oneclick.isEnabled() and gate)
+        self.btn_oneclick.setEnabled(ready and gate)
 
     def _is_device_connected(self):
-        connected, _ = mtk.detect_device()
-        return connected
+        return self.monitor.state.connected
 
     def _community_toggle(self, state):
         if state == Qt.Checked:
@@ -454,28 +846,53 @@ class PhoenixApp(QWidget):
             if self.fight_overlay:
                 self.fight_overlay.stop()
 
+    def _verify_toggle(self, state):
+        cfg = utils.load_config()
+        cfg["verify_after_write"] = self.chk_verify.isChecked()
+        utils.save_config(cfg)
+
+    def _backup_toggle(self, state):
+        cfg = utils.load_config()
+        cfg["backup_before_restore"] = self.chk_backup.isChecked()
+        utils.save_config(cfg)
+
+    def _verify_summary(self, res):
+        for part, (ok, secs) in res.get("verify", {}).items():
+            self.log_transport.push(f"Verify {part}: {'PASS' if ok else 'FAIL'} in {secs:.1f} s", "ok" if ok else "err")
+
     def _ensure_safe(self):
         if not self._is_device_connected():
             QMessageBox.warning(self, "No device", "No device detected. Connect your Rabbit R1 in the correct mode and try again.")
             return False
         return True
 
-    def _worker(self, generator, done_cb=None):
+    # --------------------------
+    # Jobs (one serialized queue; see jobs.JobEngine)
+    # --------------------------
+    def _submit(self, name, make_gen):
+        """Queue make_gen(job) -> generator of lines; output is classified, shown and saved per run."""
         self._ensure_mtk_on_path()  # ensure PATH contains chosen mtk.exe
-        log_path = utils.log_filename()
-        with open(log_path, "a", encoding="utf-8") as logf:
-            for line in generator:
-                level = "info"
-                low = line.lower()
-                if "error" in low or "fail" in low or "denied" in low:
-                    level = "err"
-                elif "ok" in low or "success" in low or "done" in low:
-                    level = "ok"
-                self.logbus.line.emit(line, level)
-                logf.write(line + "\n")
-        self.logbus.line.emit(f"Saved log to {log_path}", "warn")
-        if done_cb:
-            done_cb()
+        job = self.jobs.submit("local", name, make_gen)
+        self._update_buttons()
+        return job
+
+    def _job_line(self, job, text, level):
+        # level comes from events.classify() via the job engine
+        self.log_transport.push(text, level)
+
+    def _on_job_state(self, job):
+        import jobs
+        if job.state == jobs.CANCELLED:
+            self._append_line(f"{job.name}: cancelled.", "warn")
+        elif job.state == jobs.FAILED:
+            self._append_line(f"{job.name}: FAILED ({job.error or 'see log'})", "err")
+        if job.state in jobs.FINAL_STATES and job.log_path:
+            self._append_line(f"Saved log to {job.log_path}", "warn")
+        self._update_buttons()
+
+    def _cancel_jobs(self):
+        self.jobs.cancel_all()
+        self._append_line("Cancelling …", "warn")
 
     def _flash_single(self, key, image_path):
         if not self._ensure_safe():
@@ -488,20 +905,41 @@ class PhoenixApp(QWidget):
             )
             return
 
-        # Decide partition name from key / filename
-        if key == "boot":
-            part = "boot"
-        elif key == "vbmeta":
-            part = "vbmeta"
-        elif key == "super_or_system":
-            base = os.path.basename(image_path).lower()
-            part = "super" if base.startswith("super") else "system"
-        else:
-            part = "vendor"
+        # Partition name from key / filename; the job's preflight settles
+        # super vs system from the device's partition table
+        part = utils.partition_for(key, image_path)
+
+        self._append_line(f"Flashing {part} from {fw_archive.describe(image_path)} …", "info")
+        verify_after = self.chk_verify.isChecked()
+        use_delta = self.chk_delta.isChecked()
+        import delta
+        import mtk_wrapper as mtk
+
+        def run_one(job):
+            pre = {}
+            yield from mtk.preflight([(part, image_path)], result=pre)
+            if not pre["ok"]:
+                job.result["ok"] = False
+                return
+            [(target, _)] = pre["plan"]
+            if use_delta:
+                res = {}
+                yield from delta.delta_flash(target, image_path, result=res,
+                                             on_progress=self.progress_latest.update)
+                job.result["ok"] = res.get("ok", True)
+                if verify_after and res.get("written"):
+                    vres = {}
+                    yield from mtk.verify_partition(target, image_path, result=vres)
+                    self._verify_summary(vres)
+                    job.result["ok"] = job.result["ok"] and all(ok for ok, _ in vres.get("verify", {}).values())
+                return
+            res = {}
+            yield from mtk.flash_partitions([(target, image_path)], result=res, batch=False,
+                                            on_progress=self.progress_latest.update, verify_after=verify_after)
+            self._verify_summary(res)
+            job.result["ok"] = not res.get("failed") and all(ok for ok, _ in res.get("verify", {}).values())
 
-        self._append_line(f"Flashing {part} from {os.path.basename(image_path)} …", "info")
-        t = threading.Thread(target=self._worker, args=(mtk.flash_partition(part, image_path),))
-        t.start()
+        self._submit(f"flash {part}", run_one)
 
     def _one_click_restore(self):
         if not self._ensure_safe():
@@ -514,52 +952,111 @@ class PhoenixApp(QWidget):
             if confirm != QMessageBox.Yes:
                 return
 
-        seq = []
-        if self.paths.get("vbmeta"):
-            seq.append(("vbmeta", self.paths["vbmeta"]))
-        if self.paths.get("boot"):
-            seq.append(("boot", self.paths["boot"]))
-        if self.paths.get("super_or_system"):
-            img = self.paths["super_or_system"]
-            base = os.path.basename(img).lower()
-            part = "super" if base.startswith("super") else "system"
-            seq.append((part, img))
-
         skip_vendor = self.chk_threefile.isChecked()
-        if not skip_vendor and self.paths.get("vendor"):
-            seq.append(("vendor", self.paths["vendor"]))
-        elif skip_vendor:
-            self.logbus.line.emit("3-file mode: skipping vendor partition.", "warn")
-
-        def run_seq():
-            for part, img in seq:
-                self.logbus.line.emit(f"Flashing {part} …", "info")
-                for line in mtk.flash_partition(part, img):
-                    self.logbus.line.emit(line, "info")
-            if self.chk_wipe.isChecked():
-                self.logbus.line.emit("Erasing userdata …", "warn")
-                for line in mtk.wipe_userdata():
-                    self.logbus.line.emit(line, "info")
-            self.logbus.line.emit("Restore sequence complete.", "ok")
-
-        t = threading.Thread(target=self._worker, args=(run_seq(),))
-        t.start()
+        seq = utils.restore_plan(self.paths, skip_vendor)
+        if skip_vendor:
+            self.log_transport.push("3-file mode: skipping vendor partition.", "warn")
+
+        verify_after = self.chk_verify.isChecked()
+
+        wipe = self.chk_wipe.isChecked()
+        import mtk_wrapper as mtk
+
+        backup_parts = None
+        if self.chk_backup.isChecked():
+            import backup
+            backup_parts = backup.default_partitions(seq)
+            self.log_transport.push(backup.preview(backup_parts, mtk.current_device_id()), "info")
+
+        asked = []   # the user's resume answer, once given
+
+        def run_seq(job):
+            def ask_resume(jn, parts, trusted):
+                # job thread, after preflight: an earlier restore of this device died halfway
+                if asked:
+                    return True   # a retry of this job resumes its own journal
+                reply = {"answer": None, "done": threading.Event()}
+                self.logbus.resume_ask.emit((jn, parts, trusted, reply))
+                while not reply["done"].wait(0.2):
+                    if job.cancelled.is_set():
+                        return None
+                asked.append(reply["answer"])
+                return reply["answer"]
+
+            res = job.result
+            yield from mtk.restore_sequence(seq, wipe=wipe, verify_after=verify_after,
+                                            on_progress=self.progress_latest.update, result=res,
+                                            backup_parts=backup_parts, resume=ask_resume)
+            if res.get("backup"):
+                self.log_transport.push(f"Backup saved to {res['backup']['dir']}",
+                                        "ok" if res["backup"]["ok"] else "err")
+            if res.get("failed"):
+                self.log_transport.push(f"Failed partitions: {', '.join(res['failed'])}", "err")
+            self._verify_summary(res)
+            if res.get("ok"):
+                self.log_transport.push("Restore sequence complete.", "ok")
+            elif res.get("cancelled"):
+                self.log_transport.push("Restore cancelled.", "warn")
+            else:
+                self.log_transport.push("Restore sequence FAILED." + (" userdata was not erased." if wipe else ""), "err")
+
+        self._submit("one-click restore", run_seq)
+
+    def _on_resume_ask(self, ask):
+        """Resume prompt for a restore job waiting on reply: answer True (resume), False (full) or None (cancel)."""
+        jn, parts, trusted, reply = ask
+        unsure = ("" if trusted else
+                  "\n\nThis device reports no USB serial, so the journal may belong to a different R1 "
+                  "that was on this port. Only resume if it is the same device.")
+        box = QMessageBox(self)
+        box.setWindowTitle("Resume restore?")
+        box.setText(f"The last {jn.describe()}.\n\n"
+                    f"Resume and skip {', '.join(parts)} (already written with the same images)?{unsure}")
+        resume_btn = box.addButton("Resume", QMessageBox.AcceptRole)
+        full_btn = box.addButton("Full restore", QMessageBox.DestructiveRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec()
+        if box.clickedButton() == resume_btn:
+            reply["answer"] = True
+        elif box.clickedButton() == full_btn:
+            reply["answer"] = False
+        reply["done"].set()
+
+    def _run_delta_dry_run(self):
+        if not self._ensure_safe():
+            return
+        img = self.paths.get("super_or_system")
+        if not img:
+            return
+        part = utils.partition_for("super_or_system", img)
+        self._append_line(f"Delta dry-run for {part} …", "info")
+        import delta
+        import mtk_wrapper as mtk
+
+        def run_dry(job):
+            pre = {}
+            yield from mtk.preflight([(part, img)], result=pre)
+            if pre["ok"]:
+                yield from delta.delta_flash(pre["plan"][0][0], img, dry_run=True)
+
+        self._submit(f"delta dry-run {part}", run_dry)
 
     def _run_tool_reset(self):
+        import mtk_wrapper as mtk
         if not self._ensure_safe():
             return
         self._append_line("Sending reset …", "warn")
-        t = threading.Thread(target=self._worker, args=(mtk.reset_device(),))
-        t.start()
+        self._submit("reset", lambda job: mtk.reset_device(result=job.result))
 
     def _run_tool_reboot_bl(self):
+        import mtk_wrapper as mtk
         if not self._ensure_safe():
             return
         self._append_line("Rebooting (bootloader) …", "warn")
-        t = threading.Thread(target=self._worker, args=(mtk.reboot_to_bootloader(),))
-        t.start()
+        self._submit("reboot", lambda job: mtk.reboot_to_bootloader(result=job.result))
 
     def _run_tool_wipe(self):
+        import mtk_wrapper as mtk
         if not self._ensure_safe():
             return
         confirm = QMessageBox.question(
@@ -568,22 +1065,36 @@ class PhoenixApp(QWidget):
         if confirm != QMessageBox.Yes:
             return
         self._append_line("Erasing userdata …", "warn")
-        t = threading.Thread(target=self._worker, args=(mtk.wipe_userdata(),))
-        t.start()
+        self._submit("wipe userdata", lambda job: mtk.wipe_userdata(result=job.result))
 
     def _open_devmgmt(self):
+        import mtk_wrapper as mtk
         ok, msg = mtk.open_device_manager()
         self._append_line(msg, "ok" if ok else "err")
 
     def _open_zadig(self):
+        import mtk_wrapper as mtk
         ok, msg = mtk.open_zadig()
         self._append_line(msg, "ok" if ok else "err")
 
     def _refresh_all(self):
+        self.monitor.rescan()
         self._refresh_firmware_state()
         self._refresh_device_state()
         self._append_line("Refreshed firmware + device status.", "ok")
 
+    def closeEvent(self, event):
+        if self.jobs:
+            self.jobs.cancel_all()
+        if self.station_tab:
+            self.station_tab.station.cancel_all()
+        if self.metrics_tab:
+            self.metrics_tab.close_store()
+        self.monitor.remove_listener(self.devbus.on_change)
+        self.monitor.stop()
+        self.log_store.close()
+        super().closeEvent(event)
+
 
 def main():
     app = QApplication(sys.argv)
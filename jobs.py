@@ -0,0 +1,325 @@
+# jobs.py
+# Job engine for mtk operations: one serialized queue per device, states,
+# cancellation, per-step timeouts and retry with backoff.
+
+import contextlib
+import itertools
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import disk_log
+import events
+import metrics
+import mtk_wrapper as mtk
+import utils
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# output that marks a failure as a USB hiccup worth retrying
+TRANSIENT_RE = re.compile(
+    r"libusb_error|usb ?error|pipe error|resource busy|no such device|device not found|"
+    r"handshake fail|timed? ?out|errno 5\b|errno 19\b|input/output error|disconnected",
+    re.I,
+)
+# output lines a Job keeps (the full output goes to its log file / the event log)
+MAX_JOB_LINES = 2000
+
+
+class Job:
+    """
+    One unit of work for one device: make_gen(job) returns a generator of
+    log lines and may fill job.result (set result["ok"] = False, or leave a
+    non-zero result["returncode"], to fail).
+
+    Also the process-control object mtk_wrapper.job_control() expects:
+    .cancelled, .step_timeout, .idle_timeout, .attach(), .detach().
+    Stage timings are collected in .timeline (metrics.Timeline). .lines
+    holds the last MAX_JOB_LINES output lines, .line_count counts them all.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, device_id, name, make_gen, device=None, retries=0, backoff=2.0,
+                 step_timeout=None, idle_timeout=None):
+        self.id = next(self._ids)
+        self.device_id = device_id
+        self.device = device            # device_monitor.UsbDevice to pin mtk calls to, if any
+        self.name = name
+        self.make_gen = make_gen
+        self.retries = retries
+        self.backoff = backoff
+        self.step_timeout = step_timeout
+        self.idle_timeout = idle_timeout
+        self.state = QUEUED
+        self.result = {}
+        self.lines = deque(maxlen=MAX_JOB_LINES)
+        self.line_count = 0
+        self.transient = False          # this attempt printed a TRANSIENT_RE match
+        self.progress = None            # last progress.ProgressEvent
+        self.error = None
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+        self.timeline = metrics.Timeline()
+        self.started = None
+        self.finished = None
+        self.log_path = None
+        self.cancelled = threading.Event()
+        self._running_cmds = set()
+        self._lock = threading.Lock()
+
+    # ---- process control (used by mtk_wrapper._run) ----
+    def attach(self, handle):
+        """handle.cancel() kills a running mtk command (see mtk_async.iter_sync)."""
+        with self._lock:
+            self._running_cmds.add(handle)
+        if self.cancelled.is_set():
+            handle.cancel()
+
+    def detach(self, handle):
+        with self._lock:
+            self._running_cmds.discard(handle)
+
+    def cancel(self):
+        """Cooperative cancel: stop before the next mtk call, kill the current one."""
+        self.cancelled.set()
+        with self._lock:
+            cmds = list(self._running_cmds)
+        for h in cmds:
+            h.cancel()
+
+    def lines_since(self, count) -> tuple:
+        """(line_count, the lines printed after the first count that .lines still holds); safe from any thread."""
+        with self._lock:
+            new = min(self.line_count - count, len(self.lines))
+            return self.line_count, list(self.lines)[len(self.lines) - new:]
+
+    @property
+    def status(self) -> str:
+        return self.state
+
+    @property
+    def elapsed(self) -> float:
+        if not self.started:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+class JobEngine:
+    """
+    Per-device FIFO queues. Jobs for one device never overlap; different
+    devices run in parallel up to `concurrency`, and up to `per_group`
+    per group_of(device_id) (e.g. USB bus). Callbacks run on job threads:
+        on_line(job, text, level), on_state(job)
+    Output lines are classified with events.classify(). log_path(job) ->
+    str | None names a per-job log file; event_log (events.EventLog)
+    receives every line and state change as a structured event; metrics
+    (metrics.MetricsStore) gets every finished job's stage timings.
+    """
+
+    def __init__(self, concurrency=1, per_group=None, group_of=None,
+                 on_line=None, on_state=None, log_path=None, event_log=None, metrics=None):
+        self.concurrency = concurrency
+        self.per_group = per_group
+        self.group_of = group_of or (lambda device_id: "")
+        self.on_line = on_line
+        self.on_state = on_state
+        self.log_path = log_path
+        self.event_log = event_log
+        self.metrics = metrics
+        self._queues = {}      # device_id -> deque[Job]
+        self._running = {}     # device_id -> Job
+        self.history = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    # ---- queueing ----
+    def submit(self, device_id, name, make_gen, **kw) -> Job:
+        cfg = utils.get_job_limits()
+        for k, v in cfg.items():
+            kw.setdefault(k, v)
+        job = Job(device_id, name, make_gen, **kw)
+        with self._lock:
+            self._queues.setdefault(device_id, deque()).append(job)
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job: Job) -> None:
+        with self._lock:
+            q = self._queues.get(job.device_id)
+            queued = q is not None and job in q
+            if queued:
+                q.remove(job)
+                job.state = CANCELLED
+                self.history.append(job)
+                self._idle.notify_all()
+        job.cancel()
+        if queued:
+            self._notify(job)
+
+    def cancel_device(self, device_id) -> None:
+        for job in self.jobs(device_id):
+            if job.state in (QUEUED, RUNNING):
+                self.cancel(job)
+
+    def cancel_all(self) -> None:
+        for job in self.jobs():
+            if job.state in (QUEUED, RUNNING):
+                self.cancel(job)
+
+    # ---- queries ----
+    def jobs(self, device_id=None) -> list:
+        with self._lock:
+            out = list(self.history) + list(self._running.values())
+            for q in self._queues.values():
+                out.extend(q)
+        return [j for j in out if device_id is None or j.device_id == device_id]
+
+    def running(self, device_id=None):
+        with self._lock:
+            if device_id is None:
+                return list(self._running.values())
+            return self._running.get(device_id)
+
+    def busy(self, device_id=None) -> bool:
+        with self._lock:
+            if device_id is None:
+                return bool(self._running) or any(self._queues.values())
+            return device_id in self._running or bool(self._queues.get(device_id))
+
+    def idle(self) -> bool:
+        return not self.busy()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._running and not any(self._queues.values()),
+                                       timeout)
+
+    # ---- scheduling ----
+    def _dispatch(self):
+        to_start = []
+        with self._lock:
+            groups = {}
+            for job in self._running.values():
+                g = self.group_of(job.device_id)
+                groups[g] = groups.get(g, 0) + 1
+            for dev_id, q in self._queues.items():
+                if len(self._running) >= self.concurrency:
+                    break
+                if not q or dev_id in self._running:
+                    continue
+                g = self.group_of(dev_id)
+                if self.per_group and groups.get(g, 0) >= self.per_group:
+                    continue
+                job = q.popleft()
+                job.state = RUNNING
+                job.started = time.monotonic()
+                self._running[dev_id] = job
+                groups[g] = groups.get(g, 0) + 1
+                to_start.append(job)
+        for job in to_start:
+            self._notify(job)
+            threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.device_id}-{job.id}",
+                             daemon=True).start()
+
+    def _run_job(self, job: Job):
+        logf = None
+        path = self.log_path(job) if self.log_path else None
+        if path:
+            # written by the disk_log thread; never blocks the output loop
+            logf = disk_log.get_writer().open_run(path)
+            job.log_path = path
+        state = FAILED
+        job.timeline.add("queue", job.started - job.queued_at)
+        try:
+            with metrics.recording(job.timeline), metrics.stage("other"):
+                state = self._attempts(job, logf)
+        finally:
+            if logf:
+                logf.close()
+        job.finished = time.monotonic()
+        job.state = state
+        if self.metrics is not None:
+            self.metrics.record(job)
+        with self._lock:
+            self._running.pop(job.device_id, None)
+            self.history.append(job)
+            self._idle.notify_all()
+        self._notify(job)
+        self._dispatch()
+
+    def _attempts(self, job, logf) -> str:
+        while True:
+            job.attempts += 1
+            job.result.clear()
+            job.transient = False
+            try:
+                with mtk.job_control(job), \
+                        (mtk.target_device(job.device) if job.device else contextlib.nullcontext()):
+                    for line in job.make_gen(job):
+                        self._line(job, line, logf)
+                if job.result.get("ok", job.result.get("returncode", 0) == 0):
+                    return DONE
+                job.error = job.result.get("error", "job reported failure")
+            except mtk.JobCancelled:
+                self._line(job, "Cancelled.", logf, "warn")
+                return CANCELLED
+            except mtk.StepTimeout as e:
+                job.error = str(e)
+                self._line(job, f"Timed out: {e}", logf, "err")
+            except Exception as e:
+                job.error = str(e)
+                self._line(job, f"Job error: {e}", logf, "err")
+
+            if job.cancelled.is_set():
+                return CANCELLED
+            transient = str(job.error).startswith("no output") or job.transient
+            if job.attempts > job.retries or not transient:
+                return FAILED
+            delay = job.backoff * (2 ** (job.attempts - 1))
+            self._line(job, f"Transient USB error; retry {job.attempts}/{job.retries} in {delay:.0f} s", logf, "warn")
+            with metrics.stage("backoff"):
+                if job.cancelled.wait(delay):
+                    return CANCELLED
+
+    # ---- callbacks ----
+    def _line(self, job, text, logf=None, level=None):
+        with job._lock:
+            job.lines.append(text)
+            job.line_count += 1
+        if not job.transient and TRANSIENT_RE.search(text):
+            job.transient = True
+        if logf:
+            logf.write(text)
+        if self.event_log is not None:
+            level = self.event_log.line(job, text, level)["level"]
+        else:
+            level = level or events.classify(text)
+        if self.on_line:
+            self.on_line(job, text, level)
+
+    def _notify(self, job):
+        if self.event_log is not None:
+            self.event_log.job(job)
+        if self.on_state:
+            try:
+                self.on_state(job)
+            except Exception:
+                pass
+
+
+def default_log_path(log_dir):
+    """log_path factory: <log_dir>/PhoenixR1_<device>_<ts>_<job>.txt"""
+    def path(job):
+        ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in job.device_id)
+        return os.path.join(log_dir, f"PhoenixR1_{safe}_{ts}_{job.name}.txt")
+    return path
@@ -0,0 +1,135 @@
+# journal.py
+# Per-device restore journal, so a restore that died halfway (USB glitch,
+# crash, cancel) resumes where it stopped instead of re-flashing everything.
+#
+#   journals/<device>.json   {"device", "started", "updated", "finished",
+#                             "plan": [[partition, image], ...],
+#                             "steps": {step: {"sha256", "image", "ts", "verified"}}}
+#
+# A step is a partition written with a given image (identified by its
+# SHA-256, see verify.cached_sha256), or the pre-flash "backup". An unfinished
+# journal lets the next restore skip the partitions it already wrote with
+# the same image. Once a restore finishes, its journal only records history:
+# the next restore starts from scratch. Every change rewrites the file
+# atomically (temp file, fsync, rename), so a crash leaves the old
+# version or the new one, never a torn file.
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import utils
+import verify
+
+_lock = threading.Lock()
+
+
+def _journal_dir() -> Path:
+    d = utils._app_dir() / "journals"
+    d.mkdir(exist_ok=True)
+    return d
+
+
+def _safe(name) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+def image_sha(img) -> str | None:
+    try:
+        return verify.cached_sha256(img)
+    except OSError:
+        return None
+
+
+def write_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # make the rename itself durable
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class RestoreJournal:
+    """The restore journal of one device (a USB serial or port; None is "unknown")."""
+
+    def __init__(self, device_id=None, path=None):
+        self.device_id = device_id
+        self.path = Path(path) if path else _journal_dir() / f"{_safe(device_id or 'unknown')}.json"
+        self.data = self._load()
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if isinstance(data.get("steps"), dict):
+                return data
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {"device": self.device_id, "finished": True, "steps": {}}
+
+    def _save(self) -> None:
+        # caller holds _lock
+        self.data["updated"] = time.time()
+        write_atomic(self.path, self.data)
+
+    # ---- queries
+    @property
+    def unfinished(self) -> bool:
+        return not self.data.get("finished", True)
+
+    def completed(self, step, sha256=None) -> bool:
+        """True if an unfinished restore already did step (with an image of this sha256)."""
+        done = self.data["steps"].get(step) if self.unfinished else None
+        return done is not None and done.get("sha256") == sha256
+
+    def resumable(self, plan) -> list:
+        """Partitions of plan an unfinished restore already wrote with the same image (only those are hashed)."""
+        if not self.unfinished:
+            return []
+        return [part for part, img in plan if part in self.data["steps"] and self.completed(part, image_sha(img))]
+
+    def describe(self) -> str:
+        """Human summary of an unfinished journal, e.g. for a resume prompt."""
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.data.get("updated", 0)))
+        steps = ", ".join(self.data["steps"]) or "nothing"
+        return f"restore of {self.device_id or 'this device'} stopped at {when} after: {steps}"
+
+    # ---- updates
+    def start(self, plan) -> None:
+        """Begin (or continue) a restore of plan; a finished journal starts over."""
+        with _lock:
+            if not self.unfinished:
+                self.data = {"device": self.device_id, "started": time.time(), "steps": {}}
+            self.data["finished"] = False
+            self.data["plan"] = [[part, img] for part, img in plan]
+            self._save()
+
+    def record(self, step, sha256=None, image=None, verified=False, **extra) -> None:
+        with _lock:
+            self.data["steps"][step] = {"sha256": sha256, "image": image, "ts": time.time(),
+                                        "verified": verified, **extra}
+            self._save()
+
+    def forget(self, step) -> None:
+        with _lock:
+            if self.data["steps"].pop(step, None) is not None:
+                self._save()
+
+    def finish(self) -> None:
+        with _lock:
+            self.data["finished"] = True
+            self._save()
+
+    def reset(self) -> None:
+        """Force the next restore to start from scratch."""
+        if self.unfinished:
+            self.finish()
@@ -0,0 +1,91 @@
+# log_transport.py
+# Worker-thread -> UI-thread log handoff without one Qt event per line.
+
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 20000
+
+
+class LogTransport:
+    """
+    Bounded multi-producer / single-consumer queue of (text, level).
+
+    Producers call push() from any thread; it is a plain deque.append
+    (atomic under the GIL, no lock taken). The UI calls drain() on a timer
+    and gets everything queued since the last call, up to max_items.
+
+    When the buffer is full:
+      policy="drop_oldest": the oldest queued line is discarded (default;
+                            the newest output is what the operator needs).
+      policy="block":       the producer waits up to block_timeout seconds
+                            for the consumer to catch up, then drops.
+    Dropped lines are counted in self.dropped. Counters are updated without
+    a lock, so they are approximate while several producers are racing.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, policy: str = "drop_oldest",
+                 block_timeout: float = 0.5):
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"unknown policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._q = deque()
+        self._space = threading.Event()
+        self.pushed = 0
+        self.drained = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._q)
+
+    def push(self, text: str, level: str = "info") -> bool:
+        """Queue one line. Returns False if it (or an older line) was dropped."""
+        q = self._q
+        ok = True
+        if len(q) >= self.capacity:
+            if self.policy == "block":
+                deadline = time.monotonic() + self.block_timeout
+                while len(q) >= self.capacity and time.monotonic() < deadline:
+                    self._space.clear()
+                    self._space.wait(0.005)
+            if len(q) >= self.capacity:
+                try:
+                    q.popleft()
+                except IndexError:
+                    pass
+                self.dropped += 1
+                ok = False
+        q.append((text, level))
+        self.pushed += 1
+        n = len(q)
+        if n > self.high_water:
+            self.high_water = n
+        return ok
+
+    def drain(self, max_items: int | None = None) -> list:
+        q = self._q
+        n = len(q) if max_items is None else min(len(q), max_items)
+        out = []
+        pop = q.popleft
+        for _ in range(n):
+            try:
+                out.append(pop())
+            except IndexError:
+                break
+        self.drained += len(out)
+        if out:
+            self._space.set()
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "pushed": self.pushed,
+            "drained": self.drained,
+            "dropped": self.dropped,
+            "queued": len(self._q),
+            "high_water": self.high_water,
+        }
@@ -0,0 +1,118 @@
+# log_view.py
+# Bounded log model + virtualized renderer for the live console.
+
+import threading
+from collections import deque
+
+from PySide6.QtWidgets import QPlainTextEdit
+from PySide6.QtGui import QTextCharFormat, QColor, QTextCursor
+from PySide6.QtCore import QTimer
+
+LEVEL_COLORS = {
+    "info": "#a0a0a0",
+    "ok": "#44d07a",
+    "err": "#ff4d4f",
+    "warn": "#f0ad4e",
+}
+
+FRAME_MS = 33  # ~30 fps repaint cadence
+MAX_BATCH = 2000  # lines pulled from the transport per frame
+
+
+class LogStore:
+    """
+    Ring buffer of (text, level) capped at max_lines.
+    append() is thread-safe; lines not yet rendered are kept in a
+    second bounded buffer and handed out by take_pending(). If a
+    history sink is given (disk_log.LogWriter), every line is also
+    queued there so the full history lives on disk rather than in the
+    widget; the sink writes on its own thread.
+    """
+
+    def __init__(self, max_lines: int = 5000, history=None):
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)
+        self._pending = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self.history = history
+
+    def append(self, text: str, level: str = "info") -> None:
+        self.extend([(text, level)])
+
+    def extend(self, items) -> None:
+        items = list(items)
+        with self._lock:
+            self.lines.extend(items)
+            self._pending.extend(items)
+        if self.history is not None:
+            self.history.write_many(t for t, _ in items)
+
+    def take_pending(self) -> list:
+        with self._lock:
+            items = list(self._pending)
+            self._pending.clear()
+        return items
+
+    def close(self) -> None:
+        self.take_pending()
+        if self.history is not None:
+            self.history.flush()
+
+
+class LogView(QPlainTextEdit):
+    """
+    QPlainTextEdit fed from a LogStore in one batch per frame.
+    If a LogTransport is given, worker output queued there is moved into
+    the store on the same frame tick.
+    """
+
+    def __init__(self, store: LogStore, transport=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.transport = transport
+        self._reported_drops = 0
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setMaximumBlockCount(store.max_lines)
+        self._empty = True
+
+        self._formats = {}
+        for level, color in LEVEL_COLORS.items():
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            self._formats[level] = fmt
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(FRAME_MS)
+        self._timer.timeout.connect(self._drain)
+        self._timer.start()
+
+    def _drain(self):
+        if self.transport is not None:
+            batch = self.transport.drain(MAX_BATCH)
+            if batch:
+                self.store.extend(batch)
+            dropped = self.transport.dropped
+            if dropped > self._reported_drops:
+                self.store.append(
+                    f"… {dropped - self._reported_drops} log lines dropped (output faster than the UI can show)",
+                    "warn")
+                self._reported_drops = dropped
+        items = self.store.take_pending()
+        if not items:
+            return
+        bar = self.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 2
+
+        cur = QTextCursor(self.document())
+        cur.movePosition(QTextCursor.End)
+        cur.beginEditBlock()
+        for text, level in items:
+            if not self._empty:
+                cur.insertBlock()
+            cur.insertText(text, self._formats.get(level, self._formats["info"]))
+            self._empty = False
+        cur.endEditBlock()
+
+        if at_bottom:
+            bar.setValue(bar.maximum())
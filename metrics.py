@@ -0,0 +1,352 @@
+# metrics.py
+# Where device-job time goes: per-job timelines of exclusive stages, bytes
+# and throughput per partition, exported at the end of every run.
+#
+#   logs/metrics/runs.jsonl       one JSON summary per finished job (the Metrics tab reads the tail)
+#   logs/metrics/phoenixr1.prom   Prometheus textfile (node_exporter textfile collector), rewritten
+#                                 atomically; "metrics_textfile" in phoenix_config.json moves it
+#
+# Instrumented code calls the module-level helpers (stage, add_bytes); they
+# record into the timeline of the job running on the current thread (see
+# recording(), used by jobs.JobEngine) and do nothing otherwise.
+
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import utils
+
+# display order; anything else (e.g. "hash", "readback") is listed after these
+STAGES = ("queue", "spawn", "detect", "handshake", "backup", "write", "verify", "wipe", "reset", "backoff", "other")
+RECENT_RUNS = 200        # summaries kept in memory (and at least this many in runs.jsonl)
+
+
+# --------------------------
+# Timeline
+# --------------------------
+class Timeline:
+    """
+    Exclusive stage times of one job. Stages nest: entering one pauses the
+    enclosing stage, so the stage times add up to the job's wall time.
+    Keys are (stage, partition or None).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stack = []        # [stage, partition] entries, innermost last
+        self._since = None
+        self.seconds = {}       # (stage, partition) -> s
+        self.bytes = {}         # partition -> bytes written
+
+    def _account(self, now):
+        # caller holds self._lock
+        if self._stack and self._since is not None:
+            key = tuple(self._stack[-1])
+            self.seconds[key] = self.seconds.get(key, 0.0) + (now - self._since)
+        self._since = now
+
+    def push(self, stage, partition=None) -> list:
+        entry = [stage, partition]
+        with self._lock:
+            self._account(self._clock())
+            self._stack.append(entry)
+        return entry
+
+    def pop(self, entry) -> None:
+        with self._lock:
+            self._account(self._clock())
+            if entry in self._stack:
+                # also drops inner stages a generator left open
+                del self._stack[self._stack.index(entry):]
+
+    def rename(self, entry, stage, partition=None) -> None:
+        """Time from now on goes to (stage, partition); time so far stays where it was."""
+        with self._lock:
+            if self._stack and self._stack[-1] is entry:
+                self._account(self._clock())
+            entry[:] = [stage, partition]
+
+    def add(self, stage, seconds, partition=None) -> None:
+        """Time measured elsewhere (e.g. waiting in the queue)."""
+        with self._lock:
+            key = (stage, partition)
+            self.seconds[key] = self.seconds.get(key, 0.0) + max(seconds, 0.0)
+
+    def add_bytes(self, partition, n) -> None:
+        with self._lock:
+            self.bytes[partition] = self.bytes.get(partition, 0) + n
+
+    def summary(self) -> dict:
+        """{"stages": {stage: s}, "partitions": {part: {stage_s..., bytes, mbps}}, "bytes", "mbps"}."""
+        with self._lock:
+            if self._stack:
+                self._account(self._clock())
+            seconds = dict(self.seconds)
+            written = dict(self.bytes)
+        stages, parts = {}, {}
+        for (stage, part), s in seconds.items():
+            stages[stage] = stages.get(stage, 0.0) + s
+            if part:
+                p = parts.setdefault(part, {})
+                p[f"{stage}_s"] = round(p.get(f"{stage}_s", 0.0) + s, 3)
+        for part, n in written.items():
+            parts.setdefault(part, {})["bytes"] = n
+        for p in parts.values():
+            if p.get("bytes") and p.get("write_s"):
+                p["mbps"] = round(p["bytes"] / p["write_s"] / 2**20, 2)
+        order = {name: i for i, name in enumerate(STAGES)}
+        stages = {k: round(v, 3) for k, v in sorted(stages.items(), key=lambda kv: order.get(kv[0], len(order)))}
+        total = sum(written.values())
+        write_s = stages.get("write", 0.0)
+        return {"stages": stages, "partitions": parts, "bytes": total,
+                "mbps": round(total / write_s / 2**20, 2) if total and write_s else None}
+
+
+# --------------------------
+# Recording hooks
+# --------------------------
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def recording(timeline):
+    """Record this thread's stages into timeline (the job engine wraps each job in this)."""
+    prev = getattr(_local, "timeline", None)
+    _local.timeline = timeline
+    try:
+        yield timeline
+    finally:
+        _local.timeline = prev
+
+
+def current() -> Timeline | None:
+    return getattr(_local, "timeline", None)
+
+
+class _Stage:
+    def __init__(self, timeline, stage, partition):
+        self._tl = timeline
+        self._args = (stage, partition)
+        self._entry = None
+
+    def __enter__(self):
+        if self._tl is not None:
+            self._entry = self._tl.push(*self._args)
+        return self
+
+    def __exit__(self, *exc):
+        if self._entry is not None:
+            self._tl.pop(self._entry)
+        return False
+
+    def rename(self, stage, partition=None):
+        """Switch this stage to another name/partition (e.g. the next partition of a batch write)."""
+        if self._entry is not None:
+            self._tl.rename(self._entry, stage, partition)
+
+
+def stage(name, partition=None) -> _Stage:
+    """Context manager: time spent inside goes to (name, partition) of the current job, if any."""
+    return _Stage(current(), name, partition)
+
+
+def add_bytes(partition, n) -> None:
+    tl = current()
+    if tl is not None and n:
+        tl.add_bytes(partition, n)
+
+
+# mtkclient output that ends the "detect" / "handshake" phases of a process
+DETECT_RE = re.compile(r"device detected|handshake ok|hw ?code|cpu\s*:|connected to (?:brom|preloader)", re.I)
+READY_RE = re.compile(r"stage ?2|jumping to da|da (?:loaded|ready|connected)|"
+                      r"\b(?:wrote|formatted|erased|reset done|dumped)\b", re.I)
+
+
+class ProcessSetup:
+    """
+    The setup phases of one mtk process, as seen from its output:
+        spawn      start until the first output (interpreter / exe start)
+        detect     until the device is found (waiting for BROM/preloader)
+        handshake  until the DA is up: first progress bar or READY_RE line
+    After that the time goes back to the caller's stage (write, wipe …).
+    """
+
+    def __init__(self):
+        self._stage = stage("spawn")
+        self._stage.__enter__()
+        self._phase = "spawn"
+
+    def line(self, text):
+        if self._phase == "spawn":
+            self._set("detect")
+        if self._phase == "detect" and DETECT_RE.search(text):
+            self._set("handshake")
+        elif self._phase in ("detect", "handshake") and READY_RE.search(text):
+            self.close()
+
+    def progress(self):
+        self.close()
+
+    def _set(self, phase):
+        self._phase = phase
+        self._stage.rename(phase)
+
+    def close(self):
+        if self._phase is not None:
+            self._phase = None
+            self._stage.__exit__(None, None, None)
+
+
+# --------------------------
+# Export
+# --------------------------
+def _labels(**kw) -> str:
+    esc = {k: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in kw.items()}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc.items()) + "}"
+
+
+def _number(v) -> str:
+    return str(v) if isinstance(v, int) else repr(round(float(v), 6))
+
+
+class MetricsStore:
+    """
+    Collects finished jobs: record(job) appends the run summary to
+    runs.jsonl, rewrites the Prometheus textfile and calls listeners with
+    the summary. recent() returns the last RECENT_RUNS summaries.
+    """
+
+    def __init__(self, directory, textfile=None):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.runs_path = self.dir / "runs.jsonl"
+        self.textfile = Path(textfile) if textfile else self.dir / "phoenixr1.prom"
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._recent = deque(self._load(), maxlen=RECENT_RUNS)
+        # counters since start; Prometheus handles the reset on restart
+        self._runs_total = {}       # (job, state) -> n
+        self._bytes_total = {}      # device -> bytes
+        self._stage_total = {}      # stage -> s
+
+    def _load(self) -> list:
+        try:
+            lines = self.runs_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+        if len(lines) > 5 * RECENT_RUNS:
+            # keep the file bounded: rewrite with the newest runs only
+            lines = lines[-RECENT_RUNS:]
+            try:
+                tmp = self.runs_path.with_suffix(".tmp")
+                tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                os.replace(tmp, self.runs_path)
+            except OSError:
+                pass
+        out = []
+        for line in lines[-RECENT_RUNS:]:
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                pass
+        return out
+
+    def add_listener(self, fn) -> None:
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def recent(self, n: int | None = None) -> list:
+        with self._lock:
+            runs = list(self._recent)
+        return runs[-n:] if n else runs
+
+    def record(self, job) -> dict:
+        summary = {"ts": round(time.time(), 3), "device": job.device_id, "job": job.name,
+                   "state": job.state, "attempts": job.attempts, "elapsed_s": round(job.elapsed, 3),
+                   **job.timeline.summary()}
+        if job.error:
+            summary["error"] = str(job.error)
+        with self._lock:
+            self._recent.append(summary)
+            key = (job.name, job.state)
+            self._runs_total[key] = self._runs_total.get(key, 0) + 1
+            self._bytes_total[job.device_id] = self._bytes_total.get(job.device_id, 0) + summary["bytes"]
+            for st, s in summary["stages"].items():
+                self._stage_total[st] = self._stage_total.get(st, 0.0) + s
+            try:
+                with open(self.runs_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+            except OSError:
+                pass
+            try:
+                self._write_textfile()
+            except OSError:
+                pass
+        for fn in list(self._listeners):
+            try:
+                fn(summary)
+            except Exception:
+                pass
+        return summary
+
+    def _write_textfile(self):
+        # caller holds self._lock
+        last = {}
+        for run in self._recent:
+            last[run["device"]] = run   # newest run per device
+        out = []
+
+        def metric(name, kind, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(f"{name}{_labels(**labels)} {_number(value)}" for labels, value in samples)
+
+        metric("phoenixr1_run_duration_seconds", "gauge", "Wall time of the device's last job.",
+               [({"device": d, "job": r["job"], "state": r["state"]}, r["elapsed_s"]) for d, r in last.items()])
+        metric("phoenixr1_run_timestamp_seconds", "gauge", "When the device's last job finished.",
+               [({"device": d}, r["ts"]) for d, r in last.items()])
+        metric("phoenixr1_stage_seconds", "gauge", "Time per stage in the device's last job.",
+               [({"device": d, "stage": st}, s) for d, r in last.items() for st, s in r["stages"].items()])
+        metric("phoenixr1_partition_write_seconds", "gauge", "Write time per partition in the device's last job.",
+               [({"device": d, "partition": p}, v["write_s"]) for d, r in last.items()
+                for p, v in r["partitions"].items() if "write_s" in v])
+        metric("phoenixr1_partition_written_bytes", "gauge", "Bytes written per partition in the device's last job.",
+               [({"device": d, "partition": p}, v["bytes"]) for d, r in last.items()
+                for p, v in r["partitions"].items() if "bytes" in v])
+        metric("phoenixr1_partition_throughput_bytes_per_second", "gauge",
+               "Write throughput per partition in the device's last job.",
+               [({"device": d, "partition": p}, v["mbps"] * 2**20) for d, r in last.items()
+                for p, v in r["partitions"].items() if v.get("mbps")])
+        metric("phoenixr1_runs_total", "counter", "Finished jobs since the app started.",
+               [({"job": j, "state": s}, n) for (j, s), n in sorted(self._runs_total.items())])
+        metric("phoenixr1_written_bytes_total", "counter", "Bytes written per device since the app started.",
+               [({"device": d}, n) for d, n in sorted(self._bytes_total.items())])
+        metric("phoenixr1_stage_seconds_total", "counter", "Time per stage, all jobs, since the app started.",
+               [({"stage": st}, s) for st, s in self._stage_total.items()])
+
+        self.textfile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.textfile.with_name(self.textfile.name + f".{os.getpid()}.tmp")
+        tmp.write_text("\n".join(out) + "\n", encoding="utf-8")
+        os.replace(tmp, self.textfile)   # the collector must never see a half-written file
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MetricsStore:
+    """Process-wide MetricsStore under utils.metrics_dir()."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore(utils.metrics_dir(), utils.load_config().get("metrics_textfile"))
+        return _store
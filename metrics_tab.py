@@ -0,0 +1,105 @@
+# metrics_tab.py
+# "Metrics" tab: stage breakdown of the last runs (see metrics.py), to spot
+# slow hubs, cables or devices.
+
+import time
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView
+)
+from PySide6.QtGui import QColor
+from PySide6.QtCore import Signal, QObject
+
+import metrics
+
+SHOW_RUNS = 50
+SLOW_RATIO = 0.7   # write MB/s below this share of the median is flagged
+FIXED = ["Finished", "Device", "Job", "State", "Total"]
+
+
+class MetricsBus(QObject):
+    recorded = Signal(object)  # run summary dict, from job threads
+
+
+class MetricsTab(QWidget):
+    """Last SHOW_RUNS runs, one row each: seconds per stage, write MB/s, per-partition detail as tooltip."""
+
+    def __init__(self, store: metrics.MetricsStore, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.bus = MetricsBus()
+        self.bus.recorded.connect(lambda _: self.refresh())
+        store.add_listener(self.bus.recorded.emit)
+
+        self.summary = QLabel("")
+        self.summary.setWordWrap(True)
+        self.btn_refresh = QPushButton("Refresh")
+        self.btn_refresh.clicked.connect(self.refresh)
+        top = QHBoxLayout()
+        top.addWidget(self.summary, 1)
+        top.addWidget(self.btn_refresh)
+
+        self.table = QTableWidget(0, 0)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+
+        lay = QVBoxLayout()
+        lay.addLayout(top)
+        lay.addWidget(self.table)
+        self.setLayout(lay)
+        self.refresh()
+
+    def close_store(self):
+        self.store.remove_listener(self.bus.recorded.emit)
+
+    def refresh(self):
+        runs = list(reversed(self.store.recent(SHOW_RUNS)))
+        seen = {st for r in runs for st in r["stages"]}
+        stages = [s for s in metrics.STAGES if s in seen] + sorted(seen - set(metrics.STAGES))
+        cols = FIXED + [f"{s} (s)" for s in stages] + ["Write MB/s"]
+        self.table.setColumnCount(len(cols))
+        self.table.setHorizontalHeaderLabels(cols)
+        self.table.setRowCount(len(runs))
+
+        rates = sorted(r["mbps"] for r in runs if r.get("mbps"))
+        median = rates[len(rates) // 2] if rates else None
+        for row, r in enumerate(runs):
+            total = sum(r["stages"].values())
+            cells = [time.strftime("%m-%d %H:%M:%S", time.localtime(r["ts"])), r["device"], r["job"],
+                     r["state"], f"{total:.1f}"]
+            cells += [f"{r['stages'][s]:.1f}" if s in r["stages"] else "" for s in stages]
+            cells.append(f"{r['mbps']:.1f}" if r.get("mbps") else "")
+            tip = "\n".join(
+                f"{p}: " + ", ".join(f"{k[:-2]} {v:.1f} s" for k, v in d.items() if k.endswith("_s"))
+                + (f", {d['bytes'] / 2**20:.0f} MiB" if d.get("bytes") else "")
+                + (f", {d['mbps']:.1f} MB/s" if d.get("mbps") else "")
+                for p, d in r["partitions"].items()
+            )
+            slow = bool(median and r.get("mbps") and r["mbps"] < SLOW_RATIO * median)
+            for col, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if tip:
+                    item.setToolTip(tip)
+                if slow and col == len(cells) - 1:
+                    item.setForeground(QColor("#ff8a65"))
+                self.table.setItem(row, col, item)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.summary.setText(self._device_summary(runs, median))
+
+    @staticmethod
+    def _device_summary(runs, median) -> str:
+        by_dev = {}
+        for r in runs:
+            if r.get("mbps"):
+                by_dev.setdefault(r["device"], []).append(r["mbps"])
+        if not by_dev:
+            return "No write runs yet."
+        parts = []
+        for dev, rates in sorted(by_dev.items()):
+            rates.sort()
+            mid = rates[len(rates) // 2]
+            flag = " ⚠ slow" if median and mid < SLOW_RATIO * median else ""
+            parts.append(f"{dev}: {mid:.1f} MB/s ({len(rates)} runs){flag}")
+        return "Median write speed — " + " · ".join(parts)
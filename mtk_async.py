@@ -0,0 +1,282 @@
+# mtk_async.py
+# asyncio subprocess engine for mtk commands: non-blocking reads, output as
+# an async iterator of events, cancellation that takes down the process tree.
+#
+# All commands share one event loop running in a daemon thread (LoopThread),
+# so Qt and worker threads can use it without an asyncio loop of their own.
+# iter_sync() is the blocking adapter behind mtk_wrapper's generator API.
+
+import asyncio
+import contextlib
+import os
+import queue
+import signal
+import subprocess
+import threading
+from dataclasses import dataclass
+
+import progress
+
+
+class JobCancelled(Exception):
+    """The job running this command was cancelled; its mtk process was killed."""
+
+
+class StepTimeout(Exception):
+    """An mtk process ran longer than its step timeout, or went silent too long."""
+
+
+@dataclass(frozen=True)
+class Line:
+    """One line of mtk output (a finished progress bar is reported once, as its last redraw)."""
+    text: str
+
+
+@dataclass(frozen=True)
+class Exit:
+    """The process exited on its own; always the last event of a stream."""
+    returncode: int
+
+
+# --------------------------
+# Process control
+# --------------------------
+def kill_tree(proc):
+    """Terminate a process (subprocess.Popen or asyncio Process) and everything it spawned."""
+    rc = proc.poll() if hasattr(proc, "poll") else proc.returncode
+    if rc is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except Exception:
+        try:
+            proc.kill()
+        except Exception:
+            pass
+
+
+async def _kill(proc):
+    if os.name == "nt":
+        # taskkill is a blocking call
+        await asyncio.get_running_loop().run_in_executor(None, kill_tree, proc)
+    else:
+        kill_tree(proc)
+    # drain stdout to EOF: a reader paused by a full buffer (slow consumer) never sees
+    # the pipe close, and wait() also waits for that
+    if proc.stdout is not None:
+        with contextlib.suppress(Exception):
+            while await proc.stdout.read(65536):
+                pass
+    await proc.wait()
+
+
+async def stream(cmd, cwd=None, env=None, partition=None, step_timeout=None, idle_timeout=None,
+                 chunk_size=65536):
+    """
+    Run cmd and yield its merged stdout/stderr as events, as they happen:
+    Line, progress.ProgressEvent (every bar redraw, tagged with partition)
+    and finally Exit.
+    step_timeout / idle_timeout (seconds, None = no limit) kill the process
+    and raise StepTimeout. Cancelling the consuming task, or closing the
+    iterator early, kills the process tree before returning.
+    """
+    if os.name == "nt":
+        kw = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        kw = {"start_new_session": True}  # own process group, so kill_tree() also reaches mtk's children
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, **kw
+    )
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + step_timeout if step_timeout else None
+    splitter = progress.RecordSplitter()
+    parser = progress.ProgressParser(partition)
+    pending_bar = None
+    try:
+        while True:
+            wait, why = idle_timeout, f"no output for {idle_timeout or 0:g} s"
+            if deadline is not None:
+                left = max(deadline - loop.time(), 0.0)
+                if wait is None or left < wait:
+                    wait, why = left, f"step timeout after {step_timeout:g} s"
+            try:
+                chunk = await asyncio.wait_for(proc.stdout.read(chunk_size), wait)
+            except asyncio.TimeoutError:
+                raise StepTimeout(why) from None
+            for text, term in (splitter.feed(chunk) if chunk else splitter.flush()):
+                if not text and term == "\r":
+                    continue  # bar redraw starts with a bare "\r"
+                ev = parser.feed(text)
+                if ev is not None:
+                    yield ev
+                    pending_bar = text
+                    continue
+                if pending_bar is not None:
+                    yield Line(pending_bar)
+                    pending_bar = None
+                yield Line(text)
+            if not chunk:
+                break
+        if pending_bar is not None:
+            yield Line(pending_bar)
+        yield Exit(await proc.wait())
+    finally:
+        if proc.returncode is None:
+            await _kill(proc)
+
+
+# --------------------------
+# Loop thread
+# --------------------------
+class LoopThread:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name="mtk-asyncio"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._main, name=name, daemon=True)
+        self._thread.start()
+
+    def _main(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule coro on the loop; returns a concurrent.futures.Future (thread-safe cancel())."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_loop_thread() -> LoopThread:
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = LoopThread()
+        return _loop_thread
+
+
+def submit(coro):
+    """Run coro on the shared loop thread (e.g. from the Qt thread); returns a concurrent Future."""
+    return get_loop_thread().submit(coro)
+
+
+# --------------------------
+# Sync adapter
+# --------------------------
+_DONE = object()
+# events waiting for a slow consumer; past this the reader stops reading
+# (the pipe fills and mtk blocks) instead of buffering without bound
+MAX_QUEUED = 10_000
+
+
+class _Handle:
+    """Thread-safe cancel() for a task on the loop thread."""
+
+    def __init__(self, loop, task):
+        self._loop = loop
+        self._task = task
+
+    def cancel(self):
+        self._loop.call_soon_threadsafe(self._task.cancel)
+
+
+def iter_sync(cmd, cwd=None, env=None, partition=None, step_timeout=None, idle_timeout=None,
+              control=None):
+    """
+    Blocking iterator over stream(cmd, ...) for plain threads. The process
+    runs on the shared loop; events are handed over through a queue.
+    control (see jobs.Job) gets attach(handle) / detach(handle), where
+    handle.cancel() stops the command from any thread; a cancelled command
+    raises JobCancelled here once the process is gone.
+    """
+    q = queue.Queue(MAX_QUEUED)
+    lt = get_loop_thread()
+    # the loop is shared by every command, so a full queue must not block it:
+    # put() waits on `space`, which the consumer sets after taking an item
+    flags = {"blocked": False, "closed": False}
+    space = None
+
+    async def put(ev):
+        while not flags["closed"]:
+            try:
+                q.put_nowait(ev)
+                return
+            except queue.Full:
+                pass
+            flags["blocked"] = True
+            space.clear()
+            if q.full():   # re-checked after raising the flag: a get() in between sets space
+                await space.wait()
+            flags["blocked"] = False
+
+    async def pump():
+        err = None
+        try:
+            async with contextlib.aclosing(stream(cmd, cwd=cwd, env=env, partition=partition,
+                                                  step_timeout=step_timeout,
+                                                  idle_timeout=idle_timeout)) as events:
+                async for ev in events:
+                    try:
+                        q.put_nowait(ev)
+                    except queue.Full:
+                        await put(ev)
+        except BaseException as e:  # incl. CancelledError: report it, the process is already dead
+            err = e
+        finally:
+            await put((_DONE, err))
+
+    def cancelled_early(t):
+        # cancelled before it ever ran: pump() can't report that itself
+        if t.cancelled():
+            with contextlib.suppress(queue.Full):
+                q.put_nowait((_DONE, asyncio.CancelledError()))
+
+    async def start():
+        nonlocal space
+        space = asyncio.Event()
+        task = asyncio.ensure_future(pump())
+        task.add_done_callback(cancelled_early)
+        return task
+
+    async def stop(task):
+        space.set()
+        task.cancel()
+        await asyncio.wait([task])
+
+    task = lt.submit(start()).result()
+    handle = _Handle(lt.loop, task)
+    if control is not None:
+        control.attach(handle)
+    finished = False
+    try:
+        while True:
+            item = q.get()
+            if flags["blocked"]:
+                flags["blocked"] = False
+                lt.loop.call_soon_threadsafe(space.set)
+            if type(item) is tuple and item[0] is _DONE:
+                finished = True
+                err = item[1]
+                if isinstance(err, asyncio.CancelledError):
+                    raise JobCancelled()
+                if err is not None:
+                    raise err
+                return
+            yield item
+    finally:
+        if control is not None:
+            control.detach(handle)
+        if not finished:
+            # consumer stopped early: kill the process and wait until it is gone
+            flags["closed"] = True
+            lt.submit(stop(task)).result(30)
@@ -1,51 +1,102 @@
 
+import contextlib
+import dataclasses
+import hashlib
 import subprocess
 import shutil
 import sys
 import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import backup
+import device_monitor
+import fw_archive
+import journal
+import metrics
+import mtk_async
+import prefetch
+import sparse
+import utils
+import verify
+
+from mtk_async import JobCancelled, StepTimeout  # noqa: F401  (raised through the sync API)
 
 def which(cmd):
     return shutil.which(cmd)
 
-def _run(cmd, cwd=None, env=None):
-    # Yield lines from process stdout/stderr merged
-    proc = subprocess.Popen(
-        cmd,
-        cwd=cwd,
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True
-    )
+_target = threading.local()
+
+@contextlib.contextmanager
+def job_control(control):
+    """
+    Run this thread's mtk commands under a job (see jobs.Job), which
+    provides .cancelled (Event), .step_timeout, .idle_timeout and
+    .attach(proc) / .detach(proc) so it can kill the process tree.
+    """
+    prev = getattr(_target, "control", None)
+    _target.control = control
+    try:
+        yield control
+    finally:
+        _target.control = prev
+
+def _run(cmd, cwd=None, env=None, result=None, on_progress=None, partition=None):
+    # Sync adapter over mtk_async.stream (the process runs on the shared
+    # asyncio loop thread). Yields output lines; progress-bar redraws go to
+    # on_progress as ProgressEvents and only the last redraw of each bar is
+    # yielded. If a dict is passed as result, result["returncode"] is set on
+    # exit (None if the process had to be killed).
+    # Under job_control the process can be cancelled or timed out, which
+    # raises JobCancelled / StepTimeout once it is gone.
+    # Process start, device detection and DA handshake are timed as
+    # metrics stages; the rest goes to the caller's stage.
+    ctl = getattr(_target, "control", None)
+    if ctl is not None and ctl.cancelled.is_set():
+        raise JobCancelled()
+    rc = None
+    setup = metrics.ProcessSetup()
     try:
-        for line in proc.stdout:
-            yield line.rstrip("\n")
+        for ev in mtk_async.iter_sync(cmd, cwd=cwd, env=env, partition=partition,
+                                      step_timeout=getattr(ctl, "step_timeout", None),
+                                      idle_timeout=getattr(ctl, "idle_timeout", None),
+                                      control=ctl):
+            if isinstance(ev, mtk_async.Line):
+                setup.line(ev.text)
+                yield ev.text
+            elif isinstance(ev, mtk_async.Exit):
+                rc = ev.returncode
+            else:
+                setup.progress()
+                if on_progress:
+                    on_progress(ev)
     finally:
-        proc.wait()
+        setup.close()
+        if result is not None:
+            result["returncode"] = rc
+    if ctl is not None and ctl.cancelled.is_set():
+        raise JobCancelled()
 
 def detect_device():
     """
-    Heuristic check for an MTK/Android device on Windows.
-    - Try listing USB PnP devices and look for MediaTek/MTK/Android.
-    - Fall back to mtk --help presence as a coarse readiness check.
+    Is an MTK device connected?
+    Answered from the background DeviceMonitor cache, never by scanning on
+    the caller's thread: before the monitor's first scan this starts it
+    and reports "scanning"; its listeners get the result.
+    - Linux: sysfs scan for MediaTek VID 0e8d in BROM/Preloader/DA mode.
+    - Windows: PnP scan for MediaTek/Android hints.
     Returns (connected: bool, detail: str)
     """
-    # Check WMIC for device hint (Windows only)
-    try:
-        out = subprocess.check_output(
-            ["wmic", "path", "Win32_PnPEntity", "get", "Name"],
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=5
-        )
-        name = out.lower()
-        hits = ["mediatek", "mtk", "android", "preloader", "bootrom", "fastboot"]
-        if any(h in name for h in hits):
-            return True, "Possible device detected via PnP scan"
-    except Exception:
-        pass
+    mon = device_monitor.get_monitor()
+    mon.start()
+    state = mon.state
+    if not state.scanned:
+        return False, "Scanning for devices …"
+    if state.connected:
+        return True, state.detail
 
     # As a soft fallback, if mtk tool exists, we at least can try connecting later
     if which("mtk") or which("mtk.exe") or which("python"):
@@ -80,33 +131,690 @@ def open_zadig():
     except Exception as e:
         return False, str(e)
 
-def run_mtk_command(args):
+@contextlib.contextmanager
+def target_device(device):
     """
-    Run an mtk (mtkclient) CLI command.
-    Args is a list, e.g. ["mtk", "w", "boot", "firmware/boot.img"]
-    Yields (line:str) for GUI to consume.
+    Direct every mtk command run by this thread at one device
+    (a device_monitor.UsbDevice). Used by station mode, where several
+    devices are connected at once.
     """
+    prev = getattr(_target, "device", None)
+    _target.device = device
+    try:
+        yield device
+    finally:
+        _target.device = prev
+
+def _device_selection(device=None):
+    """(extra CLI args, env) selecting device, or the thread's target device, if any."""
+    device = device or getattr(_target, "device", None)
+    if device is None:
+        return [], None
+    fields = {"port": device.port, "serial": device.serial, "vid": device.vid, "pid": device.pid}
+    # only what the mtk in use understands (e.g. a wrapper script); stock
+    # mtkclient can't pick a USB device by port. See utils.get_device_selector.
+    template = utils.get_device_selector() or []
+    args = [str(a).format(**fields) for a in template]
+    env = dict(os.environ, PHOENIX_DEVICE_PORT=device.port, PHOENIX_DEVICE_SERIAL=device.serial)
+    return args, env
+
+def mtk_command(args, device=None):
+    """(argv, env) for an mtk CLI call, pinned to device (or the thread's target device)."""
     # Prefer 'mtk' command; fallback to 'python -m mtkclient'
     if which("mtk") or which("mtk.exe"):
         cmd = ["mtk"] + args
     else:
         cmd = [sys.executable, "-m", "mtkclient"] + args
-    for line in _run(cmd):
+    sel_args, env = _device_selection(device)
+    return cmd + sel_args, env
+
+def run_mtk_command(args, result=None, on_progress=None, partition=None):
+    """
+    Run an mtk (mtkclient) CLI command.
+    Args is a list, e.g. ["mtk", "w", "boot", "firmware/boot.img"]
+    Yields (line:str) for GUI to consume.
+    Pass a dict as result to receive the exit code as result["returncode"].
+    on_progress(ProgressEvent) receives parsed progress-bar updates,
+    tagged with partition.
+    """
+    cmd, env = mtk_command(args)
+    for line in _run(cmd, env=env, result=result, on_progress=on_progress, partition=partition):
         yield line
 
-def flash_partition(partition, image_path):
+def run_mtk_command_async(args, partition=None, device=None, step_timeout=None, idle_timeout=None):
+    """
+    asyncio form of run_mtk_command: an async iterator of mtk_async.Line,
+    progress.ProgressEvent and a final mtk_async.Exit. Cancelling the
+    consuming task kills the mtk process tree. Run it on any loop, or from
+    other threads via mtk_async.submit().
+    """
+    cmd, env = mtk_command(args, device)
+    return mtk_async.stream(cmd, env=env, partition=partition,
+                            step_timeout=step_timeout, idle_timeout=idle_timeout)
+
+def run_mtk_events(args, partition=None):
+    """
+    Like run_mtk_command, but yields raw lines (str) and ProgressEvents
+    interleaved, in the order they were produced.
+    """
+    events = []
+    for line in run_mtk_command(args, on_progress=events.append, partition=partition):
+        yield from events
+        events.clear()
+        yield line
+    yield from events
+
+def flash_partition(partition, image_path, result=None, on_progress=None):
     # Example: mtk w boot boot.img
-    yield from run_mtk_command(["w", partition, image_path])
+    # Android sparse images are expanded on the fly (see sparse.raw_image)
+    _forget_block_maps([partition])
+    rc = {}
+    with metrics.stage("write", partition), sparse.raw_image(image_path) as src:
+        yield from run_mtk_command(["w", partition, src], result=rc,
+                                   on_progress=on_progress, partition=partition)
+        if rc.get("returncode") == 0:
+            metrics.add_bytes(partition, sparse.raw_size(image_path))
+    if result is not None:
+        result.update(rc)
+
+_WRITE_FAIL_HINTS = ("failed", "error", "couldn't", "could not", "not found")
+_WROTE_RE = re.compile(r"^Wrote (.+?)(?: to sector\b.*)?$", re.IGNORECASE)
+
+def _wrote_entry(line, pending, names):
+    """
+    The pending plan entry a batch "Wrote <file> to sector ..." line
+    confirms: <file> must be the exact path handed to mtk (names, by
+    partition), its file name, or the image's file name. None otherwise.
+    """
+    m = _WROTE_RE.match(line.strip())
+    if not m:
+        return None
+    token = m.group(1).strip().strip("'\"").lower()
+    for entry in pending:
+        name = names[entry[0]]
+        if token in (name.lower(), os.path.basename(name).lower(), fw_archive.basename(entry[1]).lower()):
+            return entry
+    return None
+
+def flash_partitions(plan, batch=True, result=None, on_progress=None, verify_after=False, on_done=None):
+    """
+    Flash several partitions in one mtkclient session:
+        mtk w vbmeta,boot,super vbmeta.img,boot.img,super.img
+    so the preloader handshake, DA upload and GPT read happen once.
+
+    plan is a list of (partition, image_path). Output lines are prefixed
+    with the partition being written. Partitions the batch did not confirm
+    ("Wrote <file>") are retried one mtk call each. result (dict) receives
+    "written" and "failed" partition lists. on_progress receives
+    ProgressEvents tagged with the partition being written.
+
+    verify_after: read every written partition back and compare it with the
+    image (see readback_sha256); result["verify"] gets
+    {partition: (ok, seconds)}. Source images are hashed on a thread pool
+    from the start, so that work overlaps the USB writes.
+
+    While one partition is written the next images are prefetched (see
+    prefetch.Prefetcher); result["prefetch"] gets the hit/miss stats.
+
+    on_done(partition, verified) is called as soon as a partition is
+    confirmed written (and, with verify_after, has passed its read-back
+    check, or is a sparse image flashed as-is, which can't be read back).
+    """
+    plan = list(plan)
+    pf = prefetch.Prefetcher([img for _, img in plan])
+    try:
+        yield from _flash_plan(plan, pf, batch, result, on_progress, verify_after, on_done)
+    finally:
+        stats = pf.close()
+    yield from pf.lines()
+    if stats.mode != "off":
+        yield stats.summary()
+    if result is not None:
+        result["prefetch"] = stats.as_dict()
+
+def _flash_plan(plan, pf, batch, result, on_progress, verify_after, on_done):
+    done, failed = [], []
+    pending = list(plan)
+    checks = {}
+    pool = src_hashes = None
+    if verify_after:
+        pool = ThreadPoolExecutor(max_workers=min(len(plan), os.cpu_count() or 1) or 1)
+        src_hashes = {part: pool.submit(_source_sha256, img) for part, img in plan if _verifiable(img)}
+
+    # mtkclient splits both lists on ',', so paths with commas can't be batched
+    if batch and len(plan) > 1 and not any("," in p or "," in img for p, img in plan):
+        parts = ",".join(p for p, _ in plan)
+        yield f"Batch flashing {parts} in one session …"
+        _forget_block_maps(p for p, _ in plan)
+        rc = {}
+
+        def tag(ev):
+            if on_progress:
+                on_progress(dataclasses.replace(ev, partition=pending[0][0] if pending else None))
+
+        # the tool gets every path up front: cached copies where they exist already
+        srcs = [pf.begin(plan[0][1])] + [pf.local(img) for _, img in plan[1:]]
+        if any("," in src for src in srcs):
+            srcs = [img for _, img in plan]
+        with contextlib.ExitStack() as stack:
+            # every path is opened at once: never as several FIFOs the tool would have to read in order
+            mode = "tempfile" if sparse.flash_mode() == "fifo" else None
+            names = {part: stack.enter_context(sparse.raw_image(src, mode)) for (part, _), src in zip(plan, srcs)}
+            imgs = ",".join(names.values())
+            # write time goes to the partition being written (see metrics.Timeline)
+            write = stack.enter_context(metrics.stage("write", plan[0][0]))
+            for line in run_mtk_command(["w", parts, imgs], result=rc, on_progress=tag):
+                yield from pf.lines()
+                # mtkclient writes in plan order; lines belong to the first unconfirmed entry
+                cur = pending[0][0] if pending else "-"
+                hit = _wrote_entry(line, pending, names) if pending else None
+                if hit is None and line.lower().startswith("wrote "):
+                    # can't tell which image it means: confirm nothing, the fallback rewrites what's left
+                    yield line
+                    continue
+                if hit is not None:
+                    pending.remove(hit)
+                    done.append(hit[0])
+                    metrics.add_bytes(hit[0], sparse.raw_size(hit[1]))
+                    if pending:
+                        write.rename("write", pending[0][0])
+                        pf.begin(pending[0][1])
+                    if on_done and not verify_after:
+                        on_done(hit[0], False)
+                    yield f"[{hit[0]}] {line}"
+                    yield f"[{hit[0]}] done"
+                    continue
+                yield f"[{cur}] {line}"
+        if pending:
+            yield (f"Batch session ended (exit {rc.get('returncode')}) with "
+                   f"{', '.join(p for p, _ in pending)} unconfirmed; falling back to per-partition writes.")
+        if verify_after:
+            for part, img in plan:
+                if part in done:
+                    yield from _verify_step(part, img, src_hashes.get(part), checks)
+                    _verified(part, checks, on_done)
+
+    for part, img in pending:
+        yield f"Flashing {part} …"
+        src = pf.begin(img)
+        yield from pf.lines()
+        rc = {}
+        bad = False
+        for line in flash_partition(part, src, result=rc, on_progress=on_progress):
+            if any(h in line.lower() for h in _WRITE_FAIL_HINTS):
+                bad = True
+            yield f"[{part}] {line}"
+        if rc.get("returncode") or bad:
+            failed.append(part)
+            yield f"[{part}] write FAILED"
+        else:
+            done.append(part)
+            yield f"[{part}] done"
+            if verify_after:
+                yield from _verify_step(part, img, src_hashes.get(part), checks)
+                _verified(part, checks, on_done)
+            elif on_done:
+                on_done(part, False)
+
+    if pool:
+        pool.shutdown(wait=False)
+    if result is not None:
+        result["written"] = done
+        result["failed"] = failed
+        if verify_after:
+            result["verify"] = checks
+
+def _verified(part, checks, on_done):
+    # passthrough sparse images have no read-back check (see _verify_step); they count as written, unverified
+    if on_done and checks.get(part, (True, 0))[0]:
+        on_done(part, part in checks)
+
+def _verifiable(img) -> bool:
+    """False for a sparse image handed to the tool as-is: its DONT_CARE regions keep old data."""
+    return not (sparse.is_sparse(img) and sparse.flash_mode() == "passthrough")
+
+def _source_sha256(img) -> str:
+    """SHA-256 of what flashing img writes: the unsparsed image for sparse ones (see sparse.raw_image)."""
+    return sparse.raw_sha256(img) if sparse.is_sparse(img) else verify.cached_sha256(img)
+
+def verify_partition(partition, image_path, result=None):
+    """Read-back check of one partition against its image; result["verify"] = {partition: (ok, seconds)}."""
+    checks = {}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fut = pool.submit(_source_sha256, image_path) if _verifiable(image_path) else None
+        yield from _verify_step(partition, image_path, fut, checks)
+    if result is not None:
+        result["verify"] = checks
+
+def _verify_step(part, img, src_future, checks):
+    if src_future is None:
+        # passthrough: DONT_CARE regions keep whatever the partition held before, so no hash can match
+        yield f"[{part}] verify skipped: sparse image flashed as-is (sparse_mode \"tempfile\" makes it verifiable)"
+        return
+    t0 = time.monotonic()
+    yield f"[{part}] verifying (read-back) …"
+    rb = {}
+    with metrics.stage("verify", part):
+        yield from (f"[{part}] {line}" for line in readback_sha256(part, sparse.raw_size(img), result=rb))
+    try:
+        expected = src_future.result()
+    except Exception as e:
+        expected = None
+        yield f"[{part}] could not hash source image: {e}"
+    ok = bool(expected) and rb.get("sha256") == expected
+    secs = time.monotonic() - t0
+    checks[part] = (ok, secs)
+    if ok:
+        yield f"[{part}] verify PASS ({secs:.1f} s)"
+    else:
+        got = rb.get("sha256") or "no data"
+        yield f"[{part}] verify FAILED ({secs:.1f} s): read-back {got[:12]} != image {(expected or '?')[:12]}"
+
+def _hash_stream(f, length, h):
+    left = length
+    while True:
+        buf = f.read(1024 * 1024)
+        if not buf:
+            break
+        if left > 0:
+            h.update(buf[:left])
+            left -= len(buf)
+        # keep draining past the prefix so the writer never blocks
+    return length - max(left, 0)
+
+def readback_stream(partition, length, consume, result=None, offset=0):
+    """
+    Read `length` bytes of a partition starting at `offset` with mtkclient
+    (`mtk ro <part> <offset> <length> <file>`) and pass them to
+    consume(binary_file) -> bytes_consumed.
+    On POSIX the target is a FIFO, so data is consumed as it arrives and
+    never hits the disk; elsewhere a temp file is used and removed.
+    result["bytes"] / result["returncode"] are set. Yields mtk output lines.
+    """
+    got = {"bytes": 0}
+    with tempfile.TemporaryDirectory(prefix="phoenix_rb_") as td:
+        target = os.path.join(td, f"{partition}.bin")
+        args = ["ro", partition, str(offset), str(length), target]
+        rc = {}
+        if hasattr(os, "mkfifo"):
+            os.mkfifo(target)
+
+            def reader():
+                with open(target, "rb") as f:
+                    got["bytes"] = consume(f)
+
+            t = threading.Thread(target=reader, daemon=True)
+            t.start()
+            try:
+                yield from run_mtk_command(args, result=rc, partition=partition)
+            finally:
+                # if mtk never opened the FIFO, open it ourselves so the reader sees EOF
+                try:
+                    fd = os.open(target, os.O_WRONLY | os.O_NONBLOCK)
+                    os.close(fd)
+                except OSError:
+                    pass
+                t.join(30)
+        else:
+            yield from run_mtk_command(args, result=rc, partition=partition)
+            if os.path.isfile(target):
+                with open(target, "rb") as f:
+                    got["bytes"] = consume(f)
+    if result is not None:
+        result["bytes"] = got["bytes"]
+        result["returncode"] = rc.get("returncode")
+
+def readback_sha256(partition, length, result=None):
+    """
+    SHA-256 of the first `length` bytes of a partition, read back through
+    readback_stream. result["sha256"] / result["bytes"] are set.
+    """
+    h = hashlib.sha256()
+    rb = {}
+    yield from readback_stream(partition, length, lambda f: _hash_stream(f, length, h), result=rb)
+    if result is not None:
+        result.update(rb)
+        result["sha256"] = h.hexdigest() if rb.get("bytes") == length else None
+
+def write_at_offset(partition, offset, path, result=None, on_progress=None):
+    """
+    Write a file at an absolute flash offset (`mtk wo <offset> <length> <file>`).
+    Used for partial (delta) writes; the caller converts partition-relative
+    offsets using the GPT.
+    """
+    rc = {}
+    with metrics.stage("write", partition):
+        yield from run_mtk_command(["wo", hex(offset), hex(os.path.getsize(path)), path], result=rc,
+                                   on_progress=on_progress, partition=partition)
+    if rc.get("returncode") == 0:
+        metrics.add_bytes(partition, os.path.getsize(path))
+    if result is not None:
+        result.update(rc)
+
+_GPT_RE = re.compile(r"^\s*([\w.-]+):?\s+Offset\s+(0x[0-9a-fA-F]+),\s*Length\s+(0x[0-9a-fA-F]+)")
+
+def parse_gpt_lines(lines) -> dict:
+    """{partition: (offset_bytes, length_bytes)} from `mtk printgpt` output."""
+    table = {}
+    for line in lines:
+        m = _GPT_RE.match(line)
+        if m:
+            table[m.group(1)] = (int(m.group(2), 16), int(m.group(3), 16))
+    return table
+
+def read_partition_table(result=None):
+    """Run `mtk printgpt`; result["table"] gets parse_gpt_lines() of its output."""
+    lines = []
+    rc = {}
+    with metrics.stage("gpt"):
+        for line in run_mtk_command(["printgpt"], result=rc):
+            lines.append(line)
+            yield line
+    if result is not None:
+        result["table"] = parse_gpt_lines(lines)
+        result["returncode"] = rc.get("returncode")
+
+def current_device_id() -> str | None:
+    """Stable id of the (first) connected device: USB serial, else port path."""
+    devices = device_monitor.get_monitor().state.devices
+    if not devices:
+        return None
+    d = devices[0]
+    return d.serial or d.port
+
+def job_device_id(device=None) -> str | None:
+    """Id of device, else of this thread's target device, else of the connected one (backups, journals)."""
+    device = device or getattr(_target, "device", None)
+    if device is not None:
+        return device.serial or device.port
+    return current_device_id()
+
+def job_device_serial(device=None) -> str | None:
+    """
+    USB serial of the device job_device_id() picks, or None if it has none.
+    A port path only says where a device is plugged in, not which unit it
+    is: state remembered about "the device" (delta block maps, resume
+    journals) is only trusted under a serial.
+    """
+    device = device or getattr(_target, "device", None)
+    if device is None:
+        devices = device_monitor.get_monitor().state.devices
+        device = devices[0] if devices else None
+    return (device.serial or None) if device is not None else None
+
+def _forget_block_maps(partitions):
+    # a write that isn't a delta makes the cached block map (see delta.py) of the partition stale
+    import delta
+    serial = job_device_serial()
+    for part in partitions:
+        delta.forget_device_map(serial, part)
+
+# --------------------
+# Partition layout cache + preflight
+# --------------------
+_layouts = {}   # device id -> parse_gpt_lines() table, read once per device session
+_layouts_lock = threading.Lock()
+
+def partition_layout(refresh=False, result=None):
+    """
+    Partition table of this thread's device (see job_device_id): from the
+    cache, else read with `mtk printgpt` and cached. result["table"] gets
+    it ({} if it couldn't be read), result["cached"] whether no mtk ran.
+    """
+    device_id = job_device_id()
+    with _layouts_lock:
+        table = None if refresh else _layouts.get(device_id)
+    cached = table is not None
+    if not cached:
+        gpt = {}
+        yield from read_partition_table(result=gpt)
+        table = gpt.get("table") or {}
+        if table:
+            with _layouts_lock:
+                _layouts[device_id] = table
+                _watch_sessions()
+    if result is not None:
+        result["table"] = table
+        result["cached"] = cached
+
+def forget_layout(*device_ids):
+    """Drop the cached layouts of device_ids (of every device if none are given)."""
+    with _layouts_lock:
+        if not device_ids:
+            _layouts.clear()
+        for device_id in device_ids:
+            _layouts.pop(device_id, None)
+
+def _end_sessions(old, new):
+    # DeviceMonitor listener: a device that left the bus gets its table read again when it's back
+    gone = {d.serial or d.port for d in old.devices} - {d.serial or d.port for d in new.devices}
+    if gone:
+        forget_layout(*gone, None)
+
+_watching = False
+
+def _watch_sessions():
+    """Listen for devices leaving, once the first table is cached (caller holds _layouts_lock)."""
+    global _watching
+    if not _watching:
+        _watching = True
+        device_monitor.get_monitor().add_listener(_end_sessions)
+
+def check_plan(plan, table) -> tuple:
+    """
+    Check a flash plan against a partition table, without touching the
+    device: (plan, problems, notes). super / system go to whichever of the
+    two the table has (the file name only decides when it has both or
+    neither); every image must exist on the device and fit its partition.
+    """
+    out, problems, notes = [], [], []
+    for part, img in plan:
+        if part in ("super", "system") and part not in table:
+            other = "system" if part == "super" else "super"
+            if other in table:
+                notes.append(f"[{other}] the device has {other}, not {part}: "
+                             f"flashing {fw_archive.describe(img)} there")
+                part = other
+        out.append((part, img))
+        if part not in table:
+            problems.append(f"[{part}] no such partition on the device")
+            continue
+        try:
+            size = sparse.raw_size(img)
+        except (OSError, ValueError) as e:   # incl. sparse.SparseError
+            problems.append(f"[{part}] can't size {fw_archive.describe(img)}: {e}")
+            continue
+        length = table[part][1]
+        if size > length:
+            problems.append(f"[{part}] {fw_archive.describe(img)} is {size - length:,} bytes larger "
+                            f"than the partition ({length / 2**20:.1f} MiB)")
+    return out, problems, notes
+
+def preflight(plan, result=None):
+    """
+    Validate a plan against the device's cached layout (see partition_layout
+    and check_plan) before anything is written. result["plan"] gets the
+    plan with super / system settled, result["ok"] False if an image
+    can't be flashed. Without a readable table the plan passes unchecked.
+    """
+    lay = {}
+    yield from partition_layout(result=lay)
+    plan = list(plan)
+    res = {"ok": True, "plan": plan, "problems": []}
+    if not lay["table"]:
+        yield "Preflight: could not read the partition table; image sizes not checked."
+    else:
+        res["plan"], res["problems"], notes = check_plan(plan, lay["table"])
+        yield from notes
+        for line in res["problems"]:
+            yield f"Preflight: {line}"
+        res["ok"] = not res["problems"]
+        if res["ok"]:
+            yield (f"Preflight: {len(plan)} image(s) fit the partition table"
+                   f"{' (cached)' if lay['cached'] else ''}.")
+    if result is not None:
+        result.update(res)
+
+def backup_partitions(partitions, result=None):
+    """
+    Pre-flash backup (see backup.py): get the partition table, show the
+    size / time estimate, then read every partition back into a
+    compressed sparse file with a manifest. result["backup"] gets the
+    manifest (plus "dir"); result["ok"] is False if any partition failed.
+    """
+    lay = {}
+    yield from partition_layout(result=lay)
+    table = lay["table"]
+    device_id = job_device_id()
+    res = {"ok": False}
+    if result is not None:
+        result.update(res)
+    if not table:
+        yield "Backup: could not read the partition table."
+        return
+    est = backup.estimate(partitions, table, device_id)
+    yield backup.describe_estimate(partitions, est)
+    for part in est["missing"]:
+        yield f"[{part}] not in the partition table, not backed up"
+    bset = backup.BackupSet(device_id)
+    yield f"Backing up to {bset.dir} ({bset.method}) …"
+    for part in partitions:
+        if part in est["missing"]:
+            continue
+        sink = bset.sink(part, table[part][1])
+        t0 = time.monotonic()
+        rb = {}
+        with metrics.stage("backup", part):
+            yield from (f"[{part}] {line}" for line in readback_stream(part, sink.length, sink.consume, result=rb))
+        yield bset.add(part, sink, time.monotonic() - t0)
+    manifest = bset.finish()
+    res = {"ok": manifest["ok"] and not est["missing"], "backup": manifest}
+    if result is not None:
+        result.update(res)
+
+def _record_step(jn, part, img, verified):
+    jn.record(part, journal.image_sha(img), image=img, verified=verified)
+
+def restore_sequence(plan, wipe=False, verify_after=False, on_progress=None, result=None, backup_parts=None,
+                     resume="auto", check=True):
+    """
+    One-Click Restore: with check, validate the plan against the device's
+    partition table first (see preflight; nothing is flashed if an image
+    doesn't fit), optionally back up backup_parts (see
+    backup_partitions; nothing is flashed if that fails), flash the plan
+    (see utils.restore_plan) in one session, then optionally erase
+    userdata. result gets the flash_partitions keys plus "ok", "skipped"
+    (and "backup"; with check "plan", or "problems" if it failed).
+
+    Unless resume is False, every completed step goes into the device's
+    restore journal (see journal.py), and partitions an unfinished earlier
+    restore already wrote with the same image are skipped. A job retry
+    therefore picks up where the failed attempt stopped; reset the journal
+    first (RestoreJournal.reset) to force a full restore. With "auto" that
+    only happens for a device with a USB serial: a serial-less journal is
+    keyed by port (or shared as "unknown") and may describe another unit,
+    so it starts over unless the caller asked the user and passes True.
+    resume may also be a function resume(journal, partitions, trusted),
+    called from the job thread after preflight if there is something to
+    skip (trusted: the device has a USB serial). It returns True to
+    resume, False to start over, or None to cancel the restore.
+    """
+    res = {"skipped": []}
+    plan = list(plan)
+    if check:
+        pre = {}
+        yield from preflight(plan, result=pre)
+        if not pre["ok"]:
+            yield "Preflight FAILED; nothing was flashed."
+            res.update(ok=False, problems=pre["problems"])
+            if result is not None:
+                result.update(res)
+            return
+        plan = res["plan"] = pre["plan"]
+    images = dict(plan)
+    jn = pool = None
+    if resume:
+        jn = journal.RestoreJournal(job_device_id())
+        res["skipped"] = jn.resumable(plan)
+        if res["skipped"] and callable(resume):
+            answer = resume(jn, res["skipped"], bool(job_device_serial()))
+            if answer is None:
+                yield "Restore cancelled at the resume prompt; nothing was flashed."
+                res.update(ok=False, cancelled=True, skipped=[])
+                if result is not None:
+                    result.update(res)
+                return
+            if not answer:
+                yield "Full restore: ignoring the unfinished journal."
+                jn.reset()
+                res["skipped"] = []
+        elif res["skipped"] and resume == "auto" and not job_device_serial():
+            yield ("Not resuming the unfinished restore: this device has no USB serial to match the "
+                   "journal by, so flashing everything.")
+            jn.reset()
+            res["skipped"] = []
+        jn.start(plan)
+        if res["skipped"]:
+            yield (f"Resuming the last restore: {', '.join(res['skipped'])} already written "
+                   f"with the same image(s), skipping.")
+        # journal entries are hashed and written off the flash path
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+    try:
+        if backup_parts:
+            backup_parts = [p for p in backup_parts if p not in res["skipped"]]
+        if backup_parts and jn is not None and jn.completed("backup"):
+            yield f"Backup already taken: {jn.data['steps']['backup'].get('dir')}"
+        elif backup_parts:
+            bres = {}
+            yield from backup_partitions(backup_parts, result=bres)
+            res["backup"] = bres.get("backup")
+            if not bres.get("ok"):
+                yield "Backup FAILED; nothing was flashed."
+                res["ok"] = False
+                if result is not None:
+                    result.update(res)
+                return
+            if jn is not None:
+                jn.record("backup", dir=res["backup"]["dir"])
+
+        def on_done(part, verified):
+            pool.submit(_record_step, jn, part, images[part], verified)
+
+        todo = [(part, img) for part, img in plan if part not in res["skipped"]]
+        if todo:
+            yield from flash_partitions(todo, result=res, on_progress=on_progress, verify_after=verify_after,
+                                        on_done=on_done if jn is not None else None)
+        ok = not res.get("failed") and all(passed for passed, _ in res.get("verify", {}).values())
+        if wipe and ok:
+            yield "Erasing userdata …"
+            rc = {}
+            yield from wipe_userdata(result=rc)
+            ok = rc.get("returncode") == 0
+        if pool:
+            pool.shutdown(wait=True)
+        if ok and jn is not None:
+            jn.finish()
+        res["ok"] = ok
+        if result is not None:
+            result.update(res)
+    finally:
+        if pool:
+            # even on cancel / timeout: written partitions must reach the journal
+            pool.shutdown(wait=True)
 
-def reboot_to_bootloader():
+def reboot_to_bootloader(result=None):
     # Example command; adjust to your device/mtkclient version if needed
-    yield from run_mtk_command(["reset"])
+    with metrics.stage("reset"):
+        yield from run_mtk_command(["reset"], result=result)
 
-def wipe_userdata():
+def wipe_userdata(result=None):
     # Danger: wipes data. Confirm at UI level before calling.
     # Often: mtk e userdata  (erase)
-    yield from run_mtk_command(["e", "userdata"])
+    _forget_block_maps(["userdata"])
+    with metrics.stage("wipe"):
+        yield from run_mtk_command(["e", "userdata"], result=result)
 
-def reset_device():
+def reset_device(result=None):
     # Soft reset via mtk
-    yield from run_mtk_command(["reset"])
+    with metrics.stage("reset"):
+        yield from run_mtk_command(["reset"], result=result)
@@ -0,0 +1,600 @@
+# phoenixr1.py
+# Headless command-line entry point (no Qt), for scripts and station controllers.
+#
+#   python phoenixr1.py scan --json
+#   python phoenixr1.py restore --verify --wipe --yes
+#   python phoenixr1.py events --since 7d --partition super --failed
+#   python phoenixr1.py sets import r1-2.1 ./firmware --version 2.1 && python phoenixr1.py sets use r1-2.1
+#
+# Startup cost matters here (it runs from shell loops): only argparse/json
+# are imported up front, every command imports what it needs. `scan`,
+# `status` and `verify` never load mtk_wrapper / asyncio. Measure with
+#   python -X importtime phoenixr1.py scan
+# or bench/bench_cli_startup.py.
+
+import argparse
+import json
+import sys
+import time
+
+EXIT_OK = 0
+EXIT_FAIL = 1
+EXIT_USAGE = 2
+EXIT_NO_DEVICE = 3
+EXIT_CANCELLED = 130
+
+# partition name -> utils.PHOENIX_FILENAMES key
+PART_KEYS = {"boot": "boot", "vbmeta": "vbmeta", "super": "super_or_system",
+             "system": "super_or_system", "vendor": "vendor"}
+
+
+# --------------------------
+# Output
+# --------------------------
+class Output:
+    """
+    Human-readable text, or with --json one JSON object per line: "line" /
+    "progress" events while a device operation runs, then one "result".
+    """
+
+    PROGRESS_EVERY = 0.25  # s between JSON progress events per partition
+
+    def __init__(self, as_json: bool):
+        self.json = as_json
+        self._last_progress = {}
+        self._bar = False
+
+    def _emit(self, obj):
+        sys.stdout.write(json.dumps(obj) + "\n")
+        sys.stdout.flush()
+
+    def line(self, text, level=None):
+        if self.json:
+            obj = {"event": "line", "text": text}
+            if level:
+                obj["level"] = level
+            self._emit(obj)
+            return
+        self._end_bar()
+        print(text, flush=True)
+
+    def progress(self, ev):
+        if self.json:
+            now = time.monotonic()
+            if not ev.finished and now - self._last_progress.get(ev.partition, 0.0) < self.PROGRESS_EVERY:
+                return
+            self._last_progress[ev.partition] = now
+            self._emit({"event": "progress", "partition": ev.partition, "percent": round(ev.percent, 1),
+                        "done": ev.done, "total": ev.total, "rate_mbps": ev.rate, "eta_s": ev.eta})
+        elif sys.stderr.isatty():
+            rate = f" {ev.rate:.1f} MB/s" if ev.rate else ""
+            sys.stderr.write(f"\r{ev.partition or ''} {ev.percent:5.1f}%{rate}   ")
+            sys.stderr.flush()
+            self._bar = True
+
+    def _end_bar(self):
+        if self._bar:
+            sys.stderr.write("\n")
+            self._bar = False
+
+    def result(self, command, ok, text=None, **fields):
+        """Final outcome; text is the human form (JSON gets the fields)."""
+        if self.json:
+            self._emit({"event": "result", "command": command, "ok": ok, **fields})
+        else:
+            self._end_bar()
+            if text:
+                print(text, flush=True)
+
+
+# --------------------------
+# Helpers
+# --------------------------
+def _devices():
+    import device_monitor
+    return device_monitor.default_backend().scan()
+
+
+def _pick_device(args, out):
+    """(ok, device or None). With --port the device is required and pinned; otherwise any device will do."""
+    if args.force and not args.port:
+        return True, None
+    devices = _devices()
+    if args.port:
+        for d in devices:
+            if d.port == args.port:
+                return True, d
+        out.result(args.command, False, f"No MTK device on port {args.port}.", error="device not found")
+        return False, None
+    if not devices:
+        out.result(args.command, False, "No MTK device detected (use --force to try anyway).",
+                   error="no device")
+        return False, None
+    return True, None
+
+
+def _images(args, out):
+    """
+    Image paths: --set, else a scan of --fw-dir, else the GUI's choice
+    (config fw_set, then fw_dir). None (after reporting) for an unknown set.
+    """
+    import utils
+    name = args.set or (None if args.fw_dir else utils.get_fw_set())
+    if not name:
+        return utils.list_firmware_images(args.fw_dir or utils.get_fw_dir())
+    import fw_store
+    try:
+        return fw_store.active_images(fw_set=name)
+    except fw_store.StoreError as e:
+        out.result(args.command, False, f"Unknown firmware set: {name} (see `sets`).", error=str(e))
+        return None
+
+
+def _check_images(paths: dict, keys, out, command):
+    """Refuse images with a checksum mismatch or a corrupt sparse header, like the GUI does."""
+    import fw_archive
+    import sparse
+    import verify
+    wanted = {k: paths.get(k) for k in keys}
+    results = verify.verify_images(wanted)
+    bad = {}
+    for key, path in wanted.items():
+        status, detail = results.get(key, (verify.MISSING, ""))
+        if status == verify.MISMATCH:
+            bad[key] = f"checksum mismatch ({detail})"
+        elif path and sparse.is_sparse(path) and not fw_archive.is_member(path):
+            try:
+                sparse.parse(path)
+            except sparse.SparseError as e:
+                bad[key] = f"corrupt sparse image ({e})"
+    for key, why in bad.items():
+        out.line(f"{key}: {why}", "err")
+    if bad:
+        out.result(command, False, "Refusing to flash: image check failed.", error="image check failed",
+                   images={k: v for k, v in bad.items()})
+    return not bad
+
+
+def _run_job(args, out, device, name, make_gen):
+    """Run one job to completion through jobs.JobEngine (timeouts, retries, Ctrl-C = cancel)."""
+    import events
+    import jobs
+    import metrics
+    import utils
+    utils.ensure_mtk_on_path(args.mtk)
+    engine = jobs.JobEngine(
+        on_line=lambda job, text, level: out.line(text, level),
+        log_path=(lambda job: utils.log_filename()) if args.log else None,
+        event_log=events.EventLog(utils.events_dir(), index=False),
+        metrics=metrics.get_store(),
+    )
+    job = engine.submit(device.port if device else "local", name, make_gen, device=device)
+    try:
+        while not engine.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        out.line("Cancelling …", "warn")
+        engine.cancel_all()
+        engine.wait(30)
+    return job
+
+
+def _job_result(args, out, job, **fields):
+    import jobs
+    ok = job.state == jobs.DONE
+    fields.update(state=job.state, elapsed_s=round(job.elapsed, 2), attempts=job.attempts)
+    if job.error:
+        fields["error"] = job.error
+    if job.log_path:
+        fields["log"] = job.log_path
+    verify_res = job.result.get("verify")
+    if verify_res:
+        fields["verify"] = {p: {"ok": ok_, "seconds": round(s, 2)} for p, (ok_, s) in verify_res.items()}
+    if job.result.get("failed"):
+        fields["failed"] = list(job.result["failed"])
+    if job.result.get("problems"):
+        fields["problems"] = list(job.result["problems"])
+    fields["timings"] = timings = job.timeline.summary()
+    text = f"{job.name}: {job.state} in {job.elapsed:.1f} s" + (f" ({job.error})" if job.error else "")
+    if not args.json:
+        out.line("Time: " + ", ".join(f"{st} {s:.1f} s" for st, s in timings["stages"].items() if s >= 0.05)
+                 + (f"; write {timings['mbps']:.1f} MB/s" if timings["mbps"] else ""))
+    out.result(args.command, ok, text, **fields)
+    if ok:
+        return EXIT_OK
+    return EXIT_CANCELLED if job.state == jobs.CANCELLED else EXIT_FAIL
+
+
+def _confirm_resume(args, out, jn):
+    """Ask before resuming a journal that can't be matched to the device by its serial."""
+    if sys.stdin.isatty() and not args.json:
+        out.line(f"The last {jn.describe()}. This device has no USB serial, so that may have been "
+                 "another R1 on the same port.", "warn")
+        return input("Resume and skip what it wrote? [y/N] ").strip().lower() in ("y", "yes")
+    return False
+
+
+def _confirm_wipe(args, out):
+    if args.yes:
+        return True
+    if sys.stdin.isatty() and not args.json:
+        return input("This will ERASE userdata. Type 'yes' to continue: ").strip().lower() == "yes"
+    out.result(args.command, False, "Refusing to wipe without --yes.", error="wipe needs --yes")
+    return False
+
+
+# --------------------------
+# Commands
+# --------------------------
+def cmd_scan(args, out):
+    import dataclasses
+    import device_monitor
+    devices = _devices()
+    if not args.json:
+        print(device_monitor.describe(devices))
+        return EXIT_OK if devices else EXIT_NO_DEVICE
+    out.result("scan", bool(devices), devices=[dataclasses.asdict(d) for d in devices])
+    return EXIT_OK if devices else EXIT_NO_DEVICE
+
+
+def cmd_status(args, out):
+    import dataclasses
+    import shutil
+    import device_monitor
+    import fw_archive
+    import utils
+    utils.ensure_mtk_on_path(args.mtk)
+    devices = _devices()
+    paths = _images(args, out)
+    if paths is None:
+        return EXIT_USAGE
+    mtk = shutil.which("mtk") or shutil.which("mtk.exe")
+    images = {k: {"path": p, "size": fw_archive.size(p) if fw_archive.exists(p) else None}
+              for k, p in paths.items()}
+    if args.json:
+        out.result("status", True, devices=[dataclasses.asdict(d) for d in devices],
+                   images=images, mtk=mtk or f"{sys.executable} -m mtkclient",
+                   fw_dir=args.fw_dir or utils.get_fw_dir(),
+                   fw_set=args.set or (None if args.fw_dir else utils.get_fw_set()))
+        return EXIT_OK
+    print(f"Device:   {device_monitor.describe(devices)}")
+    print(f"mtk:      {mtk or 'python -m mtkclient'}")
+    for key, info in images.items():
+        size = f"  ({info['size'] / 2**20:.1f} MiB)" if info["size"] is not None else ""
+        print(f"{key + ':':<17}{info['path'] or 'missing'}{size}")
+    return EXIT_OK
+
+
+def cmd_verify(args, out):
+    import verify
+    paths = _images(args, out)
+    if paths is None:
+        return EXIT_USAGE
+    results = verify.verify_images(paths)
+    mismatch = any(s == verify.MISMATCH for s, _ in results.values())
+    if args.json:
+        out.result("verify", not mismatch,
+                   images={k: {"path": paths.get(k), "status": s, "detail": d} for k, (s, d) in results.items()})
+    else:
+        for key, (status, detail) in results.items():
+            print(f"{key + ':':<17}{status:<11}{detail}")
+    return EXIT_FAIL if mismatch else EXIT_OK
+
+
+def cmd_flash(args, out):
+    import fw_archive
+    import utils
+    part = args.partition
+    if args.image:
+        image = args.image
+        if not fw_archive.exists(image):
+            out.result("flash", False, f"Image not found: {image}", error="image not found")
+            return EXIT_USAGE
+    else:
+        key = PART_KEYS.get(part)
+        paths = _images(args, out) if key else {}
+        if paths is None:
+            return EXIT_USAGE
+        image = paths.get(key)
+        if not image:
+            out.result("flash", False, f"No image for {part} (pass --image).", error="image not found")
+            return EXIT_USAGE
+        if key == "super_or_system":
+            part = utils.partition_for(key, image)
+    if not _check_images({part: image}, [part], out, "flash"):
+        return EXIT_FAIL
+    ok, device = _pick_device(args, out)
+    if not ok:
+        return EXIT_NO_DEVICE
+
+    def run(job):
+        import mtk_wrapper as mtk
+        target = part
+        if not args.no_preflight:
+            pre = {}
+            yield from mtk.preflight([(part, image)], result=pre)
+            if not pre["ok"]:
+                job.result.update(ok=False, problems=pre["problems"])
+                return
+            [(target, _)] = pre["plan"]
+        job.result["partition"] = target
+        if args.delta:
+            import delta
+            res = {}
+            yield from delta.delta_flash(target, image, result=res, on_progress=out.progress)
+            job.result["ok"] = res.get("ok", True)
+            if args.verify and res.get("written"):
+                vres = {}
+                yield from mtk.verify_partition(target, image, result=vres)
+                job.result["verify"] = vres.get("verify", {})
+                job.result["ok"] = job.result["ok"] and all(v for v, _ in job.result["verify"].values())
+            return
+        yield from mtk.flash_partitions([(target, image)], batch=False, result=job.result,
+                                        on_progress=out.progress, verify_after=args.verify)
+        job.result["ok"] = not job.result.get("failed") and all(v for v, _ in job.result.get("verify", {}).values())
+
+    out.line(f"Flashing {part} from {fw_archive.describe(image)} …")
+    job = _run_job(args, out, device, f"flash {part}", run)
+    return _job_result(args, out, job, partition=job.result.get("partition", part), image=image)
+
+
+def cmd_restore(args, out):
+    import utils
+    paths = _images(args, out)
+    if paths is None:
+        return EXIT_USAGE
+    plan = utils.restore_plan(paths, args.three_file)
+    keys = ["boot", "vbmeta", "super_or_system"] + ([] if args.three_file else ["vendor"])
+    missing = [k for k in keys if not paths.get(k)]
+    if missing:
+        out.result("restore", False, f"Missing images: {', '.join(missing)}", error="missing images",
+                   missing=missing)
+        return EXIT_USAGE
+    if not _check_images(paths, keys, out, "restore"):
+        return EXIT_FAIL
+    if args.wipe and not _confirm_wipe(args, out):
+        return EXIT_USAGE
+    ok, device = _pick_device(args, out)
+    if not ok:
+        return EXIT_NO_DEVICE
+    import journal
+    import mtk_wrapper as mtk
+    jn = journal.RestoreJournal(mtk.job_device_id(device))
+    resume = "auto"
+    if args.full:
+        jn.reset()
+    elif jn.resumable(plan):
+        if mtk.job_device_serial(device) or args.resume:
+            resume = True
+            out.line(f"The last {jn.describe()}; resuming (--full to start over).", "warn")
+        elif _confirm_resume(args, out, jn):
+            resume = True
+        else:
+            out.line(f"The last {jn.describe()}, but this device has no USB serial to match it by; "
+                     "flashing everything (--resume to skip what it wrote).", "warn")
+            jn.reset()
+    backup_parts = None
+    if args.backup or args.backup_super:
+        import backup
+        backup_parts = backup.default_partitions(plan, args.backup_super or None)
+        out.line(backup.preview(backup_parts, mtk.job_device_id(device)))
+
+    def run(job):
+        return mtk.restore_sequence(plan, wipe=args.wipe, verify_after=args.verify,
+                                    on_progress=out.progress, result=job.result, backup_parts=backup_parts,
+                                    resume=resume, check=not args.no_preflight)
+
+    job = _run_job(args, out, device, "restore", run)
+    plan = job.result.get("plan", plan)   # super / system as settled by the preflight
+    return _job_result(args, out, job, plan=[{"partition": p, "image": i} for p, i in plan], wiped=bool(
+        args.wipe and job.result.get("ok")), backup=job.result.get("backup"),
+        skipped=job.result.get("skipped", []))
+
+
+def cmd_wipe(args, out):
+    if not _confirm_wipe(args, out):
+        return EXIT_USAGE
+    ok, device = _pick_device(args, out)
+    if not ok:
+        return EXIT_NO_DEVICE
+
+    def run(job):
+        import mtk_wrapper as mtk
+        return mtk.wipe_userdata(result=job.result)
+
+    return _job_result(args, out, _run_job(args, out, device, "wipe userdata", run))
+
+
+def cmd_reset(args, out):
+    ok, device = _pick_device(args, out)
+    if not ok:
+        return EXIT_NO_DEVICE
+
+    def run(job):
+        import mtk_wrapper as mtk
+        return mtk.reset_device(result=job.result)
+
+    return _job_result(args, out, _run_job(args, out, device, "reset", run))
+
+
+def _parse_when(value: str) -> float:
+    """"7d", "12h", "30m" (ago) or an ISO date/time -> epoch seconds."""
+    from datetime import datetime
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    if value[-1:] in units and value[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a duration (7d, 12h) or ISO time: {value}") from None
+
+
+def cmd_events(args, out):
+    import events
+    eq = {"kind": args.kind, "level": args.level, "state": "failed" if args.failed else args.state,
+          "partition": args.partition, "device": args.device, "job": args.job}
+    rows = events.get_index().query(since=args.since, until=args.until, text=args.grep,
+                                    limit=args.limit, **eq)
+    rows.reverse()  # oldest first reads better
+    if args.json:
+        for ev in rows:
+            print(json.dumps(ev))
+        return EXIT_OK
+    for ev in rows:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ev["ts"]))
+        what = ev.get("text")
+        if what is None:
+            what = " ".join(f"{k}={ev[k]}" for k in ("partition", "state", "verify", "elapsed_s", "error")
+                            if k in ev)
+        print(f"{stamp} {ev.get('device', '-'):<10} {ev.get('job_name', ''):<14} {ev['kind']:<9} {what}")
+    return EXIT_OK
+
+
+def cmd_sets(args, out):
+    import fw_store
+    import utils
+    store = fw_store.get_store()
+    action = args.action or "list"
+    if action == "import":
+        res = {}
+        link = "copy" if args.copy else "hardlink" if args.hardlink else None
+        for line in store.import_set(args.name, args.dir, version=args.version, replace=args.replace,
+                                     link=link, result=res):
+            out.line(line)
+        ok = res.pop("ok")
+        out.result("sets", ok, None, **res)
+        return EXIT_OK if ok else EXIT_FAIL
+    if action == "use":
+        if not args.name:
+            utils.set_fw_set(None)
+            out.result("sets", True, "Using the firmware folder.", fw_set=None)
+            return EXIT_OK
+        if store.get_set(args.name) is None:
+            out.result("sets", False, f"Unknown firmware set: {args.name}", error="unknown set")
+            return EXIT_USAGE
+        utils.set_fw_set(args.name)
+        out.result("sets", True, f"Using firmware set {args.name}.", fw_set=args.name)
+        return EXIT_OK
+    if action == "remove":
+        ok = store.remove_set(args.name)
+        if ok and utils.get_fw_set() == args.name:
+            utils.set_fw_set(None)
+        out.result("sets", ok, f"Removed {args.name} (run `sets gc` to free its images)." if ok
+                   else f"Unknown firmware set: {args.name}", removed=args.name if ok else None)
+        return EXIT_OK if ok else EXIT_USAGE
+    if action == "gc":
+        n, freed = store.gc()
+        out.result("sets", True, f"Removed {n} unused image(s), {freed / 2**20:.1f} MiB freed.",
+                   removed=n, bytes_freed=freed)
+        return EXIT_OK
+    current = utils.get_fw_set()
+    rows = store.sets()
+    if args.json:
+        out.result("sets", True, sets=rows, current=current, store=str(store.root))
+        return EXIT_OK
+    if not rows:
+        print(f"No firmware sets in {store.root} (add one with `sets import NAME DIR`).")
+    for r in rows:
+        mark = "*" if r["name"] == current else " "
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created"]))
+        print(f"{mark} {r['name']:<20} {r['version'] or '-':<14} {r['files']} image(s) "
+              f"{r['size'] / 2**20:>9.1f} MiB  {when}  {r['source']}")
+    return EXIT_OK
+
+
+# --------------------------
+# Entry point
+# --------------------------
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="machine-readable output (JSON lines)")
+    common.add_argument("--fw-dir", help="firmware folder (default: the GUI's choice, then ./firmware)")
+    common.add_argument("--set", help="firmware set from the store instead of a folder (see `sets`)")
+    common.add_argument("--mtk", help="path to mtk / mtk.exe (default: config mtk_path, then PATH)")
+
+    dev = argparse.ArgumentParser(add_help=False)
+    dev.add_argument("--port", help="USB port of the device to use (see `scan`); pins mtk to it")
+    dev.add_argument("--force", action="store_true", help="run even if no device is detected")
+    dev.add_argument("--log", action="store_true", help="save the output to a PhoenixR1_Log_*.txt like the GUI")
+
+    ap = argparse.ArgumentParser(prog="phoenixr1", description="PhoenixR1 flasher, headless")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", parents=[common], help="list MediaTek devices in download mode")
+    sub.add_parser("status", parents=[common], help="device, mtk and firmware images")
+    sub.add_parser("verify", parents=[common], help="check images against SHA256SUMS / manifest.json")
+
+    p = sub.add_parser("flash", parents=[common, dev], help="flash one partition")
+    p.add_argument("partition", help="boot, vbmeta, super, system, vendor (or any name with --image)")
+    p.add_argument("--image", help="image file (default: from the firmware folder)")
+    p.add_argument("--verify", action="store_true", help="read back and compare SHA-256 after writing")
+    p.add_argument("--delta", action="store_true", help="write only blocks that differ from the device")
+    p.add_argument("--no-preflight", action="store_true", help="don't check the image against the partition table")
+
+    p = sub.add_parser("restore", parents=[common, dev], help="full restore (vbmeta, boot, super/system, vendor)")
+    p.add_argument("--three-file", action="store_true", help="skip vendor")
+    p.add_argument("--verify", action="store_true", help="read back and compare SHA-256 after writing")
+    p.add_argument("--wipe", action="store_true", help="erase userdata after a successful flash")
+    p.add_argument("--yes", action="store_true", help="don't ask before wiping")
+    p.add_argument("--full", action="store_true", help="don't resume an unfinished restore; flash everything")
+    p.add_argument("--resume", action="store_true",
+                   help="resume an unfinished restore even if the device has no USB serial to match it by")
+    p.add_argument("--backup", action="store_true", help="back up boot/vbmeta/vendor first (backups/)")
+    p.add_argument("--backup-super", action="store_true", help="--backup including super/system")
+    p.add_argument("--no-preflight", action="store_true", help="don't check images against the partition table")
+
+    p = sub.add_parser("wipe", parents=[common, dev], help="erase userdata")
+    p.add_argument("--yes", action="store_true", help="don't ask")
+
+    sub.add_parser("reset", parents=[common, dev], help="reset the device")
+
+    p = sub.add_parser("events", help="search the event log of past runs (logs/events)")
+    p.add_argument("--json", action="store_true", help="one JSON event per line")
+    p.add_argument("--since", type=_parse_when, help="e.g. 7d, 12h, 2024-05-01")
+    p.add_argument("--until", type=_parse_when)
+    p.add_argument("--kind", choices=("line", "job", "partition"))
+    p.add_argument("--level", choices=("info", "ok", "warn", "err"))
+    p.add_argument("--state", help="job state (queued/running/done/failed/cancelled) or partition state (written/failed)")
+    p.add_argument("--failed", action="store_true", help="same as --state failed")
+    p.add_argument("--partition")
+    p.add_argument("--device", help="USB port / device id")
+    p.add_argument("--job", help="job id (as printed in --json output)")
+    p.add_argument("--grep", help="substring of the output line")
+    p.add_argument("--limit", type=int, default=200, help="newest N events (default 200)")
+
+    js = argparse.ArgumentParser(add_help=False)
+    js.add_argument("--json", action="store_true", help="machine-readable output (JSON lines)")
+    p = sub.add_parser("sets", parents=[js], help="firmware sets in the local store (list, import, use, remove, gc)")
+    acts = p.add_subparsers(dest="action")
+    acts.add_parser("list", parents=[js], help="list the sets (default; * marks the one in use)")
+    a = acts.add_parser("import", parents=[js], help="store the images of a folder as a named set")
+    a.add_argument("name")
+    a.add_argument("dir", help="firmware folder (archives inside it are imported too)")
+    a.add_argument("--version", help="firmware version to record")
+    a.add_argument("--replace", action="store_true", help="overwrite an existing set of that name")
+    a.add_argument("--copy", action="store_true", help="always copy (no reflinks)")
+    a.add_argument("--hardlink", action="store_true",
+                   help="hardlink images the filesystem can't reflink (edits to the source then reach the store)")
+    a = acts.add_parser("use", parents=[js], help="flash from this set by default (GUI and CLI)")
+    a.add_argument("name", nargs="?", help="set name; omit to go back to the firmware folder")
+    a = acts.add_parser("remove", parents=[js], help="forget a set (images stay until gc)")
+    a.add_argument("name")
+    acts.add_parser("gc", parents=[js], help="delete stored images no set uses")
+    return ap
+
+
+COMMANDS = {"scan": cmd_scan, "status": cmd_status, "verify": cmd_verify, "flash": cmd_flash,
+            "restore": cmd_restore, "wipe": cmd_wipe, "reset": cmd_reset, "events": cmd_events,
+            "sets": cmd_sets}
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    out = Output(args.json)
+    try:
+        return COMMANDS[args.command](args, out)
+    except KeyboardInterrupt:
+        return EXIT_CANCELLED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
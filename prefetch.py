@@ -0,0 +1,338 @@
+# prefetch.py
+# Warm the next images of a flash plan while the current one is written.
+#
+# Partitions are flashed strictly in order, and each mtk process cold-reads
+# its image. On network shares and USB disks that read can be slower than
+# the USB write, so while partition N is written the next prefetch_depth
+# images are either read ahead into the OS page cache ("readahead") or
+# copied into a bounded local cache with LRU eviction ("cache", which also
+# makes repeat runs of the same firmware read from local disk). Images
+# inside archives (see fw_archive) are always prefetched into the cache.
+
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import fw_archive
+import utils
+
+MODES = ("readahead", "cache", "off")
+CHUNK = 8 * 1024 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_pinned = Counter()          # cache entries in use by a running flash (never evicted)
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+        return _pool
+
+
+def _mb(n) -> str:
+    return f"{n / 2**20:.1f} MB"
+
+
+# --------------------
+# Local image cache
+# --------------------
+def default_cache_dir() -> Path:
+    return Path(tempfile.gettempdir()) / "phoenixr1-image-cache"
+
+
+def _entry_key(path) -> str:
+    """Cache key of an image: absolute path, size and mtime, so a changed file is a new entry."""
+    if fw_archive.is_member(path):
+        archive, name = fw_archive.split(path)
+        size, mtime_ns = fw_archive.stamp(archive)
+        raw = f"{os.path.abspath(archive)}|{size}|{mtime_ns}|{name}"
+    else:
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest()[:20]
+
+
+def _entry_size(d: Path) -> int:
+    try:
+        return sum(f.stat().st_size for f in d.iterdir() if f.is_file())
+    except OSError:
+        return 0
+
+
+def _evict(cache_dir: Path, need: int, budget: int) -> int:
+    """Delete least recently used entries until need more bytes fit in budget; returns entries removed."""
+    try:
+        entries = [d for d in cache_dir.iterdir() if d.is_dir()]
+    except OSError:
+        return 0
+    sizes = {d: _entry_size(d) for d in entries}
+    total = sum(sizes.values())
+    removed = 0
+    for d in sorted(entries, key=lambda d: d.stat().st_mtime):
+        if total + need <= budget:
+            break
+        if _pinned[d.name]:
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        if not d.exists():
+            total -= sizes[d]
+            removed += 1
+    return removed
+
+
+def cached_copy(path, cache_dir) -> str | None:
+    """The cached copy of path if it is complete (and mark it recently used), else None."""
+    try:
+        d = Path(cache_dir) / _entry_key(path)
+    except OSError:
+        return None
+    target = d / fw_archive.basename(path)
+    if not target.is_file():
+        return None
+    try:
+        os.utime(d)
+    except OSError:
+        pass
+    return str(target)
+
+
+def store(img, cache_dir, budget: int, stop: threading.Event | None = None) -> tuple:
+    """
+    Copy img (a file or an archive member) into the cache unless it is
+    there already. Returns (cached path or None if img is larger than the
+    budget, bytes copied, entries evicted).
+    """
+    hit = cached_copy(img, cache_dir)
+    if hit:
+        return hit, 0, 0
+    size = fw_archive.size(img)
+    if size > budget:
+        return None, 0, 0
+    cache_dir = Path(cache_dir)
+    d = cache_dir / _entry_key(img)
+    with _cache_lock:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        evicted = _evict(cache_dir, size, budget)
+        _pinned[d.name] += 1
+    try:
+        d.mkdir(exist_ok=True)
+        target = d / fw_archive.basename(img)
+        part = d / f".{target.name}.{os.getpid()}.{threading.get_ident()}.part"
+        n = 0
+        try:
+            with fw_archive.open_image(img) as src, open(part, "wb") as out:
+                while not (stop and stop.is_set()):
+                    piece = src.read(CHUNK)
+                    if not piece:
+                        break
+                    out.write(piece)
+                    n += len(piece)
+            if n != size:
+                raise OSError(f"copy incomplete ({n} of {size} bytes)")
+            os.replace(part, target)
+        except OSError:
+            part.unlink(missing_ok=True)
+            if stop and stop.is_set():
+                return None, n, evicted
+            raise
+        return str(target), n, evicted
+    finally:
+        with _cache_lock:
+            _pinned[d.name] -= 1
+
+
+@contextlib.contextmanager
+def cached(img):
+    """
+    Context manager yielding a local, seekable copy of img from the cache
+    (filled first if needed; a private temp copy if img is larger than the
+    whole cache). The entry is not evicted while in use.
+    """
+    s = utils.get_prefetch_settings()
+    path, _, _ = store(img, s["cache_dir"] or default_cache_dir(), int(s["cache_mb"] * 2**20))
+    if path is None:
+        with tempfile.TemporaryDirectory(prefix="phoenix_extract_") as td:
+            path = os.path.join(td, fw_archive.basename(img))
+            with fw_archive.open_image(img) as src, open(path, "wb") as out:
+                shutil.copyfileobj(src, out, CHUNK)
+            yield path
+        return
+    name = Path(path).parent.name
+    with _cache_lock:
+        _pinned[name] += 1
+    try:
+        yield path
+    finally:
+        with _cache_lock:
+            _pinned[name] -= 1
+
+
+# --------------------
+# Prefetcher
+# --------------------
+@dataclass
+class PrefetchStats:
+    mode: str
+    hits: int = 0            # image was warm (or cached) when its turn came
+    misses: int = 0
+    bytes: int = 0           # read ahead or copied by this prefetcher
+    seconds: float = 0.0     # prefetch work time (overlaps the writes)
+    evictions: int = 0
+    skipped: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "bytes": self.bytes,
+                "seconds": round(self.seconds, 3), "evictions": self.evictions, "skipped": list(self.skipped)}
+
+    def summary(self) -> str:
+        s = (f"Prefetch ({self.mode}): {self.hits} hit, {self.misses} miss, "
+             f"{_mb(self.bytes)} prefetched in {self.seconds:.1f} s")
+        if self.evictions:
+            s += f", {self.evictions} evicted"
+        return s
+
+
+class Prefetcher:
+    """
+    Prefetch for one flash plan. images are the image paths in flash order.
+    Call begin(img) just before img is flashed: it records a hit or miss,
+    starts warming the next images and returns the path to hand to the tool
+    (the local copy in "cache" mode once it exists). lines() drains log
+    lines from the background work; close() stops it.
+    """
+
+    def __init__(self, images, settings: dict | None = None):
+        s = settings or utils.get_prefetch_settings()
+        self.images = list(images)
+        self.mode = s["mode"] if len(self.images) > 1 or s["mode"] == "cache" else "off"
+        self.depth = s["depth"]
+        self.readahead = int(s["readahead_mb"] * 2**20)
+        self.cache_dir = Path(s["cache_dir"] or default_cache_dir())
+        self.cache_budget = int(s["cache_mb"] * 2**20)
+        self.stats = PrefetchStats(self.mode)
+        self._futures = {}
+        self._begun = set()
+        self._pins = []
+        self._lines = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ---- flash side
+    def local(self, img) -> str:
+        """Path to hand to the tool for img: the cached copy if complete, else img."""
+        if self.mode == "off" or (self.mode != "cache" and not fw_archive.is_member(img)):
+            return img
+        hit = cached_copy(img, self.cache_dir)
+        if hit:
+            self._pin(hit)
+        return hit or img
+
+    def begin(self, img) -> str:
+        if self.mode == "off":
+            return img
+        path = self.local(img)
+        if img in self._begun:
+            return path
+        self._begun.add(img)
+        fut = self._futures.get(img)
+        warm = path != img or (fut is not None and fut.done() and not fut.cancelled()
+                               and fut.exception() is None)
+        with self._lock:
+            if warm:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+        if self.mode == "cache" and path == img and fut is None:
+            self._submit(img)           # fill the cache for the next run
+        try:
+            i = self.images.index(img)
+        except ValueError:
+            return path
+        for nxt in self.images[i + 1:i + 1 + self.depth]:
+            if nxt not in self._futures:
+                self._submit(nxt)
+        return path
+
+    def lines(self):
+        while True:
+            try:
+                yield self._lines.popleft()
+            except IndexError:
+                return
+
+    def close(self) -> PrefetchStats:
+        self._stop.set()
+        for fut in self._futures.values():
+            fut.cancel()
+        with _cache_lock:
+            for name in self._pins:
+                _pinned[name] -= 1
+            self._pins.clear()
+        return self.stats
+
+    # ---- background side
+    def _pin(self, cached):
+        name = Path(cached).parent.name
+        with _cache_lock:
+            _pinned[name] += 1
+            self._pins.append(name)
+
+    def _submit(self, img):
+        work = self._copy if self.mode == "cache" or fw_archive.is_member(img) else self._read_ahead
+        self._futures[img] = _get_pool().submit(self._timed, work, img)
+
+    def _timed(self, work, img):
+        if self._stop.is_set():
+            return 0
+        t0 = time.monotonic()
+        try:
+            n = work(img)
+        except OSError as e:
+            self._lines.append(f"[prefetch] {fw_archive.basename(img)}: {e}")
+            raise
+        secs = time.monotonic() - t0
+        with self._lock:
+            self.stats.bytes += n
+            self.stats.seconds += secs
+        if n:
+            self._lines.append(f"[prefetch] {fw_archive.basename(img)} ready ({_mb(n)}, {secs:.1f} s)")
+        return n
+
+    def _read_ahead(self, img) -> int:
+        n = 0
+        with open(img, "rb", buffering=0) as f:
+            size = min(os.fstat(f.fileno()).st_size, self.readahead)
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+            # WILLNEED is only a hint (network filesystems may ignore it), so read through as well
+            buf = bytearray(min(CHUNK, size or 1))
+            while n < size and not self._stop.is_set():
+                got = f.readinto(memoryview(buf)[:min(len(buf), size - n)])
+                if not got:
+                    break
+                n += got
+        if n < os.path.getsize(img) and not self._stop.is_set():
+            self.stats.skipped.append(fw_archive.basename(img))
+        return n
+
+    def _copy(self, img) -> int:
+        path, n, evicted = store(img, self.cache_dir, self.cache_budget, self._stop)
+        with self._lock:
+            self.stats.evictions += evicted
+        if path is None and not self._stop.is_set():
+            name = fw_archive.basename(img)
+            self.stats.skipped.append(name)
+            self._lines.append(f"[prefetch] {name} ({_mb(fw_archive.size(img))}) is larger than the cache, not cached")
+        return n
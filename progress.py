@@ -0,0 +1,158 @@
+# progress.py
+# Incremental reader + parser for mtkclient's carriage-return progress bars.
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+SECTOR_SIZE = 512
+_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+# mtkclient: "Progress: |█████-----| 45.2% Write (Sector 0x1A00 of 0x40000, ) 12.34 MB/s"
+_PCT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+_POS_RE = re.compile(r"(sector\s+)?(0x[0-9a-f]+|\d+)\s*(?:of|/)\s*(0x[0-9a-f]+|\d+)", re.I)
+_RATE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([kmg]?b)/s", re.I)
+_SPLIT_RE = re.compile(rb"\r\n|\r|\n")
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    partition: str | None
+    done: int | None       # bytes written/read so far (None if the tool only prints a percentage)
+    total: int | None      # bytes
+    percent: float
+    rate: float | None     # MB/s
+    eta: float | None      # seconds
+    text: str = ""
+
+    @property
+    def finished(self) -> bool:
+        return self.percent >= 100.0
+
+
+class RecordSplitter:
+    """
+    Incremental form of iter_records for callers that get bytes in chunks
+    (e.g. asyncio streams): feed(chunk) and flush() return lists of
+    (text, terminator).
+    """
+
+    def __init__(self):
+        self._buf = b""
+
+    def feed(self, chunk: bytes) -> list:
+        buf = self._buf + chunk
+        out = []
+        pos = 0
+        for m in _SPLIT_RE.finditer(buf):
+            # a "\r" at the very end may be the first half of "\r\n"
+            if m.group() == b"\r" and m.end() == len(buf):
+                break
+            out.append((buf[pos:m.start()].decode("utf-8", "replace"), "\r" if m.group() == b"\r" else "\n"))
+            pos = m.end()
+        self._buf = buf[pos:]
+        return out
+
+    def flush(self) -> list:
+        buf, self._buf = self._buf, b""
+        if not buf:
+            return []
+        term = ""
+        if buf.endswith(b"\r"):
+            buf, term = buf[:-1], "\r"
+        return [(buf.decode("utf-8", "replace"), term)]
+
+
+def iter_records(stream, chunk_size: int = 65536):
+    """
+    Yield (text, terminator) from a binary stream as soon as a record ends.
+    Records end on "\\n", "\\r\\n" or a bare "\\r" (progress redraw); the
+    terminator is "\\n" or "\\r" accordingly. Trailing data is yielded with "".
+    """
+    read = getattr(stream, "read1", stream.read)
+    splitter = RecordSplitter()
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+class ProgressParser:
+    """Turns progress-bar text into ProgressEvents; returns None for ordinary lines."""
+
+    def __init__(self, partition: str | None = None, clock=time.monotonic):
+        self.partition = partition
+        self._clock = clock
+        self._t0 = None
+        self._b0 = None
+
+    def feed(self, text: str) -> ProgressEvent | None:
+        low = text.lower()
+        pm = _PCT_RE.search(text)
+        if not pm or ("progress" not in low and "|" not in text):
+            return None
+
+        percent = min(float(pm.group(1)), 100.0)
+        done = total = None
+        pos = _POS_RE.search(text[pm.end():])
+        if pos:
+            mult = SECTOR_SIZE if pos.group(1) else 1
+            done = int(pos.group(2), 0) * mult
+            total = int(pos.group(3), 0) * mult
+
+        now = self._clock()
+        if self._t0 is None or (done is not None and self._b0 is not None and done < self._b0):
+            self._t0, self._b0 = now, done
+
+        rate = None
+        rm = _RATE_RE.search(text)
+        if rm:
+            rate = float(rm.group(1)) * _UNITS[rm.group(2).lower()] / _UNITS["mb"]
+        elif done is not None and self._b0 is not None and now > self._t0:
+            rate = (done - self._b0) / (now - self._t0) / _UNITS["mb"]
+
+        eta = None
+        if rate and done is not None and total:
+            eta = max(total - done, 0) / (rate * _UNITS["mb"])
+        elif percent >= 100.0:
+            eta = 0.0
+
+        if percent >= 100.0:
+            self._t0 = self._b0 = None
+        return ProgressEvent(self.partition, done, total, percent, rate, eta, text)
+
+
+class LatestProgress:
+    """
+    Coalesces ProgressEvents from job threads for a UI that polls: update()
+    keeps only the latest event per partition, take() hands over (and
+    forgets) those that arrived since the last call, oldest partition first.
+    A tool redrawing its bar hundreds of times a second then costs the UI
+    one update per poll instead of one queued signal per redraw.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}
+
+    def update(self, ev: ProgressEvent) -> None:
+        with self._lock:
+            self._latest.pop(ev.partition, None)
+            self._latest[ev.partition] = ev
+
+    def take(self) -> list:
+        with self._lock:
+            out = list(self._latest.values())
+            self._latest.clear()
+        return out
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return "--:--"
+    m, s = divmod(int(seconds + 0.5), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
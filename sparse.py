@@ -0,0 +1,262 @@
+# sparse.py
+# Android sparse image (simg) parsing and streaming unsparse.
+
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from dataclasses import dataclass
+
+import fw_archive
+
+SPARSE_MAGIC = 0xED26FF3A
+FILE_HDR = struct.Struct("<I4H4I")   # magic, major, minor, file_hdr_sz, chunk_hdr_sz, blk_sz, total_blks, total_chunks, csum
+CHUNK_HDR = struct.Struct("<2H2I")   # type, reserved, chunk_sz (blocks), total_sz (bytes incl. header)
+
+CHUNK_RAW = 0xCAC1
+CHUNK_FILL = 0xCAC2
+CHUNK_DONT_CARE = 0xCAC3
+CHUNK_CRC32 = 0xCAC4
+
+OUT_CHUNK = 4 * 1024 * 1024
+
+
+class SparseError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Chunk:
+    type: int
+    out_block: int     # first output block
+    blocks: int
+    data_offset: int   # RAW: payload offset in the file; FILL: offset of the 4-byte pattern
+
+
+@dataclass(frozen=True)
+class SparseInfo:
+    path: str
+    block_size: int
+    total_blocks: int
+    chunks: tuple
+
+    @property
+    def expanded_size(self) -> int:
+        return self.block_size * self.total_blocks
+
+    @property
+    def data_blocks(self) -> int:
+        return sum(c.blocks for c in self.chunks if c.type in (CHUNK_RAW, CHUNK_FILL))
+
+    @property
+    def data_ratio(self) -> float:
+        """Share of the partition actually written (RAW + FILL blocks)."""
+        return self.data_blocks / self.total_blocks if self.total_blocks else 0.0
+
+
+def is_sparse(path) -> bool:
+    if fw_archive.is_member(path):
+        return fw_archive.member_info(path).get("sparse", False)
+    try:
+        with open(path, "rb") as f:
+            head = f.read(4)
+    except OSError:
+        return False
+    return len(head) == 4 and struct.unpack("<I", head)[0] == SPARSE_MAGIC
+
+
+def _parse_view(view, path="") -> SparseInfo:
+    if len(view) < FILE_HDR.size:
+        raise SparseError("file too small for a sparse header")
+    (magic, major, _minor, file_hdr_sz, chunk_hdr_sz,
+     blk_sz, total_blks, total_chunks, _csum) = FILE_HDR.unpack_from(view, 0)
+    if magic != SPARSE_MAGIC:
+        raise SparseError("not an Android sparse image")
+    if major != 1 or blk_sz == 0 or blk_sz % 4:
+        raise SparseError(f"unsupported sparse image (v{major}, block size {blk_sz})")
+
+    chunks = []
+    off = file_hdr_sz
+    out_block = 0
+    for i in range(total_chunks):
+        if off + CHUNK_HDR.size > len(view):
+            raise SparseError(f"truncated at chunk {i}")
+        ctype, _res, chunk_sz, total_sz = CHUNK_HDR.unpack_from(view, off)
+        data = off + chunk_hdr_sz
+        if ctype == CHUNK_RAW:
+            if total_sz - chunk_hdr_sz != chunk_sz * blk_sz:
+                raise SparseError(f"chunk {i}: RAW size mismatch")
+        elif ctype == CHUNK_FILL:
+            if total_sz - chunk_hdr_sz != 4:
+                raise SparseError(f"chunk {i}: bad FILL chunk")
+        elif ctype not in (CHUNK_DONT_CARE, CHUNK_CRC32):
+            raise SparseError(f"chunk {i}: unknown type 0x{ctype:04X}")
+        if off + total_sz > len(view):
+            raise SparseError(f"chunk {i}: runs past end of file")
+        if ctype != CHUNK_CRC32:
+            chunks.append(Chunk(ctype, out_block, chunk_sz, data))
+            out_block += chunk_sz
+        off += total_sz
+    if out_block != total_blks:
+        raise SparseError(f"chunks cover {out_block} blocks, header says {total_blks}")
+    return SparseInfo(str(path), blk_sz, total_blks, tuple(chunks))
+
+
+@contextlib.contextmanager
+def _mapped(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def parse(path) -> SparseInfo:
+    """Walk the header and chunk table through an mmap; no payload is read."""
+    with _mapped(path) as view:
+        return _parse_view(view, path)
+
+
+def iter_raw(path, chunk_size: int = OUT_CHUNK):
+    """Yield the expanded raw image as bytes-like pieces (RAW payloads are zero-copy slices)."""
+    with _mapped(path) as view:
+        info = _parse_view(view, path)
+        bs = info.block_size
+        zeros = bytes(min(chunk_size, OUT_CHUNK))
+        for c in info.chunks:
+            size = c.blocks * bs
+            if c.type == CHUNK_RAW:
+                for o in range(0, size, chunk_size):
+                    yield view[c.data_offset + o:c.data_offset + min(o + chunk_size, size)]
+            elif c.type == CHUNK_FILL:
+                unit = bytes(view[c.data_offset:c.data_offset + 4])
+                piece = unit * (min(size, chunk_size) // 4)
+                for o in range(0, size, len(piece)):
+                    yield piece[:min(len(piece), size - o)]
+            else:
+                for o in range(0, size, len(zeros)):
+                    yield zeros[:min(len(zeros), size - o)]
+
+
+def raw_size(path) -> int:
+    """Size of the image once unsparsed (the file size for raw images)."""
+    if fw_archive.is_member(path):
+        return fw_archive.member_info(path)["raw_size"]
+    return parse(path).expanded_size if is_sparse(path) else os.path.getsize(path)
+
+
+def raw_sha256(path) -> str:
+    """SHA-256 of the unsparsed image, i.e. of what a "tempfile" / "fifo" flash writes."""
+    h = hashlib.sha256()
+    with fw_archive.local_path(path, seekable=True) as local:
+        for piece in iter_raw(local):
+            h.update(piece)
+            del piece   # see write_raw
+    return h.hexdigest()
+
+
+def write_raw(path, out) -> int:
+    """Unsparse path into the binary file object out; returns bytes written."""
+    n = 0
+    for piece in iter_raw(path):
+        out.write(piece)
+        n += len(piece)
+        del piece   # a RAW slice still alive when iter_raw finishes keeps its mmap from closing
+    return n
+
+
+def flash_mode() -> str:
+    """
+    How a sparse image reaches the flashing tool (config key "sparse_mode"):
+      "passthrough" hand the sparse file to the tool unchanged (default)
+      "tempfile"    unsparse into a temp file first (full-size copy on disk)
+      "fifo"        stream the unsparsed bytes through a named pipe (POSIX)
+    mtkclient sizes its input with os.stat before writing and a FIFO
+    reports 0 bytes, so "fifo" only suits a tool build known to read the
+    pipe to EOF; check it against the mtkclient in use before enabling it.
+    """
+    import utils
+    mode = utils.load_config().get("sparse_mode")
+    if mode == "fifo" and hasattr(os, "mkfifo"):
+        return mode
+    return mode if mode == "tempfile" else "passthrough"
+
+
+@contextlib.contextmanager
+def piped(name, write, mode="fifo"):
+    """
+    Context manager yielding a path called name whose content is produced
+    by write(fileobj): streamed through a named pipe ("fifo") or written to
+    a temp file first ("tempfile").
+    """
+    with tempfile.TemporaryDirectory(prefix="phoenix_unsparse_") as td:
+        target = os.path.join(td, name)
+        if mode == "tempfile" or not hasattr(os, "mkfifo"):
+            with open(target, "wb") as out:
+                write(out)
+            yield target
+            return
+
+        os.mkfifo(target)
+        errors = []
+
+        def feed():
+            try:
+                with open(target, "wb") as out:
+                    write(out)
+            except BrokenPipeError:
+                pass  # reader went away (tool failed or was cancelled)
+            except Exception as e:
+                errors.append(e)
+
+        t = threading.Thread(target=feed, name="unsparse", daemon=True)
+        t.start()
+        try:
+            yield target
+        finally:
+            # if the tool never opened the pipe, open+close the read end so feed() can finish
+            if t.is_alive():
+                try:
+                    fd = os.open(target, os.O_RDONLY | os.O_NONBLOCK)
+                    os.close(fd)
+                except OSError:
+                    pass
+            t.join(5)
+        if errors:
+            raise errors[0]
+
+
+@contextlib.contextmanager
+def raw_image(path, mode: str | None = None):
+    """
+    Context manager yielding a path the flashing tool can read as a raw image.
+    Non-sparse files are yielded unchanged. The yielded name keeps the
+    image's basename so tool output ("Wrote super.img …") still matches.
+    Archive members are streamed out first (see fw_archive.local_path).
+    """
+    if fw_archive.is_member(path):
+        if not is_sparse(path):
+            with fw_archive.local_path(path) as src:
+                yield src
+            return
+        # unsparsing needs random access, so sparse members come from the local cache
+        with fw_archive.local_path(path, seekable=True) as local, raw_image(local, mode) as src:
+            yield src
+        return
+    if not is_sparse(path):
+        yield path
+        return
+    mode = mode or flash_mode()
+    if mode == "passthrough":
+        yield path
+        return
+    with piped(os.path.basename(path), lambda out: write_raw(path, out), mode) as target:
+        yield target
@@ -0,0 +1,74 @@
+# station.py
+# Station mode: several R1s on one hub, one job queue per device.
+
+import jobs
+import mtk_wrapper as mtk
+import utils
+from jobs import QUEUED, RUNNING, DONE, FAILED, CANCELLED  # noqa: F401  (re-exported for the UI)
+
+
+def bus_of(port: str) -> str:
+    """USB bus of a sysfs port path ("1-2.3" -> "1"); devices on one bus share its bandwidth."""
+    return port.split("-", 1)[0] if "-" in port else port
+
+
+class Station(jobs.JobEngine):
+    """
+    JobEngine keyed by USB port path with a global and per-USB-bus
+    concurrency cap. Every job's mtk calls are pinned to its device
+    (mtk_wrapper.target_device). Callbacks are invoked from job threads:
+        on_line(job, text, level), on_progress(job, event), on_state(job)
+
+    Pinning only works if mtk can be told which unit to open (see
+    utils.get_device_selector; selects_device overrides it, e.g. for
+    bench/fake_mtk.py, which reads $PHOENIX_DEVICE_PORT). Without that,
+    several mtk processes would race for whichever device mtk opens first,
+    so concurrency is held at 1.
+    """
+
+    def __init__(self, concurrency: int | None = None, per_bus: int | None = None,
+                 on_line=None, on_progress=None, on_state=None, log_dir=None, event_log=None,
+                 metrics=None, selects_device: bool | None = None):
+        if selects_device is None:
+            selects_device = utils.get_device_selector() is not None
+        self.selects_device = selects_device
+        cfg_total, cfg_bus = utils.get_station_limits()
+        super().__init__(
+            concurrency=concurrency or cfg_total,
+            per_group=per_bus or cfg_bus,
+            group_of=bus_of,
+            on_line=on_line,
+            on_state=on_state,
+            log_path=jobs.default_log_path(log_dir) if log_dir else None,
+            event_log=event_log,
+            metrics=metrics,
+        )
+        self.on_progress = on_progress
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    @concurrency.setter
+    def concurrency(self, value: int) -> None:
+        self._concurrency = value if self.selects_device else 1
+
+    @property
+    def per_bus(self) -> int:
+        return self.per_group
+
+    @per_bus.setter
+    def per_bus(self, value: int) -> None:
+        self.per_group = value
+
+    def submit_restore(self, device, plan, wipe=False, verify_after=False) -> jobs.Job:
+        def make_gen(job):
+            return mtk.restore_sequence(plan, wipe=wipe, verify_after=verify_after,
+                                        on_progress=lambda ev: self._progress(job, ev),
+                                        result=job.result)
+        return self.submit(device.port, "restore", make_gen, device=device)
+
+    def _progress(self, job, ev):
+        job.progress = ev
+        if self.on_progress:
+            self.on_progress(job, ev)
@@ -0,0 +1,229 @@
+# station_tab.py
+# "Station" tab: restore every connected R1 in parallel via station.Station.
+
+import os
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QCheckBox, QSpinBox,
+    QTableWidget, QTableWidgetItem, QPlainTextEdit, QHeaderView, QAbstractItemView, QMessageBox
+)
+from PySide6.QtCore import Signal, QObject, QTimer
+
+import events
+import metrics
+import station
+import utils
+
+COLUMNS = ["Port", "Mode", "Serial", "Status", "Progress", "Time", "Last output"]
+REFRESH_MS = 250
+
+
+class StationBus(QObject):
+    state = Signal(object)  # jobs.Job of the station (queued/running/done/failed/cancelled)
+
+
+class StationTab(QWidget):
+    """
+    One row per detected device. Job state changes arrive as signals; the
+    high-rate parts (progress, last line) are polled from the jobs on a timer.
+    """
+
+    def __init__(self, app, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self.bus = StationBus()
+        self.bus.state.connect(self._on_job_state)
+        self.station = station.Station(
+            on_line=self._on_line,
+            on_state=self.bus.state.emit,
+            log_dir=str(utils.runs_dir()),
+            event_log=events.get_log(),
+            metrics=metrics.get_store(),
+        )
+        self.devices = {}     # port -> UsbDevice
+        self.last_job = {}    # port -> its latest jobs.Job
+        self._detail_job = None
+        self._detail_count = 0   # job.line_count already in the detail pane
+
+        self.spin_conc = QSpinBox()
+        self.spin_conc.setRange(1, 16)
+        self.spin_conc.setValue(self.station.concurrency)
+        self.spin_conc.valueChanged.connect(self._set_concurrency)
+        self.spin_bus = QSpinBox()
+        self.spin_bus.setRange(1, 16)
+        self.spin_bus.setValue(self.station.per_bus)
+        self.spin_bus.valueChanged.connect(self._set_concurrency)
+
+        self.chk_auto = QCheckBox("Auto-restore on connect")
+        self.lbl_limit = QLabel()
+        self.lbl_limit.setWordWrap(True)
+        self.lbl_limit.setVisible(False)
+        if not self.station.selects_device:
+            # mtk would open whichever R1 it finds first, not the one the job is for
+            why = ("Devices are restored one at a time: mtk can't be told which R1 to open. "
+                   "Set device_select_args in phoenix_config.json to arguments that make it open one "
+                   "specific device to restore several in parallel.")
+            self.spin_conc.setRange(1, 1)
+            self.spin_conc.setToolTip(why)
+            self.spin_bus.setToolTip(why)
+            self.chk_auto.setEnabled(False)
+            self.chk_auto.setToolTip(why)
+            self.lbl_limit.setText("⚠ " + why)
+            self.lbl_limit.setStyleSheet("QLabel { color: #ffb347; }")
+            self.lbl_limit.setVisible(True)
+        self.btn_all = QPushButton("🔥 Restore all idle devices")
+        self.btn_all.clicked.connect(self._restore_all)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Parallel devices"))
+        top.addWidget(self.spin_conc)
+        top.addWidget(QLabel("per USB bus"))
+        top.addWidget(self.spin_bus)
+        top.addStretch(1)
+        top.addWidget(self.chk_auto)
+        top.addWidget(self.btn_all)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(len(COLUMNS) - 1, QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.itemSelectionChanged.connect(self._refresh_detail)
+
+        self.detail = QPlainTextEdit()
+        self.detail.setReadOnly(True)
+        self.detail.setMaximumBlockCount(2000)
+        self.detail.setPlaceholderText("Select a device to see its log")
+
+        lay = QVBoxLayout()
+        lay.addLayout(top)
+        lay.addWidget(self.lbl_limit)
+        lay.addWidget(self.table, 2)
+        lay.addWidget(self.detail, 1)
+        self.setLayout(lay)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_MS)
+        self._timer.timeout.connect(self._refresh_rows)
+        self._timer.start()
+
+    # ---- devices ----
+    def set_devices(self, devices):
+        """Called with the monitor's current device list whenever it changes."""
+        new = {d.port: d for d in devices if d.mode != "PnP"}
+        added = [d for p, d in new.items() if p not in self.devices]
+        self.devices = new
+        self._rebuild_rows()
+        if self.chk_auto.isChecked() and self.station.selects_device:
+            for d in added:
+                self._restore(d)
+
+    def _rebuild_rows(self):
+        ports = sorted(set(self.devices) | set(self.last_job))
+        self.table.setRowCount(len(ports))
+        for row, port in enumerate(ports):
+            d = self.devices.get(port) or self.last_job[port].device
+            for col, text in enumerate([port, d.mode if port in self.devices else "gone", d.serial]):
+                self.table.setItem(row, col, QTableWidgetItem(text))
+        self._refresh_rows()
+
+    # ---- actions ----
+    def _set_concurrency(self, *_):
+        self.station.concurrency = self.spin_conc.value()
+        self.station.per_bus = self.spin_bus.value()
+        cfg = utils.load_config()
+        if self.station.selects_device:   # otherwise the spin box is pinned at 1: keep the saved value
+            cfg["station_concurrency"] = self.spin_conc.value()
+        cfg["station_per_bus"] = self.station.per_bus
+        utils.save_config(cfg)
+
+    def _plan(self):
+        return utils.restore_plan(self.app.paths, self.app.chk_threefile.isChecked())
+
+    def _restore(self, device):
+        if self.station.busy(device.port):
+            return
+        if self.app.jobs.busy():
+            self.app._append_line(f"Station: {device.port} skipped — a single-device operation is running.", "warn")
+            return
+        plan = self._plan()
+        if not plan:
+            self.app._append_line("Station: no firmware images found.", "err")
+            return
+        self.app._ensure_mtk_on_path()
+        job = self.station.submit_restore(device, plan, wipe=self.app.chk_wipe.isChecked(),
+                                          verify_after=self.app.chk_verify.isChecked())
+        self.last_job[device.port] = job
+
+    def _restore_all(self):
+        if not self.devices:
+            QMessageBox.information(self, "Station", "No MTK devices detected.")
+            return
+        if len(self.devices) > 1 and not self.station.selects_device:
+            QMessageBox.warning(
+                self, "Station",
+                f"{len(self.devices)} devices are connected, but mtk can't be told which one to open "
+                "(device_select_args is not set), so a job could flash a different unit than its row. "
+                "Connect one device at a time, or configure device_select_args."
+            )
+            return
+        if self.app.chk_wipe.isChecked():
+            confirm = QMessageBox.question(
+                self, "Confirm wipe", f"This will ERASE userdata on {len(self.devices)} device(s). Continue?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if confirm != QMessageBox.Yes:
+                return
+        for d in self.devices.values():
+            self._restore(d)
+
+    # ---- updates ----
+    def _on_line(self, job, text, level):
+        # job threads: the main log gets the line through the batched transport
+        self.app.log_transport.push(f"[{job.device_id}] {text}", level)
+
+    def _on_job_state(self, job):
+        self.last_job[job.device_id] = job
+        if job.status in (station.DONE, station.FAILED):
+            lvl = "ok" if job.status == station.DONE else "err"
+            self.app._append_line(f"[{job.device_id}] {job.name} {job.status} in {job.elapsed:.0f} s"
+                                  + (f" — log: {os.path.basename(job.log_path)}" if job.log_path else ""), lvl)
+        self._rebuild_rows()
+        self.app._update_buttons()
+
+    def _refresh_rows(self):
+        for row in range(self.table.rowCount()):
+            item = self.table.item(row, 0)
+            job = self.last_job.get(item.text()) if item else None
+            if not job:
+                continue
+            ev = job.progress
+            prog = f"{ev.partition or ''} {ev.percent:.0f}%" if ev and job.status == station.RUNNING else ""
+            if ev and ev.rate and job.status == station.RUNNING:
+                prog += f" · {ev.rate:.1f} MB/s"
+            cells = [job.status, prog, f"{job.elapsed:.0f} s", job.lines[-1] if job.lines else ""]
+            for col, text in enumerate(cells, start=3):
+                cur = self.table.item(row, col)
+                if cur is None or cur.text() != text:
+                    self.table.setItem(row, col, QTableWidgetItem(text))
+        self._refresh_detail()
+
+    def _refresh_detail(self):
+        rows = self.table.selectionModel().selectedRows() if self.table.selectionModel() else []
+        if not rows:
+            return
+        item = self.table.item(rows[0].row(), 0)
+        job = self.last_job.get(item.text()) if item else None
+        if job is not self._detail_job:
+            self._detail_job = job
+            self._detail_count = 0
+            self.detail.clear()
+        if job is None or job.line_count == self._detail_count:
+            return
+        # append only what's new (the pane keeps the last 2000 blocks, like job.lines)
+        self._detail_count, lines = job.lines_since(self._detail_count)
+        bar = self.detail.verticalScrollBar()
+        at_end = bar.value() == bar.maximum()
+        self.detail.appendPlainText("\n".join(lines))
+        if at_end:
+            bar.setValue(bar.maximum())
@@ -0,0 +1,53 @@
+# tests/conftest.py
+# The app's modules are flat at the repo root; bench/ holds the fake mtk.
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import fake_mtk  # noqa: E402
+import utils  # noqa: E402
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """Point the app directory (config, journals, logs, ...) at a temp folder."""
+    monkeypatch.setattr(utils, "_app_dir", lambda: tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_mtk_env(app_dir, tmp_path, monkeypatch):
+    """bench/fake_mtk.py as mtk, remembering writes per device; returns a function to set its profiles."""
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    monkeypatch.setenv("PATH", os.environ.get("PATH", ""))   # restored after fake_mtk.install prepends
+    fake_mtk.install(str(bindir))
+    monkeypatch.setenv("FAKE_MTK_STATE", str(tmp_path / "state"))
+    monkeypatch.setenv("FAKE_MTK_CONFIG", str(tmp_path / "fake_mtk.json"))
+    utils.save_config({"job_retries": 0})
+
+    def profiles(**per_port):
+        cfg = {"default": {"handshake_s": 0.05, "mbps": 2000}}
+        cfg.update({port.replace("_", "-"): p for port, p in per_port.items()})
+        (tmp_path / "fake_mtk.json").write_text(json.dumps(cfg))
+
+    profiles()
+    return profiles
+
+
+@pytest.fixture
+def plan(tmp_path):
+    """vbmeta / boot / super images of random data, as [(partition, path), ...]."""
+    out = []
+    for part, size in (("vbmeta", 4096), ("boot", 65536), ("super", 131072)):
+        p = tmp_path / f"{part}.img"
+        p.write_bytes(os.urandom(size))
+        out.append((part, str(p)))
+    return out
@@ -0,0 +1,118 @@
+import io
+import os
+import random
+
+import pytest
+
+import delta
+import make_fw_tree
+import sparse
+
+BS = 4096
+
+
+def test_no_change_no_extents():
+    blocks = ["a", "b", "c"]
+    assert delta.diff_extents(blocks, blocks, 3 * BS, BS) == []
+
+
+def test_close_changes_merge_and_far_ones_dont():
+    image = [str(i) for i in range(20)]
+    device = list(image)
+    for i in (2, 4, 15):
+        device[i] = "old"
+    assert delta.diff_extents(image, device, 20 * BS, BS, merge_gap=2) == [(2 * BS, 3 * BS), (15 * BS, BS)]
+    assert delta.diff_extents(image, device, 20 * BS, BS, merge_gap=0) == [
+        (2 * BS, BS), (4 * BS, BS), (15 * BS, BS)]
+
+
+def test_last_extent_is_clipped_to_the_image():
+    image, device = ["a", "b", "c"], ["a", "b", "x"]
+    assert delta.diff_extents(image, device, 2 * BS + 100, BS) == [(2 * BS, 100)]
+
+
+def test_blocks_past_the_device_map_count_as_changed():
+    assert delta.diff_extents(["a", "b", "c"], ["a"], 3 * BS, BS) == [(BS, 2 * BS)]
+
+
+def test_hash_blocks_matches_per_block_digests():
+    data = os.urandom(3 * BS + 10)
+    got = delta.hash_blocks(io.BytesIO(data), len(data) - 5, BS)
+    assert got == [delta._block_digest(data[i:min(i + BS, len(data) - 5)])
+                   for i in range(0, len(data) - 5, BS)]
+
+
+@pytest.fixture
+def image(tmp_path):
+    p = tmp_path / "boot.img"
+    p.write_bytes(os.urandom(32 * BS))
+    return str(p)
+
+
+def test_plan_without_device_state_is_a_full_write(image):
+    p = delta.plan("boot", image, None, block_size=BS)
+    assert p.full_write and p.reason == "device state unknown"
+    assert p.extents == ((0, 32 * BS),) and p.changed_bytes == 32 * BS
+
+
+def test_plan_counts_changed_bytes(image):
+    blocks = delta.image_block_map(image, BS)
+    device = list(blocks)
+    device[3] = device[20] = "old"
+    p = delta.plan("boot", image, device, blocks, block_size=BS)
+    assert not p.full_write
+    assert p.extents == ((3 * BS, BS), (20 * BS, BS)) and p.changed_bytes == 2 * BS
+
+
+def test_plan_falls_back_when_too_much_changed(image):
+    blocks = delta.image_block_map(image, BS)
+    scattered = [h if i % 6 else "old" for i, h in enumerate(blocks)]   # 6 extents, not mergeable
+    p = delta.plan("boot", image, scattered, blocks, block_size=BS)
+    assert not p.full_write and len(p.extents) == 6
+    most = ["old"] * 24 + blocks[24:]
+    p = delta.plan("boot", image, most, blocks, block_size=BS)
+    assert p.full_write and p.reason == "75% of image changed"
+
+
+def test_too_many_extents(image, monkeypatch):
+    monkeypatch.setattr(delta, "MAX_EXTENTS", 5)
+    blocks = delta.image_block_map(image, BS)
+    device = [h if i % 6 else "old" for i, h in enumerate(blocks)]
+    p = delta.plan("boot", image, device, blocks, block_size=BS)
+    assert p.full_write and p.reason == "6 extents (> 5)"
+
+
+def test_extract_extents_reads_sparse_images_once(tmp_path):
+    p = str(tmp_path / "super.img")
+    make_fw_tree.write_simg(p, 64 * BS, random.Random(3), run_blocks=4)
+    raw = io.BytesIO()
+    sparse.write_raw(p, raw)
+    raw = raw.getvalue()
+    extents = ((0, 3 * BS), (5 * BS, 100), (40 * BS, 20 * BS))
+    paths = [str(tmp_path / f"chunk{i}") for i in range(len(extents))]
+    assert list(delta._extract_extents(p, extents, paths, piece=BS)) == [0, 1, 2]
+    for (off, n), path in zip(extents, paths):
+        with open(path, "rb") as f:
+            assert f.read() == raw[off:off + n]
+
+
+def test_dry_run_reports_the_plan(app_dir, tmp_path):
+    image = tmp_path / "vendor.img"
+    image.write_bytes(os.urandom(4 * delta.BLOCK_SIZE + 100))
+    blocks = delta.image_block_map(str(image))
+    delta.save_device_map("SER1", "vendor", blocks[:2] + ["stale"] + blocks[3:])
+    res = {}
+    lines = list(delta.delta_flash("vendor", str(image), device_id="SER1", dry_run=True, result=res))
+    p = res["plan"]
+    assert not p.full_write and res["written"] == 0
+    assert p.extents == ((2 * delta.BLOCK_SIZE, delta.BLOCK_SIZE),)
+    assert p.changed_bytes == delta.BLOCK_SIZE and p.image_size == 4 * delta.BLOCK_SIZE + 100
+    assert "[vendor] delta: 1.0 MiB in 1 extent(s) of 4.0 MiB" in lines
+    assert lines[-1] == "[vendor] dry run — nothing written"
+
+
+def test_dry_run_without_a_serial_has_no_cached_map(app_dir, image):
+    res = {}
+    lines = list(delta.delta_flash("boot", image, device_id="", readback=False, dry_run=True, result=res))
+    assert res["plan"].reason == "device state unknown"
+    assert any("full write" in line for line in lines)
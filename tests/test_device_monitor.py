@@ -0,0 +1,91 @@
+import time
+
+import device_monitor
+from device_monitor import DeviceMonitor, SysfsBackend, UsbDevice
+
+
+def add_device(root, name, vid="0e8d", pid="2000", serial=None):
+    d = root / name
+    d.mkdir()
+    (d / "idVendor").write_text(vid + "\n")
+    (d / "idProduct").write_text(pid + "\n")
+    if serial is not None:
+        (d / "serial").write_text(serial + "\n")
+    return d
+
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_sysfs_scan_finds_mtk_download_modes(tmp_path):
+    add_device(tmp_path, "1-2", pid="2000", serial="R1SERIAL")
+    add_device(tmp_path, "1-3", pid="0003")
+    add_device(tmp_path, "1-4", vid="18d1", pid="4ee7")   # not MediaTek
+    add_device(tmp_path, "1-5", pid="2008")               # MediaTek, not a download mode
+    (tmp_path / "1-2:1.0").mkdir()                         # interface, no idVendor
+    assert SysfsBackend(str(tmp_path)).scan() == [
+        UsbDevice(port="1-2", mode="Preloader", pid="2000", serial="R1SERIAL"),
+        UsbDevice(port="1-3", mode="BROM", pid="0003"),
+    ]
+
+
+def test_sysfs_scan_without_tree(tmp_path):
+    assert SysfsBackend(str(tmp_path / "missing")).scan() == []
+
+
+def test_listeners_only_hear_changes(tmp_path):
+    mon = DeviceMonitor(SysfsBackend(str(tmp_path)), interval=60)
+    calls = []
+    mon.add_listener(lambda old, new: calls.append((old.devices, new.devices)))
+
+    assert mon.poll_once().detail == "No MTK device found"
+    assert calls == [((), ())]          # the first scan is always reported
+    mon.poll_once()
+    assert len(calls) == 1
+
+    add_device(tmp_path, "1-2", pid="2001")
+    state = mon.poll_once()
+    assert state.connected and state.detail == "DA @ 1-2"
+    assert calls[-1] == ((), state.devices)
+
+    (tmp_path / "1-2" / "idProduct").write_text("2000\n")
+    mon.poll_once()
+    assert calls[-1][1][0].mode == "Preloader"
+    assert len(calls) == 3
+
+
+def test_failing_listener_doesnt_stop_others(tmp_path):
+    mon = DeviceMonitor(SysfsBackend(str(tmp_path)), interval=60)
+    seen = []
+    mon.add_listener(lambda old, new: 1 / 0)
+    mon.add_listener(lambda old, new: seen.append(new))
+    mon.poll_once()
+    assert len(seen) == 1
+
+
+def test_thread_rescans_on_request(tmp_path):
+    mon = DeviceMonitor(SysfsBackend(str(tmp_path)), interval=60)
+    mon.start()
+    try:
+        assert wait_for(lambda: mon.state.scanned)
+        assert not mon.state.connected
+        add_device(tmp_path, "3-1", serial="X")
+        mon.rescan()   # no waiting out the 60 s interval
+        assert wait_for(lambda: mon.state.connected)
+        assert mon.state.devices[0].serial == "X"
+    finally:
+        mon.stop()
+    assert not mon.running
+
+
+def test_describe():
+    assert device_monitor.describe([]) == "No MTK device found"
+    assert device_monitor.describe([UsbDevice(port="pnp", mode="PnP")]) == "Possible device detected via PnP scan"
+    assert device_monitor.describe([UsbDevice(port="1-1", mode="BROM"),
+                                    UsbDevice(port="2-1", mode="DA")]) == "BROM @ 1-1, DA @ 2-1"
@@ -0,0 +1,89 @@
+import os
+import random
+
+import pytest
+
+import make_fw_tree
+import mtk_wrapper as mtk
+from device_monitor import UsbDevice
+
+PRINTGPT = """\
+MTK Flash/Exploitation Client V1.6.3
+Port - Device detected :)
+Preloader - 	CPU:			MT6768(Helio P65/G85 k68v1)
+
+GPT Table:
+-------------
+vbmeta:              Offset 0x0000000000100000, Length 0x0000000000100000, Flags 0x00000000, UUID 1, Type EFI_BASIC_DATA
+boot_a:              Offset 0x0000000000200000, Length 0x0000000004000000, Flags 0x00000000, UUID 2, Type EFI_BASIC_DATA
+super:               Offset 0x0000000004200000, Length 0x0000000010000000, Flags 0x00000000, UUID 3, Type EFI_BASIC_DATA
+Total disk size:0x0000001d1f000000, sectors:0x000000000e8f8000
+"""
+MiB = 2**20
+
+
+def test_parse_gpt_lines_skips_noise():
+    assert mtk.parse_gpt_lines(PRINTGPT.splitlines()) == {
+        "vbmeta": (MiB, MiB), "boot_a": (2 * MiB, 64 * MiB), "super": (66 * MiB, 256 * MiB)}
+    assert mtk.parse_gpt_lines(["", "Error: no device"]) == {}
+
+
+def image(tmp_path, name, size):
+    p = tmp_path / name
+    with open(p, "wb") as f:
+        f.truncate(size)
+    return str(p)
+
+
+def test_check_plan_ok(tmp_path):
+    table = {"vbmeta": (0, MiB), "boot": (MiB, 4 * MiB)}
+    plan = [("vbmeta", image(tmp_path, "vbmeta.img", MiB)), ("boot", image(tmp_path, "boot.img", 1000))]
+    assert mtk.check_plan(plan, table) == (plan, [], [])
+
+
+def test_check_plan_problems(tmp_path):
+    table = {"boot": (0, MiB)}
+    plan = [("boot", image(tmp_path, "boot.img", MiB + 10)), ("dtbo", image(tmp_path, "dtbo.img", 10)),
+            ("boot", str(tmp_path / "missing.img"))]
+    out, problems, notes = mtk.check_plan(plan, table)
+    assert out == plan and notes == []
+    assert problems[0] == "[boot] boot.img is 10 bytes larger than the partition (1.0 MiB)"
+    assert problems[1] == "[dtbo] no such partition on the device"
+    assert problems[2].startswith("[boot] can't size missing.img:")
+
+
+@pytest.mark.parametrize("have, want", [("system", "super"), ("super", "system")])
+def test_super_and_system_go_where_the_device_has_them(tmp_path, have, want):
+    img = image(tmp_path, f"{want}.img", 10)
+    out, problems, notes = mtk.check_plan([(want, img)], {have: (0, MiB)})
+    assert out == [(have, img)] and problems == []
+    assert notes == [f"[{have}] the device has {have}, not {want}: flashing {want}.img there"]
+
+
+def test_sparse_images_are_checked_at_their_raw_size(tmp_path):
+    p = str(tmp_path / "super.img")
+    make_fw_tree.write_simg(p, 4 * MiB, random.Random(1), data_ratio=0.1)
+    assert os.path.getsize(p) < 2 * MiB
+    _, problems, _ = mtk.check_plan([("super", p)], {"super": (0, 2 * MiB)})
+    assert problems == ["[super] super.img is 2,097,152 bytes larger than the partition (2.0 MiB)"]
+
+
+@pytest.fixture
+def layouts():
+    mtk.forget_layout()
+    yield
+    mtk.forget_layout()
+
+
+def test_preflight_reads_the_table_once_per_device(fake_mtk_env, plan, layouts):
+    with mtk.target_device(UsbDevice(port="1-1", mode="Preloader", serial="S1")):
+        res = {}
+        lines = list(mtk.preflight(plan, result=res))
+        assert res["ok"] and res["plan"] == plan
+        assert lines[-1] == "Preflight: 3 image(s) fit the partition table."
+        lines = list(mtk.preflight(plan, result=res))
+        assert lines == ["Preflight: 3 image(s) fit the partition table (cached)."]
+        mtk.forget_layout("S1")
+        lay = {}
+        list(mtk.partition_layout(result=lay))
+        assert not lay["cached"] and lay["table"]["boot"] == (0x200000, 0x4000000)
@@ -0,0 +1,101 @@
+import pytest
+
+import journal
+import mtk_wrapper as mtk
+from device_monitor import UsbDevice
+
+
+@pytest.fixture
+def half_done(app_dir, plan):
+    """make(device_id): the journal of a restore of plan that died after vbmeta and boot."""
+    def make(device_id):
+        jn = journal.RestoreJournal(device_id)
+        jn.start(plan)
+        for part, img in plan[:2]:
+            jn.record(part, journal.image_sha(img), image=img)
+        return jn
+    return make
+
+
+def test_resumable_needs_the_same_image(half_done, plan, tmp_path):
+    jn = half_done("S1")
+    assert jn.unfinished
+    assert journal.RestoreJournal("S1").resumable(plan) == ["vbmeta", "boot"]
+    other = tmp_path / "boot2.img"
+    other.write_bytes(b"another boot image")
+    assert jn.resumable([plan[0], ("boot", str(other)), plan[2]]) == ["vbmeta"]
+    assert journal.RestoreJournal("S2").resumable(plan) == []
+    assert "restore of S1 stopped at" in jn.describe() and jn.describe().endswith("after: vbmeta, boot")
+
+
+def test_finished_or_reset_journal_starts_over(half_done, plan):
+    jn = half_done("S1")
+    jn.finish()
+    assert journal.RestoreJournal("S1").resumable(plan) == []
+    jn.start(plan)
+    assert jn.data["steps"] == {}
+    half_done("S1").reset()
+    assert journal.RestoreJournal("S1").resumable(plan) == []
+
+
+def test_corrupt_journal_reads_as_finished(app_dir):
+    jn = journal.RestoreJournal("S1")
+    jn.path.write_text("{not json")
+    assert not journal.RestoreJournal("S1").unfinished
+
+
+def restore(device, plan, resume="auto"):
+    res = {}
+    with mtk.target_device(device):
+        lines = list(mtk.restore_sequence(plan, result=res, resume=resume, check=False))
+    return res, lines
+
+
+SERIAL = UsbDevice(port="1-1", mode="Preloader", serial="S1")
+NO_SERIAL = UsbDevice(port="1-1", mode="Preloader")
+
+
+def test_auto_resume_skips_with_a_serial(fake_mtk_env, half_done, plan, tmp_path):
+    half_done("S1")
+    res, _ = restore(SERIAL, plan)
+    assert res["ok"] and res["skipped"] == ["vbmeta", "boot"]
+    assert not (tmp_path / "state" / "1-1" / "boot.img").exists()
+    assert (tmp_path / "state" / "1-1" / "super.img").exists()
+    assert not journal.RestoreJournal("S1").unfinished
+
+
+def test_auto_resume_starts_over_without_a_serial(fake_mtk_env, half_done, plan, tmp_path):
+    half_done("1-1")
+    res, lines = restore(NO_SERIAL, plan)
+    assert res["ok"] and res["skipped"] == []
+    assert any("no USB serial" in line for line in lines)
+    assert (tmp_path / "state" / "1-1" / "boot.img").exists()
+
+
+def test_explicit_resume_trusts_a_port_journal(fake_mtk_env, half_done, plan):
+    half_done("1-1")
+    res, _ = restore(NO_SERIAL, plan, resume=True)
+    assert res["skipped"] == ["vbmeta", "boot"]
+
+
+@pytest.mark.parametrize("device, trusted", [(SERIAL, True), (NO_SERIAL, False)])
+def test_resume_callback_gets_the_trust_flag(fake_mtk_env, half_done, plan, device, trusted):
+    half_done(mtk.job_device_id(device))
+    asked = []
+
+    def ask(jn, parts, trusted):
+        asked.append((parts, trusted))
+        return False
+
+    res, lines = restore(device, plan, resume=ask)
+    assert asked == [(["vbmeta", "boot"], trusted)]
+    assert res["ok"] and res["skipped"] == []
+    assert "Full restore: ignoring the unfinished journal." in lines
+
+
+def test_resume_callback_can_cancel(fake_mtk_env, half_done, plan, tmp_path):
+    half_done("S1")
+    res, _ = restore(SERIAL, plan, resume=lambda jn, parts, trusted: None)
+    assert res == {"ok": False, "cancelled": True, "skipped": []}
+    assert not (tmp_path / "state" / "1-1").exists()
+    assert journal.RestoreJournal("S1").unfinished
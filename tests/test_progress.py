@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+import progress
+
+MB = 2**20
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_mtkclient_bar_with_sectors_and_rate():
+    p = progress.ProgressParser("boot")
+    ev = p.feed("Progress: |█████-----| 50.0% Write (Sector 0x800 of 0x1000, ) 2.00 MB/s")
+    assert (ev.partition, ev.percent, ev.done, ev.total) == ("boot", 50.0, 0x800 * 512, 0x1000 * 512)
+    assert ev.rate == 2.0
+    assert ev.eta == pytest.approx(0x800 * 512 / (2 * MB))
+    assert not ev.finished
+
+
+def test_plain_lines_are_not_progress():
+    p = progress.ProgressParser()
+    assert p.feed("Writing boot to 0x200000 …") is None
+    assert p.feed("battery at 45%") is None   # a percentage, but no bar
+
+
+def test_percent_only():
+    ev = progress.ProgressParser().feed("Progress: 12.5%")
+    assert (ev.percent, ev.done, ev.total, ev.rate, ev.eta) == (12.5, None, None, None, None)
+
+
+def test_rate_from_the_clock_when_not_printed():
+    clock = Clock()
+    p = progress.ProgressParser(clock=clock)
+    assert p.feed("Progress: |--| 0% 0/4194304").rate is None
+    clock.now = 2.0
+    ev = p.feed("Progress: |#-| 50% 2097152/4194304")
+    assert ev.done == 2 * MB and ev.rate == pytest.approx(1.0) and ev.eta == pytest.approx(2.0)
+
+
+def test_finishing_resets_the_rate_window():
+    clock = Clock()
+    p = progress.ProgressParser(clock=clock)
+    p.feed("Progress: |--| 0% 0/1048576")
+    clock.now = 1.0
+    ev = p.feed("Progress: |##| 100% 1048576/1048576")
+    assert ev.finished and ev.eta == 0.0
+    clock.now = 5.0
+    p.feed("Progress: |--| 0% 0/1048576")      # next partition: timed from here, not from 0
+    clock.now = 6.0
+    assert p.feed("Progress: |#-| 50% 524288/1048576").rate == pytest.approx(0.5)
+
+
+def test_splitter_handles_cr_lf_across_chunks():
+    s = progress.RecordSplitter()
+    assert s.feed(b"10%\r20%\rdone\r") == [("10%", "\r"), ("20%", "\r")]
+    assert s.feed(b"\nnext") == [("done", "\n")]
+    assert s.flush() == [("next", "")]
+    assert s.flush() == []
+    assert s.feed(b"bar\r") == [] and s.flush() == [("bar", "\r")]
+
+
+def test_iter_records():
+    stream = io.BytesIO(b"a\nb\r\nc\rd")
+    assert list(progress.iter_records(stream, chunk_size=2)) == [("a", "\n"), ("b", "\n"), ("c", "\r"), ("d", "")]
+
+
+def test_latest_progress_keeps_the_last_event_per_partition():
+    latest = progress.LatestProgress()
+    for part, pct in (("boot", 10), ("super", 5), ("boot", 20), ("boot", 30)):
+        latest.update(progress.ProgressEvent(part, None, None, pct, None, None))
+    assert [(ev.partition, ev.percent) for ev in latest.take()] == [("super", 5), ("boot", 30)]
+    assert latest.take() == []
+
+
+def test_format_eta():
+    assert progress.format_eta(None) == "--:--"
+    assert progress.format_eta(65.4) == "1:05"
+    assert progress.format_eta(3725) == "1:02:05"
@@ -0,0 +1,126 @@
+import hashlib
+import os
+
+import pytest
+
+import sparse
+import utils
+
+BS = 4096
+
+
+def write_simg(path, chunks, total_blocks=None):
+    """
+    Sparse image from (kind, arg) chunks: ("raw", data), ("fill", (pattern, blocks)),
+    ("skip", blocks) or ("crc", None). Returns the expanded bytes.
+    """
+    body, raw, blocks = b"", b"", 0
+    for kind, arg in chunks:
+        if kind == "raw":
+            n = len(arg) // BS
+            body += sparse.CHUNK_HDR.pack(sparse.CHUNK_RAW, 0, n, sparse.CHUNK_HDR.size + len(arg)) + arg
+            raw += arg
+        elif kind == "fill":
+            pattern, n = arg
+            body += sparse.CHUNK_HDR.pack(sparse.CHUNK_FILL, 0, n, sparse.CHUNK_HDR.size + 4) + pattern
+            raw += pattern * (n * BS // 4)
+        elif kind == "skip":
+            n = arg
+            body += sparse.CHUNK_HDR.pack(sparse.CHUNK_DONT_CARE, 0, n, sparse.CHUNK_HDR.size)
+            raw += bytes(n * BS)
+        else:
+            n = 0
+            body += sparse.CHUNK_HDR.pack(sparse.CHUNK_CRC32, 0, 0, sparse.CHUNK_HDR.size + 4) + b"\0\0\0\0"
+        blocks += n
+    head = sparse.FILE_HDR.pack(sparse.SPARSE_MAGIC, 1, 0, sparse.FILE_HDR.size, sparse.CHUNK_HDR.size,
+                                BS, blocks if total_blocks is None else total_blocks, len(chunks), 0)
+    with open(path, "wb") as f:
+        f.write(head + body)
+    return raw
+
+
+@pytest.fixture
+def simg(tmp_path):
+    data = os.urandom(3 * BS)
+    p = tmp_path / "super.img"
+    raw = write_simg(p, [("raw", data), ("skip", 5), ("fill", (b"\xde\xad\xbe\xef", 2)), ("crc", None),
+                         ("raw", data[:BS])])
+    return str(p), raw
+
+
+def test_parse_chunk_table(simg):
+    path, raw = simg
+    info = sparse.parse(path)
+    assert info.block_size == BS and info.total_blocks == 11
+    assert info.expanded_size == len(raw) == sparse.raw_size(path)
+    assert [(c.type, c.out_block, c.blocks) for c in info.chunks] == [
+        (sparse.CHUNK_RAW, 0, 3), (sparse.CHUNK_DONT_CARE, 3, 5), (sparse.CHUNK_FILL, 8, 2),
+        (sparse.CHUNK_RAW, 10, 1)]   # the CRC32 chunk covers no blocks
+    assert info.data_blocks == 6
+    assert info.data_ratio == pytest.approx(6 / 11)
+
+
+def test_expand_and_hash(simg, tmp_path):
+    path, raw = simg
+    assert sparse.is_sparse(path)
+    assert sparse.raw_sha256(path) == hashlib.sha256(raw).hexdigest()
+    out = tmp_path / "out.img"
+    with open(out, "wb") as f:
+        assert sparse.write_raw(path, f) == len(raw)
+    assert out.read_bytes() == raw
+
+
+def test_plain_file_is_not_sparse(tmp_path):
+    p = tmp_path / "boot.img"
+    p.write_bytes(os.urandom(5000))
+    assert not sparse.is_sparse(str(p))
+    assert sparse.raw_size(str(p)) == 5000
+
+
+@pytest.mark.parametrize("mangle, error", [
+    (lambda b: b"\0\0\0\0" + b[4:], "not an Android sparse image"),
+    (lambda b: b[:-100], "runs past end of file"),
+    (lambda b: b[:sparse.FILE_HDR.size + 4], "truncated at chunk 0"),
+])
+def test_corrupt_images_are_rejected(tmp_path, mangle, error):
+    p = tmp_path / "bad.img"
+    write_simg(p, [("raw", os.urandom(2 * BS)), ("skip", 1)])
+    p.write_bytes(mangle(p.read_bytes()))
+    with pytest.raises(sparse.SparseError, match=error):
+        sparse.parse(str(p))
+
+
+def test_header_block_count_must_match_chunks(tmp_path):
+    p = tmp_path / "bad.img"
+    write_simg(p, [("skip", 4)], total_blocks=5)
+    with pytest.raises(sparse.SparseError, match="chunks cover 4 blocks"):
+        sparse.parse(str(p))
+
+
+def test_raw_chunk_size_mismatch(tmp_path):
+    p = tmp_path / "bad.img"
+    write_simg(p, [("raw", os.urandom(BS))])
+    data = bytearray(p.read_bytes())
+    sparse.CHUNK_HDR.pack_into(data, sparse.FILE_HDR.size, sparse.CHUNK_RAW, 0, 2, sparse.CHUNK_HDR.size + BS)
+    p.write_bytes(bytes(data))
+    with pytest.raises(sparse.SparseError, match="RAW size mismatch"):
+        sparse.parse(str(p))
+
+
+def test_flash_mode_defaults_to_passthrough(app_dir):
+    assert sparse.flash_mode() == "passthrough"
+    utils.save_config({"sparse_mode": "tempfile"})
+    assert sparse.flash_mode() == "tempfile"
+    utils.save_config({"sparse_mode": "bogus"})
+    assert sparse.flash_mode() == "passthrough"
+
+
+def test_raw_image_modes(simg):
+    path, raw = simg
+    with sparse.raw_image(path, "passthrough") as src:
+        assert src == path
+    with sparse.raw_image(path, "tempfile") as src:
+        assert os.path.basename(src) == "super.img" and src != path
+        with open(src, "rb") as f:
+            assert f.read() == raw
+    assert not os.path.exists(src)
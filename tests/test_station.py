@@ -0,0 +1,63 @@
+import threading
+
+import station
+import utils
+from device_monitor import UsbDevice
+
+DEVICES = [UsbDevice(port="1-1", mode="Preloader", serial="SIM000"),
+           UsbDevice(port="1-2", mode="Preloader", serial="SIM001"),
+           UsbDevice(port="2-1", mode="Preloader", serial="SIM002")]
+
+
+def test_bus_of():
+    assert station.bus_of("1-2.3") == "1"
+    assert station.bus_of("3-1") == "3"
+    assert station.bus_of("pnp") == "pnp"
+
+
+def test_concurrency_held_at_one_without_selector(app_dir):
+    st = station.Station(concurrency=4, selects_device=False)
+    assert st.concurrency == 1
+    st.concurrency = 3
+    assert st.concurrency == 1
+    assert station.Station(concurrency=4, selects_device=True).concurrency == 4
+
+
+def test_selector_comes_from_config(app_dir):
+    assert not station.Station(concurrency=4).selects_device
+    utils.save_config({"device_select_args": ["--serial", "{serial}"]})
+    st = station.Station(concurrency=4)
+    assert st.selects_device and st.concurrency == 4
+    utils.save_config({"device_select_args": ["--verbose"]})   # can't pick a device
+    assert station.Station(concurrency=4).concurrency == 1
+
+
+def test_jobs_are_pinned_to_their_device(fake_mtk_env, plan, tmp_path):
+    fake_mtk_env(**{"2_1": {"fail": ["super"]}})
+    st = station.Station(concurrency=3, per_bus=2, selects_device=True)
+    jobs = {d.port: st.submit_restore(d, plan) for d in DEVICES}
+    assert st.wait(60)
+
+    assert {p: j.status for p, j in jobs.items()} == {"1-1": station.DONE, "1-2": station.DONE,
+                                                      "2-1": station.FAILED}
+    assert jobs["2-1"].result["failed"] == ["super"]
+    state = tmp_path / "state"
+    for port in ("1-1", "1-2"):
+        for part, img in plan:
+            assert (state / port / f"{part}.img").read_bytes() == open(img, "rb").read()
+    assert not (state / "2-1" / "super.img").exists()
+
+
+def test_unpinned_station_runs_one_job_at_a_time(fake_mtk_env, plan):
+    peak = []
+    lock = threading.Lock()
+
+    def on_state(job):
+        with lock:
+            peak.append(len(st.running()))
+
+    st = station.Station(concurrency=3, selects_device=False, on_state=on_state)
+    jobs = [st.submit_restore(d, plan) for d in DEVICES[:2]]
+    assert st.wait(60)
+    assert all(j.status == station.DONE for j in jobs)
+    assert max(peak) == 1
@@ -5,6 +5,8 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+import fw_archive
+
 CONFIG_NAME = "phoenix_config.json"
 
 PHOENIX_FILENAMES = {
@@ -57,6 +59,16 @@ def set_mtk_path(path: str | None) -> None:
         cfg.pop("mtk_path", None)
     save_config(cfg)
 
+def ensure_mtk_on_path(mtk_path: str | None = None) -> None:
+    """Prepend the chosen mtk.exe folder (default: config mtk_path) to PATH so mtk_wrapper finds it."""
+    mtk_path = mtk_path or get_mtk_path()
+    if not mtk_path:
+        return
+    folder = os.path.dirname(mtk_path)
+    env = os.environ.get("PATH", "")
+    if folder not in env:
+        os.environ["PATH"] = folder + os.pathsep + env
+
 def get_fw_dir() -> str | None:
     return load_config().get("fw_dir")
 
@@ -68,24 +80,172 @@ def set_fw_dir(path: str | None) -> None:
         cfg.pop("fw_dir", None)
     save_config(cfg)
 
+def get_fw_set() -> str | None:
+    """Selected firmware set in the store (see fw_store), or None to scan fw_dir."""
+    return load_config().get("fw_set") or None
+
+def set_fw_set(name: str | None) -> None:
+    cfg = load_config()
+    if name:
+        cfg["fw_set"] = name
+    else:
+        cfg.pop("fw_set", None)
+    save_config(cfg)
+
 # --------------------
 # Firmware discovery
 # --------------------
-def _find_first(candidates, base: Path):
+FW_INDEX_NAME = "phoenix_fwindex.json"
+FW_INDEX_VERSION = 2
+
+# every filename any key may resolve to; the index keeps nothing else
+_WANTED_NAMES = frozenset(n.lower() for names in PHOENIX_FILENAMES.values() for n in names)
+
+# {root: {"dirs": {dir: [mtime_ns, ino]}, "files": {name: path},
+#         "archives": {path: {"stamp": [size, mtime_ns], "members": {member: info}}}}}
+_fw_index: dict | None = None
+
+def _fw_index_path() -> Path:
+    return _app_dir() / FW_INDEX_NAME
+
+def _load_fw_index() -> dict:
+    global _fw_index
+    if _fw_index is None:
+        _fw_index = {}
+        p = _fw_index_path()
+        if p.exists():
+            try:
+                data = json.loads(p.read_text(encoding="utf-8"))
+                if data.get("names") == sorted(_WANTED_NAMES) and data.get("version") == FW_INDEX_VERSION:
+                    _fw_index = data.get("roots", {})
+            except Exception:
+                pass
+    return _fw_index
+
+def _save_fw_index() -> None:
+    try:
+        data = {"version": FW_INDEX_VERSION, "names": sorted(_WANTED_NAMES), "roots": _fw_index or {}}
+        _fw_index_path().write_text(json.dumps(data), encoding="utf-8")
+    except Exception:
+        pass
+
+def _list_archive(path: str, old: dict | None) -> dict:
+    """Index entry of one firmware archive; an unchanged archive keeps its old listing."""
+    try:
+        st = fw_archive.stamp(path)
+    except OSError:
+        return {"stamp": None, "members": {}}
+    if old and old.get("stamp") == st:
+        return old
+    try:
+        members = fw_archive.list_members(path, _WANTED_NAMES)
+    except OSError:
+        members = {}   # unreadable or corrupt: remembered, so it isn't re-read until it changes
+    return {"stamp": st, "members": members}
+
+def _generated_dirs() -> set:
+    """
+    Folders the app writes on every action (logs, backups, journals, delta
+    maps) and the firmware store: never walked for firmware, so they can't
+    make the index stale.
+    """
+    app = _app_dir()
+    return {os.path.realpath(p) for p in (
+        store_dir(), app / "logs", load_config().get("backup_dir") or app / "backups",
+        app / "journals", app / "delta_maps")}
+
+def _scan_root(root: Path, old: dict | None = None, exclude=()) -> dict:
+    """
+    Single recursive walk of root.
+    Visits directories in the same pre-order as root.rglob("*") so that,
+    like the old per-key dict, the last file seen with a given name wins.
+    Images inside archives (see fw_archive) are only used for names with
+    no loose file. The firmware store and the app's own output folders
+    (see _generated_dirs) are never walked, nor are the exclude folders
+    (real paths of roots searched on their own).
+    """
+    dirs, files, archives = {}, {}, {}
+    old_archives = (old or {}).get("archives", {})
+    skip = _generated_dirs() | set(exclude)
+    skip_names = {os.path.basename(p) for p in skip}
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            st = os.stat(d)
+            with os.scandir(d) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        dirs[d] = [st.st_mtime_ns, st.st_ino]
+        subdirs = []
+        for e in entries:
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    if e.name not in skip_names or os.path.realpath(e.path) not in skip:
+                        subdirs.append(e.path)
+                elif e.name.lower() in _WANTED_NAMES and e.is_file():
+                    files[e.name.lower()] = e.path
+                elif fw_archive.archive_kind(e.name) and e.is_file():
+                    archives[e.path] = _list_archive(e.path, old_archives.get(e.path))
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+    members = {}
+    for path, entry in archives.items():
+        for name in entry["members"]:
+            members[fw_archive.basename(name).lower()] = fw_archive.member_path(path, name)
+    return {"dirs": dirs, "files": {**members, **files}, "archives": archives, "exclude": sorted(exclude)}
+
+def _index_is_fresh(entry: dict) -> bool:
+    # adding/removing/renaming anything in a directory bumps that directory's mtime
+    for d, stamp in entry.get("dirs", {}).items():
+        try:
+            st = os.stat(d)
+        except OSError:
+            return False
+        if [st.st_mtime_ns, st.st_ino] != stamp:
+            return False
+    # an archive rewritten in place doesn't touch its directory
+    for path, arch in entry.get("archives", {}).items():
+        try:
+            if fw_archive.stamp(path) != arch["stamp"]:
+                return False
+        except OSError:
+            return False
+    return bool(entry.get("dirs"))
+
+def _root_index(root: Path, exclude=()) -> dict:
+    """Filename -> path index for root (minus the exclude folders), rescanned only if a directory changed."""
+    cache = _load_fw_index()
+    key = str(root)
+    entry = cache.get(key)
+    if entry is None or entry.get("exclude", []) != sorted(exclude) or not _index_is_fresh(entry):
+        entry = _scan_root(root, entry, exclude)
+        cache[key] = entry
+        _save_fw_index()
+    else:
+        for path, arch in entry.get("archives", {}).items():
+            fw_archive.remember(path, arch["stamp"], arch["members"])
+    return entry["files"]
+
+def _find_first(candidates, base: Path, files: dict | None = None):
     base = Path(base)
-    files = {p.name.lower(): p for p in base.rglob("*") if p.is_file()}
+    if files is None:
+        files = _root_index(base)
     for name in candidates:
         p = files.get(name.lower())
         if p:
             return str(p)
     return None
 
-def list_firmware_images(preferred_dir: str | None = None) -> dict:
+def list_firmware_images(preferred_dir: str | None = None, app_dirs: bool = True) -> dict:
     """
     Search order:
       1) preferred_dir (user chosen)
       2) <app>/firmware
       3) <app> (same folder as the EXE)
+    With app_dirs=False only preferred_dir is searched.
     """
     paths = {"boot": None, "vbmeta": None, "super_or_system": None, "vendor": None}
     roots: list[Path] = []
@@ -93,11 +253,12 @@ def list_firmware_images(preferred_dir: str | None = None) -> dict:
     if preferred_dir and Path(preferred_dir).exists():
         roots.append(Path(preferred_dir))
 
-    appd = _app_dir()
-    fw = appd / "firmware"
-    if fw.exists():
-        roots.append(fw)
-    roots.append(appd)
+    if app_dirs:
+        appd = _app_dir()
+        fw = appd / "firmware"
+        if fw.exists():
+            roots.append(fw)
+        roots.append(appd)
 
     # dedupe roots, keep order
     seen, ordered = set(), []
@@ -107,22 +268,189 @@ def list_firmware_images(preferred_dir: str | None = None) -> dict:
             ordered.append(rr)
             seen.add(rr)
 
-    for root in ordered:
+    for i, root in enumerate(ordered):
+        # a root inside this one (<app>/firmware in <app>) was searched first and wins anyway: don't walk it twice
+        inner = [str(r) for r in ordered[:i] if root in r.parents]
+        files = _root_index(root, inner)
         for key, names in PHOENIX_FILENAMES.items():
             if paths[key]:
                 continue
-            hit = _find_first(names, root)
+            hit = _find_first(names, root, files)
             if hit:
                 # accept vendor_boot only if nothing else appears later
-                if key == "vendor" and Path(hit).name.lower().startswith("vendor_boot"):
+                if key == "vendor" and fw_archive.basename(hit).lower().startswith("vendor_boot"):
                     paths[key] = paths[key] or hit
                 else:
                     paths[key] = hit
     return paths
 
+def partition_for(key: str, image_path: str) -> str:
+    """Partition name for a PHOENIX_FILENAMES key (super vs system is decided by filename)."""
+    if key == "super_or_system":
+        return "super" if fw_archive.basename(image_path).lower().startswith("super") else "system"
+    return key
+
+def restore_plan(paths: dict, skip_vendor: bool = False) -> list:
+    """One-Click Restore order as [(partition, image_path), ...]: vbmeta, boot, super/system, vendor."""
+    seq = []
+    for key in ("vbmeta", "boot", "super_or_system", "vendor"):
+        if key == "vendor" and skip_vendor:
+            continue
+        if paths.get(key):
+            seq.append((partition_for(key, paths[key]), paths[key]))
+    return seq
+
 # --------------------
 # Logs
 # --------------------
+DEFAULT_LOG_MAX_LINES = 5000
+
 def log_filename() -> str:
+    """Per-action log file (written through disk_log, pruned with the other logs)."""
     ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    return str(_app_dir() / f"PhoenixR1_Log_{ts}.txt")
+    return str(runs_dir() / f"PhoenixR1_Log_{ts}.txt")
+
+def logs_dir() -> Path:
+    d = _app_dir() / "logs"
+    try:
+        d.mkdir(exist_ok=True)
+    except OSError:
+        pass
+    return d
+
+def runs_dir() -> Path:
+    d = logs_dir() / "runs"
+    try:
+        d.mkdir(exist_ok=True)
+    except OSError:
+        pass
+    return d
+
+def events_dir() -> Path:
+    d = logs_dir() / "events"
+    try:
+        d.mkdir(exist_ok=True)
+    except OSError:
+        pass
+    return d
+
+def metrics_dir() -> Path:
+    d = logs_dir() / "metrics"
+    try:
+        d.mkdir(exist_ok=True)
+    except OSError:
+        pass
+    return d
+
+def backups_dir() -> Path:
+    """Pre-flash backups (config backup_dir, default <app>/backups; see backup.py)."""
+    d = Path(load_config().get("backup_dir") or _app_dir() / "backups")
+    try:
+        d.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        pass
+    return d
+
+def get_backup_settings() -> dict:
+    """
+    Pre-flash backup (see backup.BackupSet). Config: backup_compress
+    ("zstd", "gzip" or "none"), backup_level, backup_super (include
+    super/system by default), backup_read_mbps (estimate before the first backup).
+    """
+    cfg = load_config()
+    out = {"compress": "zstd", "level": 3, "super": False, "read_mbps": 20.0}
+    for key in out:
+        name = "backup_" + key
+        try:
+            if cfg.get(name) is not None:
+                out[key] = type(out[key])(cfg[name])
+        except (TypeError, ValueError):
+            pass
+    if out["compress"] not in ("zstd", "gzip", "none"):
+        out["compress"] = "zstd"
+    out["read_mbps"] = max(out["read_mbps"], 0.1)
+    return out
+
+def get_log_settings() -> dict:
+    """Rotation / compression / retention of logs/ (see disk_log.LogWriter)."""
+    cfg = load_config()
+    out = {"log_rotate_mb": 10.0, "log_rotate_hours": 24.0, "log_compress": "gzip",
+           "log_keep_days": 30.0, "log_keep_mb": 500.0}
+    for key, default in out.items():
+        try:
+            out[key] = type(default)(cfg.get(key, default))
+        except (TypeError, ValueError):
+            pass
+    return out
+
+def get_station_limits() -> tuple:
+    """(max parallel devices, max parallel devices per USB bus) for station mode."""
+    cfg = load_config()
+    try:
+        total = max(1, int(cfg.get("station_concurrency", 2)))
+        per_bus = max(1, int(cfg.get("station_per_bus", 2)))
+    except (TypeError, ValueError):
+        return 2, 2
+    return total, per_bus
+
+def get_device_selector() -> list | None:
+    """
+    device_select_args if it can point mtk at one unit: a list of strings
+    using at least one of {port} {serial} {vid} {pid}. None otherwise;
+    mtk then opens whichever device it finds first, so only one device
+    may be driven at a time.
+    """
+    args = load_config().get("device_select_args")
+    if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+        return None
+    if not any(f"{{{k}}}" in a for a in args for k in ("port", "serial", "vid", "pid")):
+        return None
+    return args
+
+def get_job_limits() -> dict:
+    """Retry / timeout defaults for jobs.Job (config: job_retries, job_backoff_s, mtk_step_timeout_s, mtk_idle_timeout_s)."""
+    cfg = load_config()
+    out = {"retries": 2, "backoff": 2.0, "step_timeout": 3600.0, "idle_timeout": 600.0}
+    for key, name in [("retries", "job_retries"), ("backoff", "job_backoff_s"),
+                      ("step_timeout", "mtk_step_timeout_s"), ("idle_timeout", "mtk_idle_timeout_s")]:
+        try:
+            if name in cfg:
+                out[key] = type(out[key])(cfg[name]) if cfg[name] is not None else None
+        except (TypeError, ValueError):
+            pass
+    return out
+
+def get_prefetch_settings() -> dict:
+    """
+    Image prefetch while flashing (see prefetch.Prefetcher). Config:
+    prefetch_mode ("readahead", "cache" or "off"), prefetch_depth (images
+    ahead), prefetch_readahead_mb, prefetch_cache_dir, prefetch_cache_mb.
+    """
+    cfg = load_config()
+    out = {"mode": "readahead", "depth": 1, "readahead_mb": 2048.0, "cache_dir": None, "cache_mb": 8192.0}
+    for key in out:
+        name = "prefetch_" + key
+        try:
+            if cfg.get(name) is not None:
+                out[key] = type(out[key])(cfg[name]) if out[key] is not None else str(cfg[name])
+        except (TypeError, ValueError):
+            pass
+    if out["mode"] not in ("readahead", "cache", "off"):
+        out["mode"] = "readahead"
+    out["depth"] = max(1, out["depth"])
+    return out
+
+def store_dir() -> Path:
+    """Firmware store root (config fw_store_dir, default <app>/firmware_store; see fw_store)."""
+    return Path(load_config().get("fw_store_dir") or _app_dir() / "firmware_store")
+
+def get_store_settings() -> dict:
+    """Firmware store import: fw_store_link ("auto", "hardlink" or "copy")."""
+    link = load_config().get("fw_store_link", "auto")
+    return {"link": link if link in ("auto", "hardlink", "copy") else "auto"}
+
+def get_log_max_lines() -> int:
+    try:
+        return max(100, int(load_config().get("log_max_lines", DEFAULT_LOG_MAX_LINES)))
+    except (TypeError, ValueError):
+        return DEFAULT_LOG_MAX_LINES
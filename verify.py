@@ -0,0 +1,177 @@
+# verify.py
+# SHA-256 manifest checks for firmware images, with a sidecar hash cache.
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fw_archive
+
+MANIFEST_NAMES = ["SHA256SUMS", "SHA256SUMS.txt", "sha256sums.txt", "sha256sum.txt",
+                  "manifest.json", "checksums.json"]
+CACHE_NAME = ".phoenix_hashcache.json"
+CHUNK = 8 * 1024 * 1024
+
+# statuses
+VERIFIED = "verified"
+UNVERIFIED = "unverified"   # no manifest, or image not listed in it
+MISMATCH = "mismatch"
+MISSING = "missing"
+
+_SUM_RE = re.compile(r"^([0-9a-fA-F]{64})\s+\*?(.+?)\s*$")
+_cache_lock = threading.Lock()
+
+
+# --------------------
+# Hashing
+# --------------------
+def sha256_file(path) -> str:
+    """SHA-256 of a file via mmap (no userspace copy); hashlib drops the GIL per chunk."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for off in range(0, size, CHUNK):
+                    h.update(view[off:off + CHUNK])
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+def _cache_key(path: Path, st) -> str:
+    return f"{path.name}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _load_cache(d: Path) -> dict:
+    try:
+        return json.loads((d / CACHE_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def _save_cache(d: Path, cache: dict) -> None:
+    try:
+        (d / CACHE_NAME).write_text(json.dumps(cache, indent=1), encoding="utf-8")
+    except Exception:
+        pass
+
+
+def cached_sha256(path) -> str:
+    """sha256_file, remembered in a sidecar keyed by (name, size, mtime_ns)."""
+    if fw_archive.is_member(path):
+        return fw_archive.sha256(path)
+    p = Path(path)
+    st = p.stat()
+    key = _cache_key(p, st)
+    with _cache_lock:
+        hit = _load_cache(p.parent).get(key)
+    if hit:
+        return hit
+    digest = sha256_file(p)
+    with _cache_lock:
+        cache = _load_cache(p.parent)
+        # forget stale entries for this file
+        cache = {k: v for k, v in cache.items() if not k.startswith(p.name + "|")}
+        cache[key] = digest
+        _save_cache(p.parent, cache)
+    return digest
+
+
+# --------------------
+# Manifests
+# --------------------
+def find_manifest(image_dir) -> Path | None:
+    d = Path(image_dir)
+    for name in MANIFEST_NAMES:
+        p = d / name
+        if p.is_file():
+            return p
+    hits = sorted(d.glob("*.sha256"))
+    return hits[0] if hits else None
+
+
+def parse_manifest(path) -> dict:
+    """{lowercased filename: sha256 hex}. Accepts sha256sum output or JSON."""
+    p = Path(path)
+    text = p.read_text(encoding="utf-8", errors="replace")
+    out = {}
+    if p.suffix.lower() == ".json":
+        data = json.loads(text)
+        if isinstance(data, dict) and isinstance(data.get("files"), dict):
+            data = data["files"]
+        items = data.items() if isinstance(data, dict) else ((e.get("name"), e.get("sha256")) for e in data)
+        for name, digest in items:
+            if isinstance(digest, dict):
+                digest = digest.get("sha256")
+            if name and digest:
+                out[os.path.basename(name).lower()] = str(digest).lower()
+        return out
+    for line in text.splitlines():
+        m = _SUM_RE.match(line.strip())
+        if m:
+            out[os.path.basename(m.group(2)).lower()] = m.group(1).lower()
+    return out
+
+
+# --------------------
+# Verification
+# --------------------
+def verify_image(path, manifest: dict | None = None) -> tuple:
+    """Returns (status, detail) for one image (a manifest next to an archive covers its members)."""
+    if not fw_archive.exists(path):
+        return MISSING, "file not found"
+    if manifest is None:
+        mf = find_manifest(fw_archive.dirname(path))
+        manifest = parse_manifest(mf) if mf else {}
+    expected = manifest.get(fw_archive.basename(path).lower())
+    if not expected:
+        return UNVERIFIED, "not in manifest" if manifest else "no manifest"
+    actual = cached_sha256(path)
+    if actual == expected:
+        return VERIFIED, actual
+    return MISMATCH, f"expected {expected[:12]}…, got {actual[:12]}…"
+
+
+def verify_images(paths: dict, workers: int | None = None) -> dict:
+    """
+    Verify every image in a list_firmware_images() dict in parallel
+    (one image per core). Returns {key: (status, detail)}.
+    """
+    manifests = {}
+
+    def manifest_for(path):
+        d = fw_archive.dirname(path)
+        if d not in manifests:
+            mf = find_manifest(d)
+            try:
+                manifests[d] = parse_manifest(mf) if mf else {}
+            except Exception:
+                manifests[d] = {}
+        return manifests[d]
+
+    jobs = {}
+    for key, path in paths.items():
+        if fw_archive.exists(path):
+            jobs[key] = (path, manifest_for(path))
+
+    results = {key: (MISSING, "file not found") for key, path in paths.items() if key not in jobs}
+    if not jobs:
+        return results
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futs = {key: pool.submit(verify_image, path, mf) for key, (path, mf) in jobs.items()}
+        for key, fut in futs.items():
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                results[key] = (UNVERIFIED, f"hash failed: {e}")
+    return results